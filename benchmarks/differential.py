@@ -0,0 +1,281 @@
+"""
+Differential harness for the translator. Runs every script with python and
+as a compiled translation, checks both print exactly the same bytes, times
+both over repeated runs and writes the speedups and mismatches to JSON.
+Scripts where statements were left untranslated are flagged, since their
+output can't be expected to match. The run fails if any script that was
+fully translated doesn't match
+
+Run from the repository root with
+    python -m benchmarks.differential examples/ --output differential.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from modules import batchtranslator
+from modules import cppcompiler
+from modules import pycatalystexceptions as pcex
+from modules import pytranslator
+
+# Default scripts to compare
+DEFAULT_SCRIPTS = ["examples/"]
+
+# Number of bytes of each output kept around the first difference
+DIFF_CONTEXT = 80
+
+
+def translate(script_path, output_path):
+    """
+    Translates a script, recording the statements that couldn't be translated
+
+    Parameters
+    ----------
+    script_path : str
+        The script to translate
+    output_path : str
+        Directory to write the output to
+
+    Returns
+    -------
+    list of dict
+        The line and reason of every untranslated statement
+    """
+    translator = pytranslator.PyTranslator(script_path, output_path)
+    # The translator reports every file it writes, which would drown out the
+    # results
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.run()
+    return [{"line": line, "reason": reason}
+            for line, reason in sorted(translator.analyzer.unhandled_lines)]
+
+
+def time_command(command, cwd, warmup, repeats, timeout):
+    """
+    Runs a command repeatedly, timing every run after the warmup
+
+    Parameters
+    ----------
+    command : list of str
+        The command and its arguments
+    cwd : str
+        Directory to run the command in
+    warmup : int
+        Untimed runs before the timed ones
+    repeats : int
+        Timed runs
+    timeout : float
+        Seconds a single run may take
+
+    Returns
+    -------
+    stdout : bytes
+        What the last run printed
+    returncode : int
+        Exit code of the last run
+    timing : dict
+        Mean, standard deviation and minimum of the timed runs in seconds
+    """
+    times = []
+    for run in range(warmup + repeats):
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=cwd, capture_output=True,
+                                 timeout=timeout)
+        seconds = time.perf_counter() - start
+        if process.returncode != 0:
+            break
+        if run >= warmup:
+            times.append(seconds)
+    timing = {"runs": len(times),
+              "mean": statistics.mean(times) if times else None,
+              "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+              "min": min(times) if times else None}
+    return process.stdout, process.returncode, timing
+
+
+def find_difference(expected, actual):
+    """
+    Finds where two outputs first differ
+
+    Parameters
+    ----------
+    expected : bytes
+        Output of python
+    actual : bytes
+        Output of the compiled translation
+
+    Returns
+    -------
+    dict
+        Byte offset of the first difference and the text of both outputs
+        around it
+    """
+    offset = 0
+    while offset < min(len(expected), len(actual)) and expected[offset] == actual[offset]:
+        offset += 1
+    start = max(0, offset - DIFF_CONTEXT // 2)
+    return {"offset": offset,
+            "python": expected[start:start + DIFF_CONTEXT].decode(errors="replace"),
+            "cpp": actual[start:start + DIFF_CONTEXT].decode(errors="replace")}
+
+
+def compare_script(script_path, compiler, work_dir, warmup, repeats, timeout):
+    """
+    Runs one script with python and as a compiled translation
+
+    Parameters
+    ----------
+    script_path : str
+        The script to compare
+    compiler : CppCompiler
+        Compiler used to build the translation
+    work_dir : str
+        Directory to write the translation to
+    warmup : int
+        Untimed runs of each side before the timed ones
+    repeats : int
+        Timed runs of each side
+    timeout : float
+        Seconds a single run may take
+
+    Returns
+    -------
+    dict
+        The status, timings and differences of the script. The status is one
+        of match, mismatch, translation_failed, build_failed, python_failed,
+        cpp_failed or timeout
+    """
+    result = {"script": script_path, "unhandled": []}
+    output_path = os.path.join(work_dir, "")
+    try:
+        result["unhandled"] = translate(script_path, output_path)
+    except Exception as ex:
+        result["status"] = "translation_failed"
+        result["error"] = type(ex).__name__ + ": " + str(ex)
+        return result
+    # Any untranslated statement means the binary skips part of the script,
+    # so a match or mismatch says nothing about the translator
+    result["meaningful"] = len(result["unhandled"]) == 0
+
+    build = compiler.build(output_path)
+    if not build.success:
+        result["status"] = "build_failed"
+        result["errors"] = [diagnostic.format() for diagnostic in build.errors]
+        return result
+
+    # Scripts run from their own directory in case they read files next to
+    # them
+    script_dir = os.path.dirname(os.path.abspath(script_path))
+    try:
+        python_out, python_code, result["python"] = time_command(
+            [sys.executable, os.path.abspath(script_path)], script_dir,
+            warmup, repeats, timeout)
+        cpp_out, cpp_code, result["cpp"] = time_command(
+            [build.binary_path], script_dir, warmup, repeats, timeout)
+    except subprocess.TimeoutExpired:
+        result["status"] = "timeout"
+        return result
+
+    if python_code != 0:
+        result["status"] = "python_failed"
+    elif cpp_code != 0:
+        result["status"] = "cpp_failed"
+    elif python_out == cpp_out:
+        result["status"] = "match"
+    else:
+        result["status"] = "mismatch"
+        result["difference"] = find_difference(python_out, cpp_out)
+
+    if result["python"]["mean"] and result["cpp"]["mean"]:
+        result["speedup"] = result["python"]["mean"] / result["cpp"]["mean"]
+    return result
+
+
+def summarize(results):
+    """
+    Counts the scripts in each status
+
+    Parameters
+    ----------
+    results : list of dict
+        Results of compare_script
+
+    Returns
+    -------
+    dict
+        Number of scripts per status, the scripts that failed the run and the
+        geometric mean speedup of the fully translated matching scripts
+    """
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    failures = [result["script"] for result in results
+                if result["status"] != "match" and result.get("meaningful")]
+    speedups = [result["speedup"] for result in results
+                if result["status"] == "match" and result.get("meaningful")
+                and "speedup" in result]
+    return {"counts": counts,
+            "failures": failures,
+            "unhandled": [result["script"] for result in results
+                          if len(result["unhandled"]) > 0],
+            "geometric_mean_speedup": statistics.geometric_mean(speedups) if speedups else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare scripts against their compiled translations")
+    parser.add_argument("scripts", nargs="*", default=DEFAULT_SCRIPTS,
+                        help="Scripts, directories or glob patterns to compare")
+    parser.add_argument("--output", default=None,
+                        help="File to write the results to as JSON")
+    parser.add_argument("--profile", default="release", choices=list(cppcompiler.PROFILES),
+                        help="Build profile to compile the translations with")
+    parser.add_argument("--compiler", default=None,
+                        help="Compiler to use, g++ or clang++ if not given")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="Untimed runs of each side before the timed ones")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Timed runs of each side")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="Seconds a single run may take")
+    args = parser.parse_args(argv)
+
+    try:
+        compiler = cppcompiler.CppCompiler(args.compiler, args.profile)
+    except pcex.CompilerNotFound as ex:
+        print(ex.reason)
+        return 1
+
+    scripts = batchtranslator.collect_scripts(args.scripts)
+    results = []
+    for script_path in scripts:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = compare_script(script_path, compiler, work_dir,
+                                    args.warmup, args.repeats, args.timeout)
+        results.append(result)
+        speedup = "{:>8.2f}x".format(result["speedup"]) if "speedup" in result else " " * 9
+        flag = "  ({} untranslated)".format(len(result["unhandled"])) if result["unhandled"] else ""
+        print("{:<40} {:<18} {}{}".format(script_path, result["status"], speedup, flag))
+
+    summary = summarize(results)
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump({"python": sys.version.split()[0],
+                       "compiler": compiler.get_version(),
+                       "profile": args.profile,
+                       "summary": summary,
+                       "scripts": results}, output, indent=4)
+
+    for script_path in summary["failures"]:
+        print("FAILED " + script_path)
+    return 1 if len(summary["failures"]) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
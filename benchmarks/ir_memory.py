@@ -0,0 +1,137 @@
+"""
+Measures how much memory the translator's intermediate representation takes
+on a large synthetic script, comparing the slotted objects with shared type
+cells against the previous layout of one __dict__ and one type list per object
+
+Run from the repository root with
+    python -m benchmarks.ir_memory [num_functions] [statements_per_function]
+"""
+import ast
+import gc
+import sys
+import tracemalloc
+
+from benchmarks import synthetic
+from modules import pyanalyzer
+from modules import pytranslator
+
+
+class LegacyCodeLine():
+    """
+    CPPCodeLine as it was laid out before slots, with a __dict__ per object
+    """
+
+    def __init__(self, start_line_num, end_line_num, end_char_index, indent,
+                 code_str, comment_str, pre_comment_str):
+        self.start_line_num = start_line_num
+        self.end_line_num = end_line_num
+        self.end_char_index = end_char_index
+        self.indent = indent
+        self.code_str = code_str
+        self.comment_str = comment_str
+        self.pre_comment_str = pre_comment_str
+
+
+class LegacyVariable():
+    """
+    CPPVariable as it was laid out before slots, with its own type list
+    """
+
+    def __init__(self, name, line_num, py_var_type):
+        self.name = name
+        self.line_num = line_num
+        self.py_var_type = py_var_type
+
+
+def build_ir(source):
+    """
+    Runs every translation phase except writing the output
+
+    Parameters
+    ----------
+    source : str
+        The python script to translate
+
+    Returns
+    -------
+    list of CPPFile
+        The translated files
+    """
+    translator = pytranslator.PyTranslator("", "")
+    raw_lines = source.splitlines()
+    tree = ast.parse(source)
+    analyzer = pyanalyzer.PyAnalyzer(translator.output_files, raw_lines)
+    analyzer.analyze(tree.body, 0, "0", 1)
+    translator.apply_variable_types()
+    translator.ingest_comments(raw_lines)
+    return translator.output_files
+
+
+def measure(build):
+    """
+    Measures the memory still allocated by the objects a function builds
+
+    Parameters
+    ----------
+    build : callable
+        Function creating the objects to measure
+
+    Returns
+    -------
+    int
+        Bytes allocated by the objects the function returned
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def copy_layout(output_files, code_line_class, variable_class, make_type):
+    """
+    Rebuilds every code line and variable with the given classes, sharing the
+    existing strings so only the per object overhead is measured
+    """
+    copies = []
+    for cfile in output_files:
+        for function in cfile.functions.values():
+            for line in function.lines.values():
+                copies.append(code_line_class(line.start_line_num,
+                                              line.end_line_num,
+                                              line.end_char_index, line.indent,
+                                              line.code_str, line.comment_str,
+                                              line.pre_comment_str))
+            for variable in function.variables.values():
+                copies.append(variable_class(variable.name, variable.line_num,
+                                             make_type(variable.py_var_type[0])))
+    return copies
+
+
+def main(argv):
+    num_functions = int(argv[0]) if len(argv) > 0 else 500
+    statements = int(argv[1]) if len(argv) > 1 else 50
+    source = synthetic.generate_script(num_functions, statements)
+
+    output_files = build_ir(source)
+    ir_size = measure(lambda: build_ir(source))
+    slotted_size = measure(lambda: copy_layout(output_files,
+                                               pyanalyzer.CPPCodeLine,
+                                               pyanalyzer.CPPVariable,
+                                               pyanalyzer.TypeCell.get))
+    legacy_size = measure(lambda: copy_layout(output_files, LegacyCodeLine,
+                                              LegacyVariable,
+                                              lambda name: [name]))
+
+    print("Script lines:          " + str(len(source.splitlines())))
+    print("Translated IR:         {:.1f} MB".format(ir_size / 2 ** 20))
+    print("Line/variable objects: {:.1f} MB slotted, {:.1f} MB legacy layout"
+          .format(slotted_size / 2 ** 20, legacy_size / 2 ** 20))
+    print("Reduction:             {:.0%}".format(1 - slotted_size / legacy_size))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
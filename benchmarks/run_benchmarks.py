@@ -0,0 +1,198 @@
+"""
+Benchmark suite for the translator. Generates synthetic scripts of different
+shapes, measures the wall time and peak memory of every phase of
+PyTranslator.run, and writes the results to JSON. When given a baseline the
+run fails if throughput on any case regressed by more than the threshold
+
+Run from the repository root with
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from modules import instrumentation
+from modules import pytranslator
+
+# Dictionary of {Case Name: Generator Parameters}
+CASES = {
+    "small": {"num_functions": 20, "statements_per_function": 20},
+    "many_functions": {"num_functions": 1000, "statements_per_function": 20},
+    "long_functions": {"num_functions": 20, "statements_per_function": 1000},
+    "deep_nesting": {"num_functions": 100, "statements_per_function": 40,
+                     "nesting_depth": 20},
+    "comment_heavy": {"num_functions": 200, "statements_per_function": 40,
+                      "comment_density": 1.0},
+    "large_lists": {"num_functions": 200, "statements_per_function": 20,
+                    "list_size": 500},
+}
+
+# Smaller versions of the cases for quick checks
+QUICK_SCALE = 0.1
+
+
+def translate(script_path, output_path, trace_memory):
+    """
+    Translates a script once, recording its phases
+
+    Parameters
+    ----------
+    script_path : str
+        The script to translate
+    output_path : str
+        Directory to write the output to
+    trace_memory : bool
+        Whether to record peak memory, which slows the translation down
+
+    Returns
+    -------
+    seconds : float
+        Wall time of the whole translation
+    phases : dict of {str: dict}
+        The measurements of every phase from PhaseProfiler.report
+    """
+    profiler = instrumentation.PhaseProfiler(trace_memory=trace_memory,
+                                             count_nodes=False)
+    translator = pytranslator.PyTranslator(script_path, output_path,
+                                           profiler=profiler)
+    # The translator reports every file it writes, which would drown out the
+    # results
+    with profiler, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        translator.run()
+        seconds = time.perf_counter() - start
+    return seconds, profiler.report()["phases"]
+
+
+def run_case(params, repeats, work_dir):
+    """
+    Benchmarks one synthetic script
+
+    Parameters
+    ----------
+    params : dict
+        Parameters for synthetic.generate_script
+    repeats : int
+        Number of timed translations, the fastest of which is kept
+    work_dir : str
+        Directory to write the script and its output to
+
+    Returns
+    -------
+    dict
+        The measurements of the case
+    """
+    source = synthetic.generate_script(**params)
+    script_path = os.path.join(work_dir, "script.py")
+    with open(script_path, "w") as script:
+        script.write(source)
+    output_path = os.path.join(work_dir, "")
+
+    # Times are taken without tracing memory since tracemalloc slows every
+    # allocation down, then a separate run measures the memory
+    total_seconds = None
+    phases = {}
+    for _ in range(repeats):
+        seconds, measurements = translate(script_path, output_path, False)
+        if total_seconds is None or seconds < total_seconds:
+            total_seconds = seconds
+        for name, measurement in measurements.items():
+            if name not in phases or measurement["wall_seconds"] < phases[name]["seconds"]:
+                phases[name] = {"seconds": measurement["wall_seconds"],
+                                "cpu_seconds": measurement["cpu_seconds"]}
+    for name, measurement in translate(script_path, output_path, True)[1].items():
+        phases[name]["peak_bytes"] = measurement["peak_bytes"]
+
+    lines = len(source.splitlines())
+    return {"params": params, "lines": lines, "phases": phases,
+            "total_seconds": total_seconds,
+            "lines_per_second": lines / total_seconds}
+
+
+def compare(results, baseline, threshold):
+    """
+    Finds cases whose throughput dropped compared to a baseline
+
+    Parameters
+    ----------
+    results : dict
+        Results of this run
+    baseline : dict
+        Results of an earlier run
+    threshold : float
+        Fraction of throughput a case may lose before it counts as a
+        regression
+
+    Returns
+    -------
+    list of str
+        Descriptions of every regression
+    """
+    regressions = []
+    for name, case in results["cases"].items():
+        baseline_case = baseline["cases"].get(name)
+        if baseline_case is None or baseline_case["params"] != case["params"]:
+            continue
+        ratio = case["lines_per_second"] / baseline_case["lines_per_second"]
+        if ratio < 1 - threshold:
+            regressions.append(name + ": " + "{:.0f}".format(case["lines_per_second"])
+                               + " lines/s vs " + "{:.0f}".format(baseline_case["lines_per_second"])
+                               + " baseline ({:.0%} slower)".format(1 - ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the translator")
+    parser.add_argument("--output", default=None,
+                        help="File to write the results to as JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="Results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed throughput loss before failing, as a fraction")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed runs per case, the fastest is kept")
+    parser.add_argument("--quick", action="store_true",
+                        help="Run scaled down versions of the cases")
+    parser.add_argument("--case", action="append", default=None,
+                        help="Only run the named case, can be given more than once")
+    args = parser.parse_args(argv)
+
+    results = {"python": sys.version.split()[0], "cases": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, params in CASES.items():
+            if args.case is not None and name not in args.case:
+                continue
+            if args.quick:
+                params = dict(params)
+                for key in ("num_functions", "statements_per_function"):
+                    params[key] = max(5, int(params[key] * QUICK_SCALE))
+            case = run_case(params, args.repeats, work_dir)
+            results["cases"][name] = case
+            print("{:<16} {:>8} lines {:>9.3f}s {:>10.0f} lines/s {:>8.1f} MB peak".format(
+                name, case["lines"], case["total_seconds"], case["lines_per_second"],
+                max(phase["peak_bytes"] for phase in case["phases"].values()) / 2 ** 20))
+
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+def generate_script(num_functions=100, statements_per_function=20,
+                    nesting_depth=0, comment_density=0.25, list_size=0):
+    """
+    Generates a python script made only of constructs the translator supports,
+    used to measure how translation scales with the size and shape of the
+    input
+
+    Parameters
+    ----------
+    num_functions : int
+        Number of functions to generate
+    statements_per_function : int
+        Number of statements in the body of each function
+    nesting_depth : int
+        How many if statements deep the body of each function is nested
+    comment_density : float
+        Fraction of statements that get a comment, alternating between full
+        line and inline comments
+    list_size : int
+        Number of elements in a list literal declared in every function, no
+        list is declared if this is 0
+
+    Returns
+    -------
+    str
+        The text of the generated script
+    """
+    lines = []
+    comment_every = round(1 / comment_density) if comment_density > 0 else 0
+    for function_index in range(num_functions):
+        lines.append("def function_" + str(function_index) + "(val_a, val_b):")
+        lines.append("    total = val_a + val_b")
+        if list_size > 0:
+            lines.append("    values = [" + ", ".join(str(value) for value
+                                                      in range(list_size)) + "]")
+
+        indent = "    "
+        for depth in range(nesting_depth):
+            lines.append(indent + "if total > " + str(depth) + ":")
+            indent += "    "
+
+        for statement_index in range(statements_per_function - 2):
+            statement = indent + "total = total + val_a * " + str(statement_index)
+            if list_size > 0 and statement_index % 2 == 1:
+                statement = indent + "total = total + values[" \
+                            + str(statement_index % list_size) + "]"
+
+            if comment_every > 0 and statement_index % comment_every == 0:
+                if statement_index % (2 * comment_every) == 0:
+                    lines.append(indent + "# step " + str(statement_index))
+                else:
+                    statement += "  # step " + str(statement_index)
+            lines.append(statement)
+        lines.append("    return total")
+        lines.append("")
+        lines.append("")
+
+    for function_index in range(num_functions):
+        lines.append("result_" + str(function_index) + " = function_"
+                     + str(function_index) + "(1, 2)")
+    return "\n".join(lines) + "\n"
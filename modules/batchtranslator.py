@@ -0,0 +1,360 @@
+import glob
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from modules import pytranslator
+from modules import translationcache
+from modules import incremental
+
+
+class BatchResult():
+    """
+    Holds the outcome of translating a single script during a batch run
+    """
+
+    def __init__(self, script_path, output_path, success, elapsed, error=""):
+        """
+        Constructs a BatchResult object
+
+        Parameters
+        ----------
+        script_path : str
+            Path of the script that was translated
+        output_path : str
+            Directory the translated C++ files were written to
+        success : bool
+            Whether the translation finished without raising
+        elapsed : float
+            Wall time in seconds spent translating the script
+        error : str
+            Description of the failure, if the translation failed
+        """
+        self.script_path = script_path
+        self.output_path = output_path
+        self.success = success
+        self.elapsed = elapsed
+        self.error = error
+
+    def to_dict(self):
+        """
+        Converts the result to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The result represented as a dictionary
+        """
+        return {"script": self.script_path, "output": self.output_path,
+                "success": self.success, "elapsed": self.elapsed,
+                "error": self.error}
+
+
+class BatchSummary():
+    """
+    Collects the results of every script translated during a batch run
+    """
+
+    def __init__(self, results, elapsed):
+        """
+        Constructs a BatchSummary object
+
+        Parameters
+        ----------
+        results : list of BatchResult
+            Results of every script in the batch, in input order
+        elapsed : float
+            Wall time in seconds for the whole batch
+        """
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.success]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.success]
+
+    def to_dict(self):
+        """
+        Converts the summary to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The summary represented as a dictionary
+        """
+        return {"total": len(self.results),
+                "succeeded": len(self.succeeded),
+                "failed": len(self.failed),
+                "elapsed": self.elapsed,
+                "results": [result.to_dict() for result in self.results]}
+
+    def format_report(self):
+        """
+        Generates a human readable report of the batch run
+
+        Returns
+        -------
+        str
+            The report listing every failure and the overall totals
+        """
+        report = ""
+        for result in self.failed:
+            report += "FAILED " + result.script_path + ": " + result.error + "\n"
+        report += "Translated " + str(len(self.succeeded)) + " of " \
+                  + str(len(self.results)) + " scripts in " \
+                  + "{:.2f}".format(self.elapsed) + "s"
+        if len(self.failed) > 0:
+            report += " (" + str(len(self.failed)) + " failed)"
+        return report
+
+
+class TranslationTimeout(Exception):
+    """
+    Raised inside a worker when a script takes longer than the allowed time
+    """
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise TranslationTimeout()
+
+
+def _translate_job(script_path, output_path, timeout, cache_dir=None,
+                   incremental_mode=False, options=None):
+    """
+    Translates a single script inside a worker process. Every exception is
+    caught here so one bad script can't take down the rest of the batch
+
+    Parameters
+    ----------
+    script_path : str
+        Path of the script to translate
+    output_path : str
+        Directory to write the translated files to
+    timeout : float or None
+        Seconds the translation is allowed to take
+    cache_dir : str or None
+        Directory of the translation cache, no caching if None
+    incremental_mode : bool
+        Only re-analyze functions that changed since the last run
+    options : dict or None
+        Translation options that affect the generated code
+
+    Returns
+    -------
+    BatchResult
+        The outcome of the translation
+    """
+    # Alarms are only available on POSIX systems, elsewhere the timeout is
+    # not enforced
+    use_alarm = timeout is not None and hasattr(signal, "SIGALRM")
+    start = time.perf_counter()
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        os.makedirs(output_path, exist_ok=True)
+        cache = None
+        if cache_dir is not None:
+            cache = translationcache.TranslationCache(cache_dir)
+        snapshots = None
+        if incremental_mode:
+            snapshots = incremental.FunctionSnapshotStore(
+                os.path.join(output_path, incremental.SNAPSHOT_FILE_NAME), options)
+        translator = pytranslator.PyTranslator(script_path, output_path, options,
+                                               cache=cache, snapshots=snapshots)
+        translator.run()
+        success, error = True, ""
+    except TranslationTimeout:
+        success, error = False, "Timed out after " + str(timeout) + "s"
+    except Exception as ex:
+        success = False
+        error = "".join(traceback.format_exception_only(type(ex), ex)).strip()
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return BatchResult(script_path, output_path, success,
+                       time.perf_counter() - start, error)
+
+
+def collect_scripts(patterns):
+    """
+    Expands a list of file paths, directories and glob patterns into the
+    python scripts they refer to
+
+    Parameters
+    ----------
+    patterns : list of str
+        Paths to scripts, directories to search recursively, or glob patterns
+
+    Returns
+    -------
+    list of str
+        Sorted list of unique script paths
+    """
+    scripts = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.py")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path):
+                scripts.add(os.path.normpath(path))
+    return sorted(scripts)
+
+
+def get_output_dirs(scripts, output_root):
+    """
+    Determines an output directory for every script so scripts with the same
+    name in different directories don't overwrite each other
+
+    Parameters
+    ----------
+    scripts : list of str
+        Paths of the scripts being translated
+    output_root : str
+        Directory that all outputs are placed under
+
+    Returns
+    -------
+    list of str
+        Output directory for each script, ending in a path separator
+    """
+    if len(scripts) == 0:
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(script))
+                               for script in scripts])
+    output_dirs = []
+    for script in scripts:
+        relative = os.path.relpath(os.path.abspath(script), root)
+        output_dirs.append(os.path.join(output_root,
+                                        os.path.splitext(relative)[0], ""))
+    return output_dirs
+
+
+def translate_batch(patterns, output_root, jobs=None, timeout=None,
+                    cache_dir=None, incremental_mode=False, options=None):
+    """
+    Translates many scripts in parallel across a pool of worker processes
+
+    Parameters
+    ----------
+    patterns : list of str
+        Paths to scripts, directories or glob patterns to translate
+    output_root : str
+        Directory to write the outputs to. Each script gets its own
+        subdirectory mirroring its location relative to the other scripts
+    jobs : int or None
+        Number of worker processes, defaults to the number of CPUs
+    timeout : float or None
+        Seconds each script is allowed to take before it is abandoned
+    cache_dir : str or None
+        Directory of the translation cache shared by all workers
+    incremental_mode : bool
+        Only re-analyze functions that changed since the last run, keeping
+        the snapshots in each script's output directory
+    options : dict or None
+        Translation options that affect the generated code
+
+    Returns
+    -------
+    BatchSummary
+        Summary of which scripts succeeded and which failed
+    """
+    start = time.perf_counter()
+    scripts = collect_scripts(patterns)
+    output_dirs = get_output_dirs(scripts, output_root)
+    results = run_isolated_jobs(_translate_job,
+                                [(scripts[index], output_dirs[index], timeout,
+                                  cache_dir, incremental_mode, options)
+                                 for index in range(len(scripts))], jobs)
+    for index, result in enumerate(results):
+        if result is None:
+            # The worker died without returning, most likely from running
+            # out of memory on this script
+            results[index] = BatchResult(scripts[index], output_dirs[index], False,
+                                         0.0, "Worker process terminated abruptly")
+
+    return BatchSummary(results, time.perf_counter() - start)
+
+
+def run_isolated_jobs(job, arguments, jobs=None):
+    """
+    Runs a job for every set of arguments across a pool of worker processes.
+    A worker dying without returning breaks the whole pool and fails every
+    job still outstanding, so those are run again in fresh pools, split in
+    half each time the pool breaks again, until the job that killed its
+    worker is the only one left
+
+    Parameters
+    ----------
+    job : callable
+        Function to run, which has to be importable by the workers
+    arguments : list of tuple
+        Arguments of every call of the job
+    jobs : int or None
+        Number of worker processes, defaults to the number of CPUs
+
+    Returns
+    -------
+    list
+        What each call returned, in the order of the arguments. None for
+        the calls that killed their worker
+    """
+    results = [None] * len(arguments)
+    pending = [list(range(len(arguments)))] if len(arguments) > 0 else []
+    while len(pending) > 0:
+        indices = pending.pop()
+        unfinished = _run_pool(job, arguments, indices, results, jobs)
+        # Every other job finished, so the one left is what killed the worker
+        if len(unfinished) > 1:
+            half = len(unfinished) // 2
+            pending += [unfinished[half:], unfinished[:half]]
+    return results
+
+
+def _run_pool(job, arguments, indices, results, jobs):
+    """
+    Runs some of the calls of run_isolated_jobs in a fresh pool
+
+    Parameters
+    ----------
+    job : callable
+        Function to run
+    arguments : list of tuple
+        Arguments of every call of the job
+    indices : list of int
+        Indices of the calls to run
+    results : list
+        Filled in with what each finished call returned
+    jobs : int or None
+        Number of worker processes
+
+    Returns
+    -------
+    list of int
+        Indices of the calls left unfinished because a worker died
+    """
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for position, index in enumerate(indices):
+            try:
+                futures[executor.submit(job, *arguments[index])] = index
+            except BrokenProcessPool:
+                unfinished += indices[position:]
+                break
+
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except BrokenProcessPool:
+                unfinished.append(futures[future])
+    return sorted(unfinished)
@@ -0,0 +1,433 @@
+import ast
+import math
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """
+    Simplifies a parsed script before analysis. Arithmetic, comparisons and
+    boolean logic on constants are evaluated with python semantics, module
+    level names assigned a number or bool exactly once are replaced by it
+    where they're used, and if and while statements with a constant condition
+    are reduced to the branch that runs
+    """
+    # Range of the C++ int that python ints are translated to. Results
+    # outside of it are left for C++ to compute
+    min_int = -2 ** 31
+    max_int = 2 ** 31 - 1
+
+    # Longest string a fold may produce, so repeating a string can't blow up
+    # the size of the generated code
+    max_str_length = 4096
+
+    # Builtins without side effects that can be evaluated when every argument
+    # is constant
+    pure_functions = {"abs": abs, "min": min, "max": max, "pow": pow}
+
+    def __init__(self):
+        """
+        Constructs a ConstantFolder
+        """
+        # Constants that can be propagated at the point being visited
+        # Dictionary of {Name: Value}
+        self.constants = {}
+
+        # Names defined in the current function, which hide module constants
+        self.local_names = set()
+
+        # Constants propagated into the function being visited
+        # Dictionary of {Name: Value}, None outside of functions
+        self.used_constants = None
+
+        # Constants each function had propagated into it, which its
+        # translation depends on as much as its source
+        # Dictionary of {Function Name: {Name: Value}}
+        self.function_constants = {}
+
+        # Names bound at module level, which hide builtins
+        self.module_names = set()
+
+    def fold(self, tree):
+        """
+        Folds a parsed script in place
+
+        Parameters
+        ----------
+        tree : ast.Module
+            The parsed script
+
+        Returns
+        -------
+        ast.Module
+            The folded script
+        """
+        candidates = self.find_single_assignments(tree)
+
+        # Module level code runs in order, so a constant is only propagated
+        # into code after its assignment. Function bodies run when called,
+        # after all module constants are known, so they are done last
+        body = []
+        definitions = []
+        for node in tree.body:
+            if node.__class__ in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                body.append(node)
+                definitions.append(node)
+                continue
+            result = self.visit(node)
+            if result is None:
+                continue
+            body.extend(result if isinstance(result, list) else [result])
+            if node.__class__ is ast.Assign and node.targets[0].__class__ is ast.Name \
+                    and node.targets[0].id in candidates \
+                    and self.get_constant(node.value, (int, float, bool)) is not None:
+                self.constants[node.targets[0].id] = self.get_constant(node.value)
+        tree.body = body
+
+        for node in definitions:
+            if node.__class__ is ast.ClassDef:
+                self.local_names = set(self.constants)
+            else:
+                self.local_names = self.find_local_names(node)
+            self.used_constants = {}
+            self.visit(node)
+            if node.__class__ is not ast.ClassDef:
+                self.function_constants[node.name] = self.used_constants
+        self.local_names = set()
+        self.used_constants = None
+        return tree
+
+    def find_single_assignments(self, tree):
+        """
+        Finds module level names that are only ever assigned once, by a plain
+        assignment at the top level of the module
+
+        Parameters
+        ----------
+        tree : ast.Module
+            The parsed script
+
+        Returns
+        -------
+        set of str
+            The names assigned exactly once
+        """
+        store_counts = {}
+        for name in self.find_bound_names(tree.body, True):
+            store_counts[name] = store_counts.get(name, 0) + 1
+        self.module_names = set(store_counts)
+
+        # Functions declaring a name global can change it at any time
+        for node in ast.walk(tree):
+            if node.__class__ is ast.Global:
+                for name in node.names:
+                    store_counts[name] = 2
+
+        candidates = set()
+        for node in tree.body:
+            if node.__class__ is ast.Assign and len(node.targets) == 1 \
+                    and node.targets[0].__class__ is ast.Name \
+                    and store_counts.get(node.targets[0].id) == 1:
+                candidates.add(node.targets[0].id)
+        return candidates
+
+    def find_bound_names(self, body, include_definitions):
+        """
+        Lists every name a body of code binds in its own scope, without
+        looking inside nested functions and classes
+
+        Parameters
+        ----------
+        body : List of ast nodes
+            The code to search
+        include_definitions : bool
+            Whether the names of nested functions and classes count
+
+        Returns
+        -------
+        list of str
+            Every binding found, once per binding
+        """
+        names = []
+        stack = list(body)
+        while len(stack) > 0:
+            node = stack.pop()
+            node_type = node.__class__
+            if node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                if include_definitions:
+                    names.append(node.name)
+                # Decorators and defaults are evaluated in this scope
+                stack.extend(getattr(node, "decorator_list", []))
+                continue
+            elif node_type is ast.Lambda:
+                continue
+            elif node_type is ast.Name and node.ctx.__class__ is not ast.Load:
+                names.append(node.id)
+            elif node_type is ast.NamedExpr:
+                names.append(node.target.id)
+            elif node_type is ast.alias:
+                names.append((node.asname or node.name).split(".")[0])
+            elif node_type is ast.ExceptHandler and node.name is not None:
+                names.append(node.name)
+            stack.extend(ast.iter_child_nodes(node))
+        return names
+
+    def find_local_names(self, node):
+        """
+        Finds the names local to a function, which hide module constants of
+        the same name
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function
+
+        Returns
+        -------
+        set of str
+            Names of the parameters and variables of the function
+        """
+        args = node.args
+        names = set(self.find_bound_names(node.body, True))
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            names.add(arg.arg)
+        if args.vararg is not None:
+            names.add(args.vararg.arg)
+        if args.kwarg is not None:
+            names.add(args.kwarg.arg)
+        for child in ast.walk(node):
+            if child.__class__ in (ast.Global, ast.Nonlocal):
+                names.update(child.names)
+        return names
+
+    def get_constant(self, node, types=None):
+        """
+        Finds the value of a constant expression, including negative numbers
+        which are kept as a negated literal
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+        types : tuple of type or None
+            Types the value must have, any type if None
+
+        Returns
+        -------
+        The value of the constant, or None if the node isn't one
+        """
+        if node.__class__ is ast.UnaryOp and node.op.__class__ is ast.USub \
+                and node.operand.__class__ is ast.Constant \
+                and type(node.operand.value) in (int, float):
+            value = -node.operand.value
+        elif node.__class__ is ast.Constant:
+            value = node.value
+        else:
+            return None
+        if types is not None and type(value) not in types:
+            return None
+        return value
+
+    def is_constant(self, node):
+        return node.__class__ is ast.Constant or self.get_constant(node) is not None
+
+    def make_constant(self, value, node):
+        """
+        Creates the node for a folded value, provided C++ can hold it
+
+        Parameters
+        ----------
+        value : object
+            The folded value
+        node : ast node
+            The node being replaced, whose location the new node takes
+
+        Returns
+        -------
+        ast node or None
+            The constant node, or None if the value shouldn't be folded
+        """
+        value_type = type(value)
+        if value_type is int:
+            if value < ConstantFolder.min_int or value > ConstantFolder.max_int:
+                return None
+        elif value_type is float:
+            if math.isinf(value) or math.isnan(value):
+                return None
+        elif value_type is str:
+            if len(value) > ConstantFolder.max_str_length:
+                return None
+        elif value_type is not bool and value is not None:
+            return None
+
+        # Negative numbers stay negated literals, which the translator wraps
+        # in brackets so they can't merge with a preceding operator
+        if value_type in (int, float) and (value < 0 or math.copysign(1, value) < 0):
+            constant = ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-value))
+            ast.copy_location(constant.operand, node)
+        else:
+            constant = ast.Constant(value=value)
+        return ast.copy_location(constant, node)
+
+    def evaluate(self, function, node, *operands):
+        """
+        Evaluates an operation on constants, keeping the original node if
+        python raises or the result can't be translated
+
+        Parameters
+        ----------
+        function : callable
+            Performs the operation
+        node : ast node
+            The node being folded
+        *operands
+            Values passed to the function
+
+        Returns
+        -------
+        ast node
+            The folded constant, or the original node
+        """
+        try:
+            value = function(*operands)
+        except Exception:
+            return node
+        folded = self.make_constant(value, node)
+        return node if folded is None else folded
+
+    # Python operators as functions of their operands
+    binary_operators = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+                        ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b,
+                        ast.FloorDiv: lambda a, b: a // b,
+                        ast.Mod: lambda a, b: a % b, ast.Pow: lambda a, b: a ** b,
+                        ast.LShift: lambda a, b: a << b,
+                        ast.RShift: lambda a, b: a >> b,
+                        ast.BitOr: lambda a, b: a | b,
+                        ast.BitAnd: lambda a, b: a & b,
+                        ast.BitXor: lambda a, b: a ^ b}
+    unary_operators = {ast.UAdd: lambda a: +a, ast.USub: lambda a: -a,
+                       ast.Not: lambda a: not a, ast.Invert: lambda a: ~a}
+    comparison_operators = {ast.Eq: lambda a, b: a == b,
+                            ast.NotEq: lambda a, b: a != b,
+                            ast.Lt: lambda a, b: a < b,
+                            ast.LtE: lambda a, b: a <= b,
+                            ast.Gt: lambda a, b: a > b,
+                            ast.GtE: lambda a, b: a >= b}
+
+    def generic_visit(self, node):
+        # Pruning can empty a body, which still needs a statement in it
+        body = getattr(node, "body", None)
+        last_statement = body[-1] if isinstance(body, list) and len(body) > 0 else None
+        node = super().generic_visit(node)
+        if last_statement is not None and len(node.body) == 0:
+            node.body.append(ast.copy_location(ast.Pass(), last_statement))
+        return node
+
+    def visit_Name(self, node):
+        if node.ctx.__class__ is ast.Load and node.id in self.constants \
+                and node.id not in self.local_names:
+            value = self.constants[node.id]
+            if self.used_constants is not None:
+                self.used_constants[node.id] = value
+            return self.make_constant(value, node)
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left = self.get_constant(node.left)
+        right = self.get_constant(node.right)
+        operator = ConstantFolder.binary_operators.get(node.op.__class__)
+        if operator is None or not self.is_constant(node.left) \
+                or not self.is_constant(node.right):
+            return node
+
+        # Huge powers and shifts take a long time to compute only to be
+        # thrown away for being out of range
+        if node.op.__class__ in (ast.Pow, ast.LShift) and type(right) is int \
+                and right > 64:
+            return node
+        if node.op.__class__ is ast.Mult and str in (type(left), type(right)):
+            text, count = (left, right) if type(left) is str else (right, left)
+            if type(count) is int and len(text) * count > ConstantFolder.max_str_length:
+                return node
+        return self.evaluate(operator, node, left, right)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        # A negated literal is already as folded as it can get
+        if node.op.__class__ is ast.USub and node.operand.__class__ is ast.Constant \
+                and type(node.operand.value) in (int, float):
+            return node
+        if not self.is_constant(node.operand):
+            return node
+        return self.evaluate(ConstantFolder.unary_operators[node.op.__class__], node,
+                             self.get_constant(node.operand))
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        is_and = node.op.__class__ is ast.And
+
+        # and returns the first falsy operand and or the first truthy one, so
+        # constants before it that don't decide the result can be dropped
+        values = []
+        for index, value in enumerate(node.values):
+            if not self.is_constant(value):
+                values.append(value)
+                continue
+            constant = self.get_constant(value)
+            if bool(constant) != is_and or index == len(node.values) - 1:
+                # This constant is the result if everything before it passed,
+                # so nothing after it is evaluated
+                values.append(value)
+                break
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        if not all(self.is_constant(operand) for operand in operands):
+            return node
+        values = [self.get_constant(operand) for operand in operands]
+
+        def compare():
+            for index in range(len(node.ops)):
+                operator = ConstantFolder.comparison_operators.get(node.ops[index].__class__)
+                if operator is None:
+                    raise ValueError()
+                if not operator(values[index], values[index + 1]):
+                    return False
+            return True
+        return self.evaluate(compare, node)
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        if not self.is_constant(node.test):
+            return node
+        return node.body if self.get_constant(node.test) else node.orelse
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if node.func.__class__ is not ast.Name or len(node.keywords) > 0 \
+                or node.func.id not in ConstantFolder.pure_functions \
+                or node.func.id in self.module_names or node.func.id in self.local_names:
+            return node
+        if not all(self.is_constant(arg) for arg in node.args):
+            return node
+        args = [self.get_constant(arg) for arg in node.args]
+        if node.func.id == "pow" and len(args) >= 2 and type(args[1]) is int and args[1] > 64:
+            return node
+        return self.evaluate(ConstantFolder.pure_functions[node.func.id], node, *args)
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        if not self.is_constant(node.test):
+            return node
+        return node.body if self.get_constant(node.test) else node.orelse
+
+    def visit_While(self, node):
+        self.generic_visit(node)
+        # Loops that always run are kept, they're usually ended by a break
+        if not self.is_constant(node.test) or self.get_constant(node.test):
+            return node
+        return node.orelse
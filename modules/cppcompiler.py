@@ -0,0 +1,478 @@
+"""
+Compiles translated C++ output into a binary. Objects are cached by the hash
+of everything that goes into them, and compiler diagnostics are mapped back to
+the lines of the python script through the line maps the translator writes
+with the line_maps option
+
+Run from the repository root with
+    python -m modules.cppcompiler output/ --profile native
+"""
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+from modules import pycatalystexceptions as pcex
+from modules import pytranslator
+
+# Flags for every build profile
+# Dictionary of {Profile Name: [Flag]}
+PROFILES = {
+    "debug": ["-O0", "-g"],
+    "release": ["-O2"],
+    "native": ["-O3", "-march=native"],
+    "lto": ["-O3", "-flto"],
+}
+
+# Used by every profile. Parameters of unknown type are translated to auto,
+# which needs C++20
+STANDARD_FLAGS = ["-std=c++20"]
+
+# Added to the profile's flags when building a shared library from the
+# library target
+SHARED_FLAGS = ["-fPIC", "-shared"]
+
+# Compilers looked for when none is given, in order of preference
+COMPILERS = ("g++", "clang++")
+
+# Subdirectory of the output directory objects are cached in by default
+OBJECT_CACHE_DIR = ".objects"
+
+# Matches a diagnostic line printed by g++ or clang++
+DIAGNOSTIC_PATTERN = re.compile(r"^(?P<file>[^:\n]+):(?P<line>\d+):(?P<column>\d+): "
+                                r"(?P<severity>fatal error|error|warning|note): "
+                                r"(?P<message>.*)$")
+
+
+class Diagnostic():
+    """
+    An error, warning or note from the compiler, located in the python
+    script when the C++ line it points at came from a translated line
+    """
+
+    def __init__(self, cpp_file, cpp_line, column, severity, message,
+                 script=None, python_line=None):
+        """
+        Constructs a Diagnostic
+
+        Parameters
+        ----------
+        cpp_file : str
+            Name of the C++ file the diagnostic points at
+        cpp_line : int
+            Line in the C++ file
+        column : int
+            Column in the C++ line
+        severity : str
+            "error", "warning", "note" or "fatal error"
+        message : str
+            The compiler's message
+        script : str or None
+            Name of the python script the C++ file was translated from
+        python_line : int or None
+            Line in the script the C++ line was translated from
+        """
+        self.cpp_file = cpp_file
+        self.cpp_line = cpp_line
+        self.column = column
+        self.severity = severity
+        self.message = message
+        self.script = script
+        self.python_line = python_line
+
+    def format(self):
+        location = self.cpp_file + ":" + str(self.cpp_line)
+        if self.python_line is not None:
+            location = self.script + ":" + str(self.python_line) + " (" + location + ")"
+        return location + ": " + self.severity + ": " + self.message
+
+    def to_dict(self):
+        """
+        Converts the diagnostic to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The diagnostic represented as a dictionary
+        """
+        return {"cpp_file": self.cpp_file, "cpp_line": self.cpp_line,
+                "column": self.column, "severity": self.severity,
+                "message": self.message, "script": self.script,
+                "python_line": self.python_line}
+
+
+class CompileResult():
+    """
+    The outcome of building the C++ files of one output directory
+    """
+
+    def __init__(self, binary_path, success, diagnostics, compiled, reused,
+                 elapsed):
+        """
+        Constructs a CompileResult
+
+        Parameters
+        ----------
+        binary_path : str
+            Path of the binary, which only exists if the build succeeded
+        success : bool
+            Whether every file compiled and the binary linked
+        diagnostics : list of Diagnostic
+            Everything the compiler reported
+        compiled : list of str
+            C++ files that had to be compiled
+        reused : list of str
+            C++ files whose objects were taken from the cache
+        elapsed : float
+            Wall time in seconds the build took
+        """
+        self.binary_path = binary_path
+        self.success = success
+        self.diagnostics = diagnostics
+        self.compiled = compiled
+        self.reused = reused
+        self.elapsed = elapsed
+
+    @property
+    def errors(self):
+        return [diagnostic for diagnostic in self.diagnostics
+                if diagnostic.severity in ("error", "fatal error")]
+
+    def format_report(self):
+        """
+        Generates a human readable report of the build
+
+        Returns
+        -------
+        str
+            Every diagnostic followed by the outcome
+        """
+        lines = [diagnostic.format() for diagnostic in self.diagnostics]
+        if self.success:
+            lines.append("Built " + self.binary_path + " in "
+                         + "{:.2f}".format(self.elapsed) + "s ("
+                         + str(len(self.compiled)) + " compiled, "
+                         + str(len(self.reused)) + " cached)")
+        else:
+            lines.append("Build failed with " + str(len(self.errors)) + " errors")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """
+        Converts the result to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The result represented as a dictionary
+        """
+        return {"binary": self.binary_path, "success": self.success,
+                "diagnostics": [diagnostic.to_dict() for diagnostic in self.diagnostics],
+                "compiled": self.compiled, "reused": self.reused,
+                "elapsed": self.elapsed}
+
+
+class CppCompiler():
+    """
+    Builds the C++ files of an output directory with g++ or clang++ using one
+    of the build profiles
+    """
+
+    def __init__(self, compiler=None, profile="release", cache_dir=None,
+                 extra_flags=None):
+        """
+        Constructs a CppCompiler
+
+        Parameters
+        ----------
+        compiler : str or None
+            Name or path of the compiler, the first of COMPILERS found if None
+        profile : str
+            Name of the build profile in PROFILES
+        cache_dir : str or None
+            Directory to cache objects in, a subdirectory of each output
+            directory if None
+        extra_flags : list of str or None
+            Flags passed after the profile's
+
+        Raises
+        ------
+        CompilerNotFound
+            If the compiler can't be found
+        """
+        if profile not in PROFILES:
+            raise ValueError("Unknown build profile " + profile + ", expected one of "
+                             + ", ".join(PROFILES))
+        self.compiler = CppCompiler.find_compiler(compiler)
+        self.profile = profile
+        self.cache_dir = cache_dir
+        self.flags = STANDARD_FLAGS + PROFILES[profile] + list(extra_flags or [])
+        self.version = None
+
+    @staticmethod
+    def find_compiler(compiler=None):
+        """
+        Finds the path of a compiler
+
+        Parameters
+        ----------
+        compiler : str or None
+            Name or path of the compiler, the first of COMPILERS found if None
+
+        Returns
+        -------
+        str
+            Path of the compiler
+
+        Raises
+        ------
+        CompilerNotFound
+            If the compiler can't be found
+        """
+        for name in (compiler,) if compiler is not None else COMPILERS:
+            path = shutil.which(name)
+            if path is not None:
+                return path
+        raise pcex.CompilerNotFound("No C++ compiler found, looked for "
+                                    + (compiler or " and ".join(COMPILERS)))
+
+    def get_version(self):
+        """
+        Finds the version string of the compiler, which is part of every
+        object's cache key
+
+        Returns
+        -------
+        str
+            The first line the compiler prints for --version
+        """
+        if self.version is None:
+            output = subprocess.run([self.compiler, "--version"],
+                                    capture_output=True, text=True).stdout
+            self.version = output.splitlines()[0] if output else self.compiler
+        return self.version
+
+    def get_object_key(self, source_path):
+        """
+        Hashes everything that goes into the object of a C++ file: the
+        compiler, the flags, the file and the local headers next to it
+
+        Parameters
+        ----------
+        source_path : str
+            The C++ file
+
+        Returns
+        -------
+        str
+            Hex digest identifying the object
+        """
+        digest = hashlib.sha256(self.get_version().encode())
+        digest.update("\0".join(self.flags).encode())
+        source_dir = os.path.dirname(source_path)
+        for path in [source_path] + sorted(glob.glob(os.path.join(source_dir, "*.hpp"))):
+            with open(path, "rb") as source_file:
+                digest.update(os.path.basename(path).encode())
+                digest.update(source_file.read())
+        return digest.hexdigest()
+
+    def build(self, output_path, binary_name="main"):
+        """
+        Compiles every C++ file in a directory, reusing cached objects, and
+        links them into a binary in the same directory
+
+        Parameters
+        ----------
+        output_path : str
+            Directory holding the translated C++ files
+        binary_name : str
+            Name of the binary, without any extension
+
+        Returns
+        -------
+        CompileResult
+            The outcome of the build
+        """
+        start = time.perf_counter()
+        cache_dir = self.cache_dir or os.path.join(output_path, OBJECT_CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        binary_path = os.path.join(output_path, binary_name)
+        if sys.platform.startswith("win"):
+            binary_path += ".exe"
+
+        diagnostics = []
+        compiled = []
+        reused = []
+        objects = []
+        success = True
+        for source_path in sorted(glob.glob(os.path.join(output_path, "*.cpp"))):
+            object_path = os.path.join(cache_dir, self.get_object_key(source_path) + ".o")
+            objects.append(object_path)
+            if os.path.exists(object_path):
+                reused.append(os.path.basename(source_path))
+                continue
+
+            # Compiled under a temporary name so a failed or interrupted build
+            # never leaves a broken object behind under the real key
+            temp_path = object_path + "." + str(os.getpid()) + ".tmp"
+            process = subprocess.run([self.compiler] + self.flags
+                                     + ["-c", source_path, "-o", temp_path],
+                                     capture_output=True, text=True)
+            diagnostics.extend(self.parse_diagnostics(process.stderr))
+            compiled.append(os.path.basename(source_path))
+            if process.returncode != 0:
+                success = False
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                continue
+            os.replace(temp_path, object_path)
+
+        if success and len(objects) > 0:
+            # Link time optimization happens here, so the flags are needed
+            # again
+            process = subprocess.run([self.compiler] + self.flags + objects
+                                     + ["-o", binary_path],
+                                     capture_output=True, text=True)
+            diagnostics.extend(self.parse_diagnostics(process.stderr))
+            success = process.returncode == 0
+        elif len(objects) == 0:
+            success = False
+            diagnostics.append(Diagnostic(output_path, 0, 0, "error",
+                                          "No C++ files to compile"))
+
+        return CompileResult(binary_path, success, diagnostics, compiled, reused,
+                             time.perf_counter() - start)
+
+    def parse_diagnostics(self, output):
+        """
+        Picks the diagnostics out of the compiler's output and maps each one
+        back to the python script if its C++ file has a line map
+
+        Parameters
+        ----------
+        output : str
+            What the compiler wrote to stderr
+
+        Returns
+        -------
+        list of Diagnostic
+            The diagnostics in the order they were reported
+        """
+        diagnostics = []
+        # Dictionary of {C++ File Path: LineMap or None}
+        line_maps = {}
+        for line in output.splitlines():
+            match = DIAGNOSTIC_PATTERN.match(line)
+            if match is None:
+                continue
+            cpp_path = match.group("file")
+            if cpp_path not in line_maps:
+                line_maps[cpp_path] = LineMap.load(cpp_path)
+            diagnostic = Diagnostic(os.path.basename(cpp_path), int(match.group("line")),
+                                    int(match.group("column")), match.group("severity"),
+                                    match.group("message"))
+            line_map = line_maps[cpp_path]
+            if line_map is not None:
+                diagnostic.script = line_map.script
+                diagnostic.python_line = line_map.find_python_line(diagnostic.cpp_line)
+            diagnostics.append(diagnostic)
+        return diagnostics
+
+
+class LineMap():
+    """
+    Maps lines of a translated C++ file back to the lines of the python
+    script they came from
+    """
+
+    def __init__(self, script, entries):
+        """
+        Constructs a LineMap
+
+        Parameters
+        ----------
+        script : str
+            Name of the python script
+        entries : list of [int, int, int]
+            [First C++ Line, Last C++ Line, Python Line] for every translated
+            line, in file order
+        """
+        self.script = script
+        self.entries = entries
+        self.first_lines = [entry[0] for entry in entries]
+
+    @staticmethod
+    def load(cpp_path):
+        """
+        Loads the line map written next to a C++ file
+
+        Parameters
+        ----------
+        cpp_path : str
+            Path of the C++ file
+
+        Returns
+        -------
+        LineMap or None
+            The line map, or None if the file has none
+        """
+        try:
+            with open(cpp_path + pytranslator.LINE_MAP_SUFFIX, "r") as map_file:
+                data = json.load(map_file)
+            return LineMap(data["script"], data["lines"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def find_python_line(self, cpp_line):
+        """
+        Finds the python line a C++ line was translated from
+
+        Parameters
+        ----------
+        cpp_line : int
+            Line in the C++ file
+
+        Returns
+        -------
+        int or None
+            Line in the python script, None for generated code such as
+            includes and signatures
+        """
+        position = bisect.bisect_right(self.first_lines, cpp_line) - 1
+        if position >= 0:
+            first_line, last_line, python_line = self.entries[position]
+            if first_line <= cpp_line <= last_line and python_line > 0:
+                return python_line
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile translated C++ output")
+    parser.add_argument("output", help="Directory holding the translated C++ files")
+    parser.add_argument("--profile", default="release", choices=list(PROFILES),
+                        help="Build profile to compile with")
+    parser.add_argument("--compiler", default=None,
+                        help="Compiler to use, g++ or clang++ if not given")
+    parser.add_argument("--cache", default=None,
+                        help="Directory to cache objects in")
+    args = parser.parse_args(argv)
+
+    try:
+        compiler = CppCompiler(args.compiler, args.profile, args.cache)
+    except pcex.CompilerNotFound as ex:
+        print(ex.reason)
+        return 1
+    result = compiler.build(args.output)
+    print(result.format_report())
+    return 0 if result.success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,580 @@
+"""
+Hybrid acceleration. Profiles a representative run of a script, translates
+the hot functions whose bodies translate cleanly into a shared library with
+extern "C" entry points, and writes a shim script that runs the original with
+those functions replaced by ctypes wrappers. Everything else stays python,
+and the wrappers call the python version for arguments the compiled one can't
+take and for calls whose int arithmetic overflowed
+
+Run from the repository root with
+    python -m modules.hybrid script.py -o hybrid/ -- script arguments
+"""
+import argparse
+import ast
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import runpy
+import sys
+import tempfile
+
+from modules import cppcompiler
+from modules import pycatalystexceptions as pcex
+from modules import pytranslator
+from modules.pyanalyzer import cfun
+
+# Fraction of the profiled run a function has to take, including the
+# functions it calls, to count as hot
+MIN_SHARE = 0.05
+
+# Start of every shim, loading the library and defining the wrapper factory
+SHIM_HEADER = '''# Generated by PyCatalyst hybrid mode from {script}
+# Compiled functions: {names}
+import array as _pyc_array
+import ctypes as _pyc_ctypes
+import functools as _pyc_functools
+import inspect as _pyc_inspect
+import os as _pyc_os
+
+try:
+    _pyc_library = _pyc_ctypes.CDLL(_pyc_os.path.join(
+        _pyc_os.path.dirname(_pyc_os.path.abspath(__file__)), "{library}"))
+except OSError:
+    _pyc_library = None
+
+# Only there when the compiled functions do arithmetic that can overflow
+_pyc_take_overflow = getattr(_pyc_library, "pyc_take_overflow", None)
+if _pyc_take_overflow is not None:
+    _pyc_take_overflow.restype = _pyc_ctypes.c_bool
+    _pyc_take_overflow.argtypes = []
+
+_PYC_C_TYPES = {{"int": _pyc_ctypes.c_int, "float": _pyc_ctypes.c_double,
+                "bool": _pyc_ctypes.c_bool}}
+_PYC_ARRAY_CODES = {{"int": "i", "float": "d", "bool": "b"}}
+_PYC_CHECKS = {{"int": lambda value: isinstance(value, int)
+               and -2 ** 31 <= value < 2 ** 31,
+               "float": lambda value: isinstance(value, (int, float)),
+               "bool": lambda value: isinstance(value, bool)}}
+
+
+def _pyc_scalar(name):
+    check = _PYC_CHECKS[name]
+    return [_PYC_C_TYPES[name]], lambda value: (value,) if check(value) else None
+
+
+def _pyc_list(name):
+    code = _PYC_ARRAY_CODES[name]
+    c_type = _PYC_C_TYPES[name]
+
+    def convert(values):
+        # Arrays of the right type are passed without copying
+        if type(values) is _pyc_array.array and values.typecode == code:
+            return (c_type * len(values)).from_buffer(values), len(values)
+        # array converts the whole list in C, rejecting elements that don't
+        # fit, but would take any small int as a bool
+        if type(values) is not list \
+                or (name == "bool" and not all(type(value) is bool for value in values)):
+            return None
+        try:
+            buffer = _pyc_array.array(code, values)
+        except (TypeError, OverflowError):
+            return None
+        return (c_type * len(buffer)).from_buffer(buffer), len(buffer)
+    return [_pyc_ctypes.POINTER(c_type), _pyc_ctypes.c_size_t], convert
+
+
+def _pyc_accelerate(function, symbol, return_type, parameter_types):
+    if _pyc_library is None:
+        return function
+    compiled = getattr(_pyc_library, symbol)
+    compiled.restype = _PYC_C_TYPES.get(return_type)
+    compiled.argtypes = []
+    converters = []
+    for name in parameter_types:
+        if name.startswith("list["):
+            argtypes, converter = _pyc_list(name[5:-1])
+        else:
+            argtypes, converter = _pyc_scalar(name)
+        compiled.argtypes += argtypes
+        converters.append(converter)
+    signature = _pyc_inspect.signature(function)
+
+    @_pyc_functools.wraps(function)
+    def accelerated(*args, **kwargs):
+        if kwargs or len(args) != len(converters):
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return function(*args, **kwargs)
+            bound.apply_defaults()
+            args = bound.args
+        c_args = []
+        for converter, arg in zip(converters, args):
+            converted = converter(arg)
+            if converted is None:
+                return function(*args)
+            c_args += converted
+        result = compiled(*c_args)
+        # Python ints don't overflow, so it has to redo the call
+        if _pyc_take_overflow is not None and _pyc_take_overflow():
+            return function(*args)
+        return result
+    return accelerated
+
+
+'''
+
+
+class HybridResult():
+    """
+    The outcome of accelerating one script
+    """
+
+    def __init__(self, script_path, timings, selected, rejected, shim_path=None,
+                 library_path=None, build=None):
+        """
+        Constructs a HybridResult
+
+        Parameters
+        ----------
+        script_path : str
+            The accelerated script
+        timings : dict of {str: dict}
+            Profile of every function in the script from profile_functions
+        selected : list of str
+            Functions running from the library
+        rejected : dict of {str: str}
+            Hot functions left as python, with the reason why
+        shim_path : str or None
+            Path of the shim script, None if nothing was selected
+        library_path : str or None
+            Path of the shared library, None if nothing was selected
+        build : CompileResult or None
+            The build of the library
+        """
+        self.script_path = script_path
+        self.timings = timings
+        self.selected = selected
+        self.rejected = rejected
+        self.shim_path = shim_path
+        self.library_path = library_path
+        self.build = build
+
+    def format_report(self):
+        """
+        Generates a human readable report of the acceleration
+
+        Returns
+        -------
+        str
+            Every hot function and what happened to it
+        """
+        lines = []
+        for name in self.selected:
+            lines.append("compiled  " + name + " ({:.0%} of the run)".format(
+                self.timings[name]["share"]))
+        for name, reason in self.rejected.items():
+            lines.append("python    " + name + ": " + reason)
+        if self.shim_path is not None:
+            lines.append("Run " + self.shim_path + " in place of " + self.script_path)
+        else:
+            lines.append("No hot functions could be compiled")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """
+        Converts the result to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The result represented as a dictionary
+        """
+        return {"script": self.script_path, "timings": self.timings,
+                "selected": self.selected, "rejected": self.rejected,
+                "shim": self.shim_path, "library": self.library_path,
+                "build": self.build.to_dict() if self.build is not None else None}
+
+
+def profile_functions(script_path, argv=None):
+    """
+    Runs a script under cProfile and measures the functions it defines
+
+    Parameters
+    ----------
+    script_path : str
+        The script to run
+    argv : list of str or None
+        Arguments the script is run with
+
+    Returns
+    -------
+    timings : dict of {str: dict}
+        Dictionary of {Function Name: Measurement} for every function
+        defined in the script that was called, with its number of calls, its
+        time including the functions it calls and its share of the run
+    error : str or None
+        The exception the run raised, None if it finished
+    """
+    script_path = os.path.abspath(script_path)
+    profiler = cProfile.Profile()
+    saved_argv = sys.argv
+    sys.argv = [script_path] + list(argv or [])
+    error = None
+    # The script's output isn't part of the profile
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler.runcall(runpy.run_path, script_path, run_name="__main__")
+    except SystemExit:
+        pass
+    except Exception as ex:
+        error = type(ex).__name__ + ": " + str(ex)
+    finally:
+        sys.argv = saved_argv
+
+    stats = pstats.Stats(profiler).stats
+    run_seconds = max((entry[3] for key, entry in stats.items()
+                       if key[0] == script_path and key[2] == "<module>"),
+                      default=0.0)
+    timings = {}
+    for (filename, lineno, name), (_, calls, _, total, _) in stats.items():
+        if filename != script_path or name.startswith("<"):
+            continue
+        timings[name] = {"line": lineno, "calls": calls, "seconds": total,
+                         "share": total / run_seconds if run_seconds > 0 else 0.0}
+    return timings, error
+
+
+def find_hot_functions(timings, min_share=MIN_SHARE):
+    """
+    Picks the functions that took a large enough share of the run
+
+    Parameters
+    ----------
+    timings : dict of {str: dict}
+        Profile from profile_functions
+    min_share : float
+        Fraction of the run a function has to take
+
+    Returns
+    -------
+    list of str
+        The hot functions, slowest first
+    """
+    hot = [name for name, timing in timings.items() if timing["share"] >= min_share]
+    return sorted(hot, key=lambda name: -timings[name]["seconds"])
+
+
+class FunctionSelector():
+    """
+    Decides which functions of a translated script can be exported through
+    the C ABI
+    """
+
+    def __init__(self, tree, cpp_file, unhandled_lines):
+        """
+        Constructs a FunctionSelector
+
+        Parameters
+        ----------
+        tree : ast.Module
+            The parsed script
+        cpp_file : CPPFile
+            The translation of the script
+        unhandled_lines : list of (int, str)
+            Statements the analyzer couldn't translate
+        """
+        # Dictionary of {Function Name: ast.FunctionDef} of the functions
+        # defined at the top of the script
+        self.nodes = {node.name: node for node in tree.body
+                      if node.__class__ is ast.FunctionDef}
+        self.cpp_file = cpp_file
+        self.unhandled_lines = unhandled_lines
+
+        # Reason each checked function can't be exported, None if it can
+        # Dictionary of {Function Name: str or None}
+        self.reasons = {}
+
+    def get_reason(self, name):
+        """
+        Finds why a function can't be exported
+
+        Parameters
+        ----------
+        name : str
+            Name of the function
+
+        Returns
+        -------
+        str or None
+            The reason, None if the function and every script function it
+            calls translated cleanly
+        """
+        if name not in self.reasons:
+            # Recursive calls are assumed to be fine while the function is
+            # being checked
+            self.reasons[name] = None
+            self.reasons[name] = self.check_function(name)
+        return self.reasons[name]
+
+    def check_function(self, name):
+        """
+        Checks a single function, see get_reason
+        """
+        node = self.nodes.get(name)
+        function = self.cpp_file.functions.get(name)
+        if node is None or function is None:
+            return "not translated"
+        if len(node.decorator_list) > 0:
+            return "decorated"
+        for lineno, reason in self.unhandled_lines:
+            if node.lineno <= lineno <= node.end_lineno:
+                return "line " + str(lineno) + ": " + reason
+        try:
+            function.get_c_interface()
+        except pcex.TranslationNotSupported as ex:
+            return ex.reason
+
+        for child in ast.walk(node):
+            if child.__class__ is ast.Call and child.func.__class__ is ast.Name:
+                # The compiled output would interleave with python's buffered
+                # output in the wrong order
+                if child.func.id == "print":
+                    return "prints"
+                if child.func.id in self.nodes and self.get_reason(child.func.id) is not None:
+                    return "calls " + child.func.id + ", which can't be compiled"
+        return None
+
+    def get_dependencies(self, names):
+        """
+        Finds the script functions a set of functions needs, including
+        themselves
+
+        Parameters
+        ----------
+        names : list of str
+            The functions to export
+
+        Returns
+        -------
+        list of str
+            Every function that has to be in the library, in script order
+        """
+        needed = set()
+        pending = list(names)
+        while len(pending) > 0:
+            name = pending.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            for child in ast.walk(self.nodes[name]):
+                if child.__class__ is ast.Call and child.func.__class__ is ast.Name \
+                        and child.func.id in self.nodes:
+                    pending.append(child.func.id)
+        return [name for name in self.nodes if name in needed]
+
+
+def write_shim(out, script_path, raw_lines, nodes, cpp_file, exported, library_name):
+    """
+    Writes a copy of the script that replaces each exported function with a
+    wrapper around the library right after it's defined
+
+    Parameters
+    ----------
+    out : io.TextIOBase
+        Stream to write the shim to
+    script_path : str
+        The original script
+    raw_lines : list of str
+        Lines of the original script
+    nodes : dict of {str: ast.FunctionDef}
+        The functions defined at the top of the script
+    cpp_file : CPPFile
+        The translation of the script
+    exported : list of str
+        Functions to replace
+    library_name : str
+        File name of the library, which sits next to the shim
+    """
+    out.write(SHIM_HEADER.format(script=os.path.basename(script_path),
+                                 names=", ".join(exported), library=library_name))
+    # Dictionary of {Last Line Number: Replacement Statement}
+    replacements = {}
+    for name in exported:
+        function = cpp_file.functions[name]
+        parameter_types = []
+        for key, parameter in function.parameters.items():
+            if key in function.vectors:
+                parameter_types.append("list[" + function.vectors[key].get_py_element_type() + "]")
+            else:
+                parameter_types.append(parameter.py_var_type[0])
+        replacements[nodes[name].end_lineno] = (
+            name + " = _pyc_accelerate(" + name + ", "
+            + repr(cfun.CPPFunction.c_symbol_prefix + name) + ", "
+            + repr(function.return_type[0]) + ", " + repr(parameter_types) + ")")
+    for lineno, line in enumerate(raw_lines, 1):
+        out.write(line + "\n")
+        if lineno in replacements:
+            out.write(replacements[lineno] + "\n")
+
+
+def build_library(compiler, cpp_file, selector, exported, output_path, stem):
+    """
+    Writes and compiles the library exporting some functions
+
+    Parameters
+    ----------
+    compiler : CppCompiler
+        Compiler set up to build shared libraries
+    cpp_file : CPPFile
+        The translation of the script
+    selector : FunctionSelector
+        Selector the functions were checked with
+    exported : list of str
+        Functions to export
+    output_path : str
+        Directory to write the library to
+    stem : str
+        Name the C++ file and library are based on
+
+    Returns
+    -------
+    CompileResult
+        The build of the library
+    """
+    with open(os.path.join(output_path, stem + ".cpp"), "w") as library_file:
+        cpp_file.write_library_text(library_file, exported=exported,
+                                    included=selector.get_dependencies(exported))
+    return compiler.build(output_path, "lib" + stem + ".so")
+
+
+def accelerate(script_path, output_path, argv=None, min_share=MIN_SHARE,
+               profile="release", compiler=None):
+    """
+    Profiles a script and compiles its hot functions into a library loaded
+    by a shim script
+
+    Parameters
+    ----------
+    script_path : str
+        The script to accelerate
+    output_path : str
+        Directory to write the library and shim to
+    argv : list of str or None
+        Arguments of the representative run the script is profiled with
+    min_share : float
+        Fraction of the run a function has to take to be compiled
+    profile : str
+        Build profile from cppcompiler.PROFILES
+    compiler : str or None
+        Compiler to use, g++ or clang++ if None
+
+    Returns
+    -------
+    HybridResult
+        The functions compiled and left as python
+
+    Raises
+    ------
+    CompilerNotFound
+        If the compiler can't be found
+    """
+    builder = cppcompiler.CppCompiler(compiler, profile,
+                                      extra_flags=cppcompiler.SHARED_FLAGS)
+    timings, error = profile_functions(script_path, argv)
+    if error is not None:
+        # A run that didn't finish says nothing about where time goes
+        return HybridResult(script_path, timings, [],
+                            {name: "profiling run failed, " + error
+                             for name in timings or ["<module>"]})
+    hot = find_hot_functions(timings, min_share)
+    if len(hot) == 0:
+        return HybridResult(script_path, timings, [], {})
+
+    with open(script_path, "r") as script:
+        source = script.read()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Checked arithmetic lets the shim fall back to python where a C++
+        # int would overflow
+        translator = pytranslator.PyTranslator(script_path, os.path.join(work_dir, ""),
+                                               {"checked_ints": True})
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                translator.run()
+        except Exception as ex:
+            return HybridResult(script_path, timings, [],
+                                {name: "translation failed, " + type(ex).__name__
+                                 for name in hot})
+    cpp_file = translator.output_files[0]
+    selector = FunctionSelector(ast.parse(source), cpp_file,
+                                translator.analyzer.unhandled_lines)
+
+    rejected = {}
+    selected = []
+    for name in hot:
+        reason = selector.get_reason(name)
+        if reason is None:
+            selected.append(name)
+        else:
+            rejected[name] = reason
+
+    # Anything the translator got wrong only shows up when compiling, so
+    # when the library fails each function is tried on its own
+    stem = os.path.splitext(os.path.basename(script_path))[0] + "_hybrid"
+    os.makedirs(output_path, exist_ok=True)
+    build = None
+    if len(selected) > 0:
+        build = build_library(builder, cpp_file, selector, selected, output_path, stem)
+        if not build.success:
+            compiled = []
+            for name in selected:
+                with tempfile.TemporaryDirectory() as trial_dir:
+                    if build_library(builder, cpp_file, selector, [name], trial_dir,
+                                     stem).success:
+                        compiled.append(name)
+                    else:
+                        rejected[name] = "doesn't compile"
+            selected = compiled
+            if len(selected) > 0:
+                build = build_library(builder, cpp_file, selector, selected,
+                                      output_path, stem)
+    if len(selected) == 0:
+        return HybridResult(script_path, timings, [], rejected, build=build)
+
+    shim_path = os.path.join(output_path, stem + ".py")
+    with open(shim_path, "w") as shim:
+        write_shim(shim, script_path, source.splitlines(), selector.nodes, cpp_file,
+                   selected, os.path.basename(build.binary_path))
+    return HybridResult(script_path, timings, selected, rejected, shim_path,
+                        build.binary_path, build)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the hot functions of a script")
+    parser.add_argument("script", help="Script to accelerate")
+    parser.add_argument("script_args", nargs="*",
+                        help="Arguments of the representative run, after --")
+    parser.add_argument("-o", "--output", default="hybrid/",
+                        help="Directory to write the library and shim to")
+    parser.add_argument("--min-share", type=float, default=MIN_SHARE,
+                        help="Fraction of the run a function has to take to be compiled")
+    parser.add_argument("--profile", default="release", choices=list(cppcompiler.PROFILES),
+                        help="Build profile to compile the library with")
+    parser.add_argument("--compiler", default=None,
+                        help="Compiler to use, g++ or clang++ if not given")
+    args = parser.parse_args(argv)
+
+    try:
+        result = accelerate(args.script, args.output, args.script_args,
+                            args.min_share, args.profile, args.compiler)
+    except pcex.CompilerNotFound as ex:
+        print(ex.reason)
+        return 1
+    print(result.format_report())
+    return 0 if result.shim_path is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from modules import translationcache
+
+# Name of the snapshot file kept in the output directory
+SNAPSHOT_FILE_NAME = ".pycatalyst-snapshots.json"
+
+
+class FunctionSnapshotStore():
+    """
+    Stores the analysed state of every function in a script between runs so
+    functions whose source hasn't changed can be restored instead of analysed
+    again. Each snapshot is keyed by the function name and holds a hash of the
+    function's source lines
+    """
+
+    def __init__(self, path, options=None):
+        """
+        Constructs a FunctionSnapshotStore, loading any snapshots saved by a
+        previous run. Snapshots from a different translator version or
+        different options are discarded
+
+        Parameters
+        ----------
+        path : str
+            File the snapshots are saved to
+        options : dict or None
+            Translation options the snapshots are valid for
+        """
+        self.path = path
+        self.header = {"translator": translationcache.translator_fingerprint(),
+                       "options": options or {}}
+
+        # Dictionary of {Function Name: Snapshot Dictionary}
+        self.functions = {}
+
+        # Anything besides its own source a function's translation depends
+        # on for this run, such as constants propagated into it. Mixed into
+        # the function's hash
+        # Dictionary of {Function Name: str}
+        self.extra_inputs = {}
+        try:
+            with open(path, "r") as snapshot_file:
+                data = json.load(snapshot_file)
+            if data.get("header") == json.loads(json.dumps(self.header)):
+                self.functions = data["functions"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def hash_source(node, raw_lines, extra_input=""):
+        """
+        Hashes the source lines an ast node spans. Line numbers aren't part of
+        the hash so a function that only moved still matches
+
+        Parameters
+        ----------
+        node : ast node
+            The node whose source should be hashed
+        raw_lines : list of str
+            List containing the original python script, line by line
+        extra_input : str
+            Anything else the node's translation depends on
+
+        Returns
+        -------
+        str
+            Hex digest of the node's source
+        """
+        source = "\n".join(raw_lines[node.lineno - 1:node.end_lineno])
+        return hashlib.sha256((source + "\0" + extra_input).encode()).hexdigest()
+
+    def lookup(self, node, raw_lines):
+        """
+        Finds the snapshot of a function if its source hasn't changed
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function to look up
+        raw_lines : list of str
+            List containing the original python script, line by line
+
+        Returns
+        -------
+        dict or None
+            The function's snapshot, or None if it changed or is new
+        """
+        snapshot = self.functions.get(node.name)
+        if snapshot is None or snapshot["hash"] != self.hash_source(
+                node, raw_lines, self.extra_inputs.get(node.name, "")):
+            return None
+        return snapshot
+
+    def get(self, name):
+        return self.functions.get(name)
+
+    def clear(self):
+        """
+        Removes every snapshot, used before recording a fresh set so deleted
+        functions don't linger in the file
+        """
+        self.functions = {}
+
+    def record(self, node, raw_lines, snapshot):
+        """
+        Stores the snapshot of a function
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function the snapshot belongs to
+        raw_lines : list of str
+            List containing the original python script, line by line
+        snapshot : dict
+            The function's analysed state from PyAnalyzer.snapshot_function
+        """
+        snapshot["hash"] = self.hash_source(node, raw_lines,
+                                            self.extra_inputs.get(node.name, ""))
+        self.functions[node.name] = snapshot
+
+    def save(self):
+        """
+        Writes the snapshots to disk, replacing the previous file atomically
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "w") as snapshot_file:
+            json.dump({"header": self.header, "functions": self.functions},
+                      snapshot_file)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,199 @@
+import time
+import tracemalloc
+
+
+class PhaseProfiler():
+    """
+    Opt-in instrumentation for a translation. Records the wall time, CPU time
+    and peak traced memory of every phase PyTranslator.run goes through, and
+    how many nodes of each ast type PyAnalyzer handled along with the time
+    spent in their handlers
+
+    Used as a context manager around the translation:
+
+        profiler = PhaseProfiler()
+        with profiler:
+            PyTranslator(script_path, output_path, profiler=profiler).run()
+        report = profiler.report()
+    """
+
+    def __init__(self, trace_memory=True, count_nodes=True, callback=None):
+        """
+        Constructs a PhaseProfiler
+
+        Parameters
+        ----------
+        trace_memory : bool
+            Whether to record peak memory with tracemalloc. This slows every
+            allocation down, so times taken with it on are inflated
+        count_nodes : bool
+            Whether to count the ast nodes handled and time their handlers
+        callback : callable or None
+            Called with the report when the profiled block exits
+        """
+        self.trace_memory = trace_memory
+        self.count_nodes = count_nodes
+        self.callback = callback
+
+        # Dictionary of {Phase Name: {"calls": int, "wall_seconds": float,
+        # "cpu_seconds": float, "peak_bytes": int}}
+        self.phases = {}
+
+        # Dictionary of {Node Type Name: {"count": int, "total_seconds":
+        # float, "self_seconds": float}}
+        self.nodes = {}
+
+        # Peak memory seen so far by each phase that is still running, since
+        # nested phases reset the tracemalloc peak
+        self.phase_peaks = []
+
+        # Time spent in nested handlers for every handler still running, so
+        # each handler's own time can be told apart from its children's
+        self.handler_child_times = []
+
+        self.started_tracing = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        if self.callback is not None and exc_type is None:
+            self.callback(self.report())
+        return False
+
+    def measure(self, name, phase, *args):
+        """
+        Runs a phase, recording its time and memory. Phases can be nested and
+        phases run more than once accumulate
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase
+        phase : callable
+            Function performing the phase
+        *args
+            Arguments to pass to the phase
+
+        Returns
+        -------
+        Whatever the phase returns
+        """
+        # Phases are listed in the order they started
+        record = self.phases.get(name)
+        if record is None:
+            record = {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                      "peak_bytes": 0}
+            self.phases[name] = record
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            if len(self.phase_peaks) > 0:
+                self.phase_peaks[-1] = max(self.phase_peaks[-1],
+                                           tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.phase_peaks.append(0)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            return phase(*args)
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            peak_bytes = self.phase_peaks.pop()
+            if tracing:
+                peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1])
+                if len(self.phase_peaks) > 0:
+                    self.phase_peaks[-1] = max(self.phase_peaks[-1], peak_bytes)
+
+            record["calls"] += 1
+            record["wall_seconds"] += wall_seconds
+            record["cpu_seconds"] += cpu_seconds
+            record["peak_bytes"] = max(record["peak_bytes"], peak_bytes)
+
+    def call_handler(self, node, handler, *args):
+        """
+        Calls the handler of an ast node, counting the node and timing the
+        handler. The total time includes nodes the handler translates itself,
+        such as the arguments of a call, while the self time doesn't
+
+        Parameters
+        ----------
+        node : ast node
+            The node being handled
+        handler : callable
+            The handler to call
+        *args
+            Arguments to pass to the handler
+
+        Returns
+        -------
+        Whatever the handler returns
+        """
+        self.handler_child_times.append(0.0)
+        start = time.perf_counter()
+        try:
+            return handler(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            child_seconds = self.handler_child_times.pop()
+            if len(self.handler_child_times) > 0:
+                self.handler_child_times[-1] += seconds
+
+            name = node.__class__.__name__
+            record = self.nodes.get(name)
+            if record is None:
+                record = {"count": 0, "total_seconds": 0.0, "self_seconds": 0.0}
+                self.nodes[name] = record
+            record["count"] += 1
+            record["total_seconds"] += seconds
+            record["self_seconds"] += seconds - child_seconds
+
+    def report(self):
+        """
+        Builds a report of everything recorded so far
+
+        Returns
+        -------
+        dict
+            The phase measurements under "phases" and the node counters under
+            "nodes", ready to be dumped as JSON
+        """
+        return {"phases": {name: dict(record) for name, record in self.phases.items()},
+                "nodes": {name: dict(record) for name, record in self.nodes.items()}}
+
+    def format_report(self):
+        """
+        Formats the report as a human readable table, with node types sorted
+        by the time spent in their own handlers
+
+        Returns
+        -------
+        str
+            The report text
+        """
+        lines = ["{:<24} {:>10} {:>10} {:>10}".format("Phase", "Wall (ms)",
+                                                      "CPU (ms)", "Peak (KB)")]
+        for name, record in self.phases.items():
+            lines.append("{:<24} {:>10.2f} {:>10.2f} {:>10.1f}".format(
+                name, record["wall_seconds"] * 1000, record["cpu_seconds"] * 1000,
+                record["peak_bytes"] / 1024))
+
+        if len(self.nodes) > 0:
+            lines.append("")
+            lines.append("{:<24} {:>10} {:>10} {:>10}".format("Node", "Count",
+                                                              "Total (ms)",
+                                                              "Self (ms)"))
+            for name, record in sorted(self.nodes.items(),
+                                       key=lambda item: -item[1]["self_seconds"]):
+                lines.append("{:<24} {:>10} {:>10.2f} {:>10.2f}".format(
+                    name, record["count"], record["total_seconds"] * 1000,
+                    record["self_seconds"] * 1000))
+        return "\n".join(lines)
@@ -1,3 +1,42 @@
+# Characters that need escaping inside C++ string and character literals
+escape_map = {"\\": "\\\\", "\"": "\\\"", "'": "\\'", "\n": "\\n",
+              "\t": "\\t", "\r": "\\r", "\0": "\\0"}
+
+
+def string_literal(value):
+    """
+    Converts a python string to a C++ string literal
+
+    Parameters
+    ----------
+    value : str
+        The string to convert
+
+    Returns
+    -------
+    str
+        The C++ string literal, including the quotes
+    """
+    return "\"" + "".join(escape_map.get(char, char) for char in value) + "\""
+
+
+def char_literal(value):
+    """
+    Converts a single character python string to a C++ character literal
+
+    Parameters
+    ----------
+    value : str
+        The character to convert
+
+    Returns
+    -------
+    str
+        The C++ character literal, including the quotes
+    """
+    return "'" + escape_map.get(value, value) + "'"
+
+
 def print_translation(args):
     """
     Parses calls to print to convert to the C++ equivalent
@@ -21,6 +60,44 @@ def print_translation(args):
     return return_str + args[-1] + " << std::endl"
 
 
+def fast_print_translation(args, sep="' '", end="'\\n'", flush=False):
+    """
+    Parses calls to print to convert to a C++ equivalent that streams every
+    argument separately and doesn't flush unless asked to, avoiding the
+    temporary strings and flushes of print_translation
+
+    Parameters
+    ----------
+    args : list of str
+        List of arguments to add to the print statement
+    sep : str or None
+        C++ expression written between arguments, None to write nothing
+    end : str or None
+        C++ expression written after the arguments, None to write nothing
+    flush : bool
+        Whether to flush the stream afterwards
+
+    Returns
+    -------
+    str
+        The converted print statement
+    """
+    operands = []
+    for arg in args:
+        if len(operands) > 0 and sep is not None:
+            operands.append(sep)
+        operands.append(arg)
+    if end is not None:
+        operands.append(end)
+    if flush:
+        operands.append("std::flush")
+
+    # Printing nothing at all is a no-op, but still needs to be a statement
+    if len(operands) == 0:
+        return "std::cout"
+    return "std::cout << " + " << ".join(operands)
+
+
 def sqrt_translation(args):
     """
     Parses calls to sqrt to convert to the C++ equivalent
@@ -35,4 +112,218 @@ def sqrt_translation(args):
     str
         The converted sqrt statement
     """
-    return "sqrt(" + args[0] + ")"
\ No newline at end of file
+    return "sqrt(" + args[0] + ")"
+
+# C++ helpers generated code can call to keep python semantics where the C++
+# operator differs. Dictionary of {Helper Name: (Include Files, Definition)}
+helper_functions = {
+    "pyc_floordiv": ([], """inline int pyc_floordiv(int a, int b)
+{
+    // Python rounds towards negative infinity, C++ towards zero
+    int quotient = a / b;
+    if ((a % b != 0) && ((a < 0) != (b < 0)))
+    {
+        quotient--;
+    }
+    return quotient;
+}"""),
+    "pyc_mod": ([], """inline int pyc_mod(int a, int b)
+{
+    // Python gives the remainder the sign of the divisor
+    int remainder = a % b;
+    if (remainder != 0 && ((remainder < 0) != (b < 0)))
+    {
+        remainder += b;
+    }
+    return remainder;
+}"""),
+    # Versions for operands whose types are only known to the C++ compiler
+    "pyc_floordiv_any": (["cmath", "type_traits"], """template <typename A, typename B>
+auto pyc_floordiv_any(A a, B b)
+{
+    if constexpr (std::is_integral_v<A> && std::is_integral_v<B>)
+    {
+        // Python rounds towards negative infinity, C++ towards zero
+        auto quotient = a / b;
+        if ((a % b != 0) && ((a < 0) != (b < 0)))
+        {
+            quotient--;
+        }
+        return quotient;
+    }
+    else
+    {
+        return std::floor(a / b);
+    }
+}"""),
+    "pyc_mod_any": (["cmath", "type_traits"], """template <typename A, typename B>
+auto pyc_mod_any(A a, B b)
+{
+    // Python gives the remainder the sign of the divisor
+    if constexpr (std::is_integral_v<A> && std::is_integral_v<B>)
+    {
+        auto remainder = a % b;
+        if (remainder != 0 && ((remainder < 0) != (b < 0)))
+        {
+            remainder += b;
+        }
+        return remainder;
+    }
+    else
+    {
+        auto remainder = std::fmod(a, b);
+        if (remainder != 0 && ((remainder < 0) != (b < 0)))
+        {
+            remainder += b;
+        }
+        return remainder;
+    }
+}"""),
+    "pyc_concat": (["string", "string_view"], """template <typename... Parts>
+std::string pyc_concat(const Parts&... parts)
+{
+    // Sizing every part first allocates the result once instead of once
+    // per temporary
+    std::string result;
+    result.reserve((std::string_view(parts).size() + ...));
+    (result.append(parts), ...);
+    return result;
+}"""),
+    "pyc_fmod": (["cmath"], """inline double pyc_fmod(double a, double b)
+{
+    // Python gives the remainder the sign of the divisor
+    double remainder = std::fmod(a, b);
+    if (remainder != 0 && ((remainder < 0) != (b < 0)))
+    {
+        remainder += b;
+    }
+    return remainder;
+}"""),
+    # Arithmetic that notes when python's result would differ from the C++
+    # one, so whoever called the compiled code can run python instead
+    "pyc_checked": (["climits"], """// Set when an int overflowed, was divided by zero or a float didn't fit an
+// int. Cleared by whoever checks it
+inline thread_local bool pyc_overflowed = false;
+
+inline int pyc_checked_add(int a, int b)
+{
+    int result;
+    pyc_overflowed |= __builtin_add_overflow(a, b, &result);
+    return result;
+}
+
+inline int pyc_checked_sub(int a, int b)
+{
+    int result;
+    pyc_overflowed |= __builtin_sub_overflow(a, b, &result);
+    return result;
+}
+
+inline int pyc_checked_mul(int a, int b)
+{
+    int result;
+    pyc_overflowed |= __builtin_mul_overflow(a, b, &result);
+    return result;
+}
+
+inline int pyc_checked_neg(int a)
+{
+    return pyc_checked_sub(0, a);
+}
+
+inline int pyc_checked_shl(int a, int b)
+{
+    if (b < 0 || b >= 31 || a > (INT_MAX >> b) || a < (INT_MIN >> b))
+    {
+        pyc_overflowed = true;
+        return 0;
+    }
+    return a << b;
+}
+
+inline int pyc_checked_ipow(int base, int exponent)
+{
+    // Exponentiation by squaring, exponent must not be negative
+    int result = 1;
+    while (exponent > 0)
+    {
+        if (exponent & 1)
+        {
+            result = pyc_checked_mul(result, base);
+        }
+        exponent >>= 1;
+        if (exponent > 0)
+        {
+            base = pyc_checked_mul(base, base);
+        }
+    }
+    return result;
+}
+
+inline int pyc_checked_floordiv(int a, int b)
+{
+    if (b == 0 || (a == INT_MIN && b == -1))
+    {
+        pyc_overflowed = true;
+        return 0;
+    }
+    // Python rounds towards negative infinity, C++ towards zero
+    int quotient = a / b;
+    if ((a % b != 0) && ((a < 0) != (b < 0)))
+    {
+        quotient--;
+    }
+    return quotient;
+}
+
+inline int pyc_checked_mod(int a, int b)
+{
+    if (b == 0)
+    {
+        pyc_overflowed = true;
+        return 0;
+    }
+    if (b == -1)
+    {
+        return 0;
+    }
+    // Python gives the remainder the sign of the divisor
+    int remainder = a % b;
+    if (remainder != 0 && ((remainder < 0) != (b < 0)))
+    {
+        remainder += b;
+    }
+    return remainder;
+}
+
+inline int pyc_checked_int(double value)
+{
+    // Also false for NaN
+    if (!(value > INT_MIN - 1.0 && value < INT_MAX + 1.0))
+    {
+        pyc_overflowed = true;
+        return 0;
+    }
+    return (int)value;
+}"""),
+    "pyc_ipow": ([], """inline int pyc_ipow(int base, int exponent)
+{
+    // Exponentiation by squaring, exponent must not be negative
+    int result = 1;
+    while (exponent > 0)
+    {
+        if (exponent & 1)
+        {
+            result *= base;
+        }
+        exponent >>= 1;
+        // Only square when another bit needs it, so it can't overflow
+        // when the result doesn't
+        if (exponent > 0)
+        {
+            base *= base;
+        }
+    }
+    return result;
+}"""),
+}
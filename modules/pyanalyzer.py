@@ -1,6 +1,9 @@
 import ast
+import io
+import sys
 from modules import pycatalystexceptions as pcex
 from modules import portedfunctions as pf
+from modules import typeinference
 
 class PyAnalyzer():
     """
@@ -19,6 +22,19 @@ class PyAnalyzer():
                     "Invert": "~", "UAdd": "+", "USub": "-", "And": " && ",
                     "Or": " || "
                     }
+    # Operators with a C++ compound assignment, used for augmented assignment
+    compound_operator_map = {"Add": " += ", "Sub": " -= ", "Mult": " *= ",
+                             "BitOr": " |= ", "BitAnd": " &= ", "BitXor": " ^= ",
+                             "LShift": " <<= ", "RShift": " >>= "}
+
+    # Largest constant integer power written out as repeated multiplication
+    max_multiplied_power = 4
+
+    # Integer operators that can overflow, translated to the helpers noting
+    # it when the checked_ints option is set
+    # Dictionary of {Operator: Helper Suffix}
+    checked_operators = {"Add": "add", "Sub": "sub", "Mult": "mul", "LShift": "shl"}
+
     # Tuple of all functions we have a special conversion from python to C++
     ported_functions = ("print", "sqrt")
     
@@ -30,7 +46,8 @@ class PyAnalyzer():
                       "LtE": " <= ", "Gt": " > ", "GtE": " >= "
                       }
     
-    def __init__(self, output_files, raw_lines):
+    def __init__(self, output_files, raw_lines, snapshots=None,
+                 profiler=None, options=None):
         """
         Initializes an object that will recurse through an AST to convert
         python code text to objects representing C++ code
@@ -42,10 +59,79 @@ class PyAnalyzer():
             analysis
         raw_lines : list of str
             List containing the original python script, line by line
+        snapshots : FunctionSnapshotStore or None
+            Snapshots of functions from a previous run. Unchanged functions
+            are restored from these instead of being analyzed again
+        profiler : PhaseProfiler or None
+            Records the analysis phases and the time spent on each node type
+        options : dict or None
+            Translation options that affect the generated code
         """
         self.output_files = output_files
 
         self.raw_lines = raw_lines
+
+        self.snapshots = snapshots
+
+        self.profiler = profiler
+
+        self.options = options or {}
+
+        # Names of functions restored from a snapshot during this run
+        self.reused_functions = set()
+
+        # Names of functions that must be analyzed even if their snapshot
+        # matches, because something they depend on changed
+        self.stale_functions = set()
+
+        # Parameter types of each function right before its body is analyzed
+        # Dictionary of {Function Name: [type_string]}
+        self.entry_param_types = {}
+
+        # Calls to self written functions made from each function body
+        # Dictionary of {Function Name: [(Called Function, [type_string])]}
+        self.recorded_calls = {}
+
+        # Include files each function body needed, in the order first used
+        # Dictionary of {Function Name: [Include File]}
+        self.recorded_includes = {}
+
+        # Helper functions each function body needed, in the order first used
+        # Dictionary of {Function Name: [Helper Name]}
+        self.recorded_helpers = {}
+
+        # Statements left untranslated during this analysis, the output
+        # doesn't do everything the script does if there are any
+        # List of (Line Number, Reason)
+        self.unhandled_lines = []
+
+        # Parameters whose types were settled by type inference before any
+        # body was analyzed, which calls must no longer change
+        # Dictionary of {Function Name: set of Parameter Name}
+        self.inferred_parameters = {}
+
+        # Integer variables known to never be negative in each function, such
+        # as counters of loops over range with a non-negative start
+        # Dictionary of {Function Name: set of Variable Name}
+        self.non_negative_names = {}
+
+        # Loops inside the body of another loop, which run more than once
+        # Set of ast.For and ast.While
+        self.nested_loops = set()
+
+        # Handlers looked up by node class rather than by building the
+        # handler name for every node
+        self.statement_handlers, self.expression_handlers = \
+            type(self).get_dispatch_tables()
+
+        # Work still to be done by the statement traversal. None when no
+        # traversal is running
+        self.pending_tasks = None
+
+        # Results of sub expressions evaluated ahead of the expression that
+        # uses them. Dictionary of {ast node: (str, [str])}
+        self.expression_results = {}
+        self.expression_depth = 0
         
     def analyze(self, tree, file_index, function_key, indent):
         """
@@ -63,8 +149,17 @@ class PyAnalyzer():
         indent : int
             How much indentation a line should have
         """
-        self.pre_analysis(tree, file_index, indent)
-        self.analyze_tree(tree, file_index, function_key, indent)
+        self.output_files[file_index].functions[function_key].single_assignments = \
+            self.find_single_assignments(tree)
+        self.nested_loops = self.find_nested_loops(tree)
+        if self.profiler is None:
+            self.pre_analysis(tree, file_index, indent)
+            self.analyze_tree(tree, file_index, function_key, indent)
+        else:
+            self.profiler.measure("pre_analysis", self.pre_analysis, tree,
+                                  file_index, indent)
+            self.profiler.measure("body_analysis", self.analyze_tree, tree,
+                                  file_index, function_key, indent)
         
         
     def pre_analysis(self, tree, file_index, indent):
@@ -86,11 +181,250 @@ class PyAnalyzer():
         for node in tree:
             if node.__class__ is ast.FunctionDef:
                 self.parse_function_header(node,file_index)
+
+        # Then the types flowing between them so bodies are analyzed with
+        # their final parameter types
+        if self.profiler is None:
+            self.infer_types(tree, file_index)
+        else:
+            self.profiler.measure("type_inference", self.infer_types, tree,
+                                  file_index)
         
         # Now we'll parse the bodies of the functions
         for node in tree:
             if node.__class__ is ast.FunctionDef:
-                self.analyze_tree(node.body, file_index, node.name, indent)
+                function = self.output_files[file_index].functions.get(node.name)
+                if function is not None:
+                    self.entry_param_types[node.name] = \
+                        [param.py_var_type[0] for param in function.parameters.values()]
+                if not self.restore_function(node, file_index):
+                    self.analyze_tree(node.body, file_index, node.name, indent)
+
+    def infer_types(self, tree, file_index):
+        """
+        Infers the parameter and return types of every function over the
+        whole script and applies them to the function headers. Parameters
+        that come out with a single concrete type are declared with it,
+        parameters passed conflicting types are left as auto
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            List containing ast nodes from ast.parse
+        file_index : int
+            Index of the file the functions are stored in
+        """
+        functions = self.output_files[file_index].functions
+        nodes = {node.name: node for node in tree
+                 if node.__class__ is ast.FunctionDef and node.name in functions}
+        inferencer = typeinference.TypeInferencer(nodes, tree)
+        inferencer.infer()
+
+        for name in nodes:
+            function = functions[name]
+            inferred = set()
+            for param_name, param in function.parameters.items():
+                param_type = inferencer.get_declared_type(
+                    inferencer.parameter_types[name][param_name])
+                # Parameters nothing was learned about are still narrowed by
+                # the calls the analysis finds
+                if param_type is not None:
+                    param.py_var_type[0] = param_type
+                    inferred.add(param_name)
+
+                # Lists of one element type are passed as vectors, so loops
+                # and indexing in the body know what they hold
+                element_type = inferencer.get_declared_element_type(
+                    inferencer.parameter_types[name][param_name])
+                if element_type is not None:
+                    self.add_include_file(file_index, name, "vector")
+                    if param_name not in function.mutated_parameters:
+                        self.add_include_file(file_index, name, "span")
+                    function.vectors[param_name] = cvec.CPPVector(
+                        param_name, cvar.CPPVariable.types[element_type].strip())
+            self.inferred_parameters[name] = inferred
+
+            # Calls analyzed before the body they call get its return type
+            # from here instead of the placeholder
+            return_type = inferencer.get_declared_type(inferencer.return_types[name])
+            if return_type in typeinference.SCALAR_TYPES:
+                function.return_type = [return_type]
+
+    def find_called_functions(self, node, file_index):
+        """
+        Finds every name called within a function body and the return type of
+        the self written function it refers to
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function to search through
+        file_index : int
+            Index of the file the functions are stored in
+
+        Returns
+        -------
+        dict of {str: str or None}
+            Dictionary of {Called Name: Return Type}, where the return type is
+            None if the name isn't a self written function
+        """
+        functions = self.output_files[file_index].functions
+        called = {}
+        for child in ast.walk(node):
+            if child.__class__ is ast.Call and child.func.__class__ is ast.Name:
+                name = child.func.id
+                if name in functions and name != "0":
+                    called[name] = functions[name].return_type[0]
+                else:
+                    called[name] = None
+        return called
+
+    def snapshot_function(self, node, file_index):
+        """
+        Captures the analyzed state of a function so it can be restored on a
+        later run without analyzing it again
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function to capture
+        file_index : int
+            Index of the file the function is stored in
+
+        Returns
+        -------
+        dict
+            The function's state represented as a dictionary
+        """
+        function = self.output_files[file_index].functions[node.name]
+        return {"lineno": node.lineno,
+                "entry_params": self.entry_param_types[node.name],
+                "final_params": [param.py_var_type[0]
+                                 for param in function.parameters.values()],
+                "return_type": function.return_type[0],
+                "callees": self.find_called_functions(node, file_index),
+                "calls": self.recorded_calls.get(node.name, []),
+                "includes": self.recorded_includes.get(node.name, []),
+                "helpers": self.recorded_helpers.get(node.name, []),
+                "lines": [line.to_dict() for line in function.lines.values()],
+                "variables": [variable.to_dict()
+                              for variable in function.variables.values()],
+                "vectors": [vector.to_dict()
+                            for vector in function.vectors.values()]}
+
+    def record_snapshots(self, tree, file_index):
+        """
+        Stores a snapshot of every translated function in the snapshot store
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            List containing ast nodes from ast.parse
+        file_index : int
+            Index of the file the functions are stored in
+        """
+        self.snapshots.clear()
+        for node in tree:
+            if node.__class__ is ast.FunctionDef \
+                    and node.name in self.entry_param_types:
+                self.snapshots.record(node, self.raw_lines,
+                                      self.snapshot_function(node, file_index))
+
+    def restore_function(self, node, file_index):
+        """
+        Restores a function from its snapshot if its source and everything it
+        depends on are unchanged
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function to restore
+        file_index : int
+            Index of the file the function is stored in
+
+        Returns
+        -------
+        bool
+            True if the function was restored and doesn't need analyzing
+        """
+        if self.snapshots is None or node.name in self.stale_functions:
+            return False
+        snapshot = self.snapshots.lookup(node, self.raw_lines)
+        functions = self.output_files[file_index].functions
+        if snapshot is None or node.name not in functions:
+            return False
+
+        # The body was translated with the parameter types it had on entry,
+        # so those need to match
+        if self.entry_param_types[node.name] != snapshot["entry_params"]:
+            return False
+
+        # A call can only be translated if the function it calls exists
+        for name, return_type in snapshot["callees"].items():
+            if (name in functions and name != "0") != (return_type is not None):
+                return False
+
+        function = functions[node.name]
+        for include in snapshot["includes"]:
+            self.add_include_file(file_index, node.name, include)
+        for helper in snapshot["helpers"]:
+            self.add_helper(file_index, node.name, helper)
+        line_offset = node.lineno - snapshot["lineno"]
+        for line_data in snapshot["lines"]:
+            line = cline.CPPCodeLine.from_dict(line_data, line_offset)
+            function.lines[line.start_line_num] = line
+        for variable_data in snapshot["variables"]:
+            variable = cvar.CPPVariable.from_dict(variable_data, line_offset)
+            function.variables[variable.name] = variable
+        for vector_data in snapshot["vectors"]:
+            vector = cvec.CPPVector.from_dict(vector_data, line_offset)
+            function.vectors[vector.name] = vector
+        function.return_type = cvar.TypeCell.get(snapshot["return_type"])
+
+        # Replay the calls the body made so the parameter types of the called
+        # functions are updated just like a full analysis would
+        for name, arg_types in snapshot["calls"]:
+            inferred = self.inferred_parameters.get(name, ())
+            for (param_name, param), passed_type in zip(
+                    functions[name].parameters.items(), arg_types):
+                if param_name not in inferred:
+                    param.py_var_type[0] = self.type_precedence(param.py_var_type,
+                                                                [passed_type])[0]
+        self.recorded_calls[node.name] = snapshot["calls"]
+        self.reused_functions.add(node.name)
+        return True
+
+    def find_stale_functions(self, file_index):
+        """
+        Checks whether any restored function ended up with different types
+        around it than when its snapshot was taken, meaning it has to be
+        analyzed again
+
+        Parameters
+        ----------
+        file_index : int
+            Index of the file the functions are stored in
+
+        Returns
+        -------
+        set of str
+            Names of restored functions that are out of date
+        """
+        functions = self.output_files[file_index].functions
+        stale = set()
+        for name in self.reused_functions:
+            snapshot = self.snapshots.get(name)
+            final_params = [param.py_var_type[0]
+                            for param in functions[name].parameters.values()]
+            if final_params != snapshot["final_params"]:
+                stale.add(name)
+                continue
+            for called_name, return_type in snapshot["callees"].items():
+                if return_type is not None \
+                        and functions[called_name].return_type[0] != return_type:
+                    stale.add(name)
+                    break
+        return stale
                 
     def parse_function_header(self,node,file_index):
         """
@@ -132,7 +466,7 @@ class PyAnalyzer():
                 # Special handler for strings since their value needs to be
                 # wrapped in quotes
                 if default_type[0] == "str":
-                    params[name] = cvar.CPPVariable(name + "=\"" + default.value + "\"",
+                    params[name] = cvar.CPPVariable(name + "=" + pf.string_literal(default.value),
                                                     -1, default_type)
                 else:
                     params[name] = cvar.CPPVariable(name + "=" + str(default.value),
@@ -142,13 +476,168 @@ class PyAnalyzer():
 
         func_ref[node.name] = cfun.CPPFunction(node.name, node.lineno,
                                                node.end_lineno, params)
+        func_ref[node.name].mutated_parameters = self.find_mutated_names(node.body,
+                                                                         params)
+        func_ref[node.name].single_assignments = \
+            self.find_single_assignments(node.body) - set(params)
+
+    def find_mutated_names(self, body, names):
+        """
+        Finds which of the given names a body of code assigns to or calls
+        methods on, either of which can change the value
+
+        Parameters
+        ----------
+        body : List of ast nodes
+            The code to search
+        names : collection of str
+            The names to look for
+
+        Returns
+        -------
+        set of str
+            The names that may be changed by the body
+        """
+        mutated = set()
+        for body_node in body:
+            for child in ast.walk(body_node):
+                if child.__class__ is ast.Name:
+                    if child.id in names and child.ctx.__class__ is not ast.Load:
+                        mutated.add(child.id)
+                elif child.__class__ is ast.Attribute:
+                    if child.value.__class__ is ast.Name and child.value.id in names:
+                        mutated.add(child.value.id)
+                elif child.__class__ is ast.Subscript:
+                    if child.value.__class__ is ast.Name and child.value.id in names \
+                            and child.ctx.__class__ is not ast.Load:
+                        mutated.add(child.value.id)
+        return mutated
     
     
+    def find_nested_loops(self, body):
+        """
+        Finds the loops inside the body of another loop
+
+        Parameters
+        ----------
+        body : List of ast nodes
+            The code to search
+
+        Returns
+        -------
+        set of ast.For and ast.While
+            The nested loops
+        """
+        loop_types = (ast.For, ast.While)
+        nested = set()
+        for body_node in body:
+            for child in ast.walk(body_node):
+                if child.__class__ in loop_types:
+                    for inner in ast.walk(child):
+                        if inner is not child and inner.__class__ in loop_types:
+                            nested.add(inner)
+        return nested
+
+    def find_single_assignments(self, body):
+        """
+        Finds the names a body of code binds with a single plain assignment
+        and never binds again or changes in place. Nested functions and
+        classes are separate scopes, so they aren't searched
+
+        Parameters
+        ----------
+        body : List of ast nodes
+            The code to search
+
+        Returns
+        -------
+        set of str
+            The names assigned exactly once
+        """
+        assigned = set()
+        mutated = set()
+        # Dictionary of {Name: Number Of Bindings}
+        bindings = {}
+        stack = list(body)
+        while len(stack) > 0:
+            node = stack.pop()
+            node_type = node.__class__
+            if node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                continue
+            elif node_type is ast.Assign and len(node.targets) == 1 \
+                    and node.targets[0].__class__ is ast.Name:
+                assigned.add(node.targets[0].id)
+            elif node_type is ast.Name and node.ctx.__class__ is not ast.Load:
+                bindings[node.id] = bindings.get(node.id, 0) + 1
+            elif node_type in (ast.Attribute, ast.Subscript) \
+                    and node.value.__class__ is ast.Name:
+                # Methods may change the value and so may storing into it
+                if node_type is ast.Attribute or node.ctx.__class__ is not ast.Load:
+                    mutated.add(node.value.id)
+            stack.extend(ast.iter_child_nodes(node))
+        return {name for name in assigned
+                if bindings.get(name) == 1 and name not in mutated}
+
+    def is_literal(self, node):
+        """
+        Checks whether an expression is a number or bool literal, which a
+        variable can be initialized with at compile time
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+
+        Returns
+        -------
+        bool
+            True if the expression is a literal
+        """
+        if node.__class__ is ast.UnaryOp and node.op.__class__ in (ast.USub, ast.UAdd):
+            node = node.operand
+        return node.__class__ is ast.Constant \
+            and node.value.__class__ in (int, float, bool)
+
+    @classmethod
+    def get_dispatch_tables(cls):
+        """
+        Builds the tables mapping ast node classes to their handlers. This is
+        done once per analyzer class, so subclasses overriding handlers get
+        their own tables
+
+        Returns
+        -------
+        statement_handlers : dict of {type: function}
+            Handlers for statement nodes, taking (node, file_index,
+            function_key, indent)
+        expression_handlers : dict of {type: function}
+            Handlers for expression nodes, taking (node, file_index,
+            function_key) and returning the C++ string and type
+        """
+        tables = cls.__dict__.get("dispatch_tables")
+        if tables is None:
+            statement_handlers = {}
+            for node_class in ast.stmt.__subclasses__():
+                handler = getattr(cls, "parse_" + node_class.__name__, None)
+                if handler is not None:
+                    statement_handlers[node_class] = handler
+
+            expression_handlers = {}
+            for node_class in ast.expr.__subclasses__():
+                handler = getattr(cls, "parse_" + node_class.__name__, None)
+                if handler is not None:
+                    expression_handlers[node_class] = handler
+
+            tables = (statement_handlers, expression_handlers)
+            cls.dispatch_tables = tables
+        return tables
+
     def analyze_tree(self, tree, file_index, function_key, indent):
         """
-        Accepts an AST node body list and parses through it
-        recursively. It will look at each node and call
-        the respective functions to handle each type
+        Accepts an AST node body list and parses through it. It will look at
+        each node and call the respective functions to handle each type.
+        Nested bodies are queued on an explicit stack instead of recursing,
+        so deeply nested code can't hit the recursion limit
 
         Parameters
         ----------
@@ -161,16 +650,100 @@ class PyAnalyzer():
         indent : int
             How much indentation a line should have
         """
+        tasks = []
         for node in tree:
             # Skipping function definitions as we handled them during
             # pre-analysis
             if node.__class__ is not ast.FunctionDef:
-                # Using strategy found in ast.py built-in module
-                handler_name = "parse_" + node.__class__.__name__
-                # Will find if the function called handler_name exists,
-                # otherwise it returns parse_unhandled(fallback function)
-                handler = getattr(self, handler_name, self.parse_unhandled)
-                handler(node, file_index, function_key, indent)
+                tasks.append((self.parse_statement, node, file_index,
+                              function_key, indent))
+
+        if self.pending_tasks is not None:
+            # Called from a handler during a traversal, so the body gets run
+            # once the handler returns
+            self.pending_tasks.extend(tasks)
+            return
+
+        stack = tasks[::-1]
+        try:
+            while len(stack) > 0:
+                task = stack.pop()
+                self.pending_tasks = []
+                task[0](*task[1:])
+                # Work queued by the handler runs next, in the order queued
+                stack.extend(reversed(self.pending_tasks))
+        finally:
+            self.pending_tasks = None
+
+    def defer(self, callback, *args):
+        """
+        Queues a callback to run after the nodes already queued by the current
+        handler have been analyzed. Handlers use this for work that needs a
+        body to be translated first, such as adding a closing bracket
+
+        Parameters
+        ----------
+        callback : callable
+            Function to call
+        *args
+            Arguments to call the function with
+        """
+        if self.pending_tasks is None:
+            callback(*args)
+        else:
+            self.pending_tasks.append((callback,) + args)
+
+    def parse_statement(self, node, file_index, function_key, indent):
+        """
+        Calls the handler for a statement node, falling back to
+        parse_unhandled if the statement type isn't supported
+
+        Parameters
+        ----------
+        node : ast node
+            The statement to translate
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        handler = self.statement_handlers.get(node.__class__)
+        if handler is None:
+            handler = PyAnalyzer.parse_unhandled
+        if self.profiler is not None and self.profiler.count_nodes:
+            self.profiler.call_handler(node, handler, self, node, file_index,
+                                       function_key, indent)
+        else:
+            handler(self, node, file_index, function_key, indent)
+
+    def close_block(self, function_key, file_index, body, indent):
+        """
+        Adds the closing bracket of a block after its last line
+
+        Parameters
+        ----------
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        file_index : int
+            Index of the file to write to in the output_files list
+        body : List of ast nodes
+            The body the block contains
+        indent : int
+            Indentation of the line that opened the block
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        end_lineno = body[-1].end_lineno
+        if end_lineno in func_ref.lines:
+            func_ref.lines[end_lineno].code_str += "\n" \
+                + indent * cline.CPPCodeLine.tab_delimiter + "}"
+        else:
+            # The last statement didn't produce any code, such as a pass
+            func_ref.lines[end_lineno] = cline.CPPCodeLine(end_lineno,
+                                                           end_lineno,
+                                                           body[-1].end_col_offset,
+                                                           indent, "}")
     
     
     def parse_unhandled(self, node, file_index, function_key, indent,
@@ -196,6 +769,7 @@ class PyAnalyzer():
         """
         # Get a reference to the correct function to shorten code width
         func_ref = self.output_files[file_index].functions[function_key]
+        self.unhandled_lines.append((node.lineno, reason))
         func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
                                                         node.lineno,
                                                         node.end_col_offset,
@@ -310,26 +884,45 @@ class PyAnalyzer():
                                                       +"{")
         self.analyze_tree(node.body,file_index, function_key,indent+1)
         
-        # Get the last code line and add the closing bracket
-        func_ref.lines[node.body[-1].end_lineno].code_str+="\n" + indent*cline.CPPCodeLine.tab_delimiter+ "}"
+        # Add the closing bracket once the body has been translated
+        self.defer(self.close_block, function_key, file_index, node.body, indent)
         
         # Looking for else if or else cases
         if len(node.orelse) == 1 and node.orelse[0].__class__ is ast.If:
-            # Else if case
-            self.parse_If(node.orelse[0], file_index, function_key, indent,
-                          "else if")
+            # Else if case, queued rather than called so long elif chains
+            # don't recurse
+            self.defer(self.parse_If, node.orelse[0], file_index, function_key,
+                       indent, "else if")
         elif len(node.orelse)> 0:
             #Else case
-            else_lineno,else_end_col_offset= self.find_else_lineno(node.orelse[0].lineno-2)
-            func_ref.lines[else_lineno]= cline.CPPCodeLine(else_lineno,
-                                                           else_lineno,
-                                                           else_end_col_offset,
-                                                           indent,
-                                                           "else\n"+ indent*cline.CPPCodeLine.tab_delimiter + "{")
-            self.analyze_tree(node.orelse, file_index, function_key, indent+1)
-            
-            # Get the last code line and add the closing bracket
-            func_ref.lines[node.orelse[-1].end_lineno].code_str+= "\n" + indent*cline.CPPCodeLine.tab_delimiter + "}"
+            self.defer(self.parse_else, node, file_index, function_key, indent)
+
+    def parse_else(self, node, file_index, function_key, indent):
+        """
+        Handles parsing the else branch of an ast.If node
+
+        Parameters
+        ----------
+        node : ast.If
+            The ast.If node with the else branch to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref= self.output_files[file_index].functions[function_key]
+        else_lineno,else_end_col_offset= self.find_else_lineno(node.orelse[0].lineno-2)
+        func_ref.lines[else_lineno]= cline.CPPCodeLine(else_lineno,
+                                                       else_lineno,
+                                                       else_end_col_offset,
+                                                       indent,
+                                                       "else\n"+ indent*cline.CPPCodeLine.tab_delimiter + "{")
+        self.analyze_tree(node.orelse, file_index, function_key, indent+1)
+        
+        # Get the last code line and add the closing bracket
+        self.defer(self.close_block, function_key, file_index, node.orelse, indent)
     
     
     def find_else_lineno(self, search_index):
@@ -355,16 +948,21 @@ class PyAnalyzer():
             If an else is not found
         """        
         while search_index > -1:
-            # Check line isn't a comment
-            if self.raw_lines[search_index].lstrip()[0] == "#":
+            # Check line isn't a comment or blank
+            stripped_line = self.raw_lines[search_index].lstrip()
+            if stripped_line == "" or stripped_line[0] == "#":
                 search_index -= 1
                 continue
             else:
                 end_col_offset = self.raw_lines[search_index].find("else:")
-                if end_col_offset < 0:
-                    raise pcex.TranslationNotSupported("TODO: No corresponding else found")
-                else:
+                if end_col_offset >= 0:
                     end_col_offset += 4
+                elif stripped_line.startswith("elif"):
+                    # An elif whose condition was folded to always true
+                    # becomes the else branch
+                    end_col_offset = self.raw_lines[search_index].rfind(":")
+                else:
+                    raise pcex.TranslationNotSupported("TODO: No corresponding else found")
                     
                 search_index += 1
                 return search_index, end_col_offset
@@ -404,19 +1002,18 @@ class PyAnalyzer():
         self.analyze_tree(node.body, file_index, function_key, indent + 1)
         
         # Closing the body of the while loop
-        func_ref.lines[node.body[-1].end_lineno].code_str += "\n" \
-                                                             + indent * cline.CPPCodeLine.tab_delimiter \
-                                                             + "}"
+        self.defer(self.close_block, function_key, file_index, node.body, indent)
                                                              
-    def parse_Pass(self, node, file_index, function_key, indent):
+    def parse_For(self, node, file_index, function_key, indent):
         """
-        Handles parsing an ast.Pass node. We don't translate this
-        so we just pass on calls to it
+        Handles parsing an ast.For node. Loops over range become counted C++
+        for loops, loops over a vector become range based for loops and
+        enumerate over a vector becomes an index loop
 
         Parameters
         ----------
-        node : ast.Pass
-            The ast.Pass node to be translated
+        node : ast.For
+            The ast.For node to be translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
@@ -424,70 +1021,602 @@ class PyAnalyzer():
         indent : int
             How much indentation a line should have
         """
-        pass        
-    
-                                               
-    def parse_Break(self, node, file_index, function_key, indent):
+        func_ref = self.output_files[file_index].functions[function_key]
+        iter_node = node.iter
+        iter_func = None
+        reserve_lines = []
+        if iter_node.__class__ is ast.Call and iter_node.func.__class__ is ast.Name:
+            iter_func = iter_node.func.id
+
+        try:
+            if len(node.orelse) > 0:
+                raise pcex.TranslationNotSupported("TODO: for else not supported")
+
+            if iter_func == "enumerate":
+                if node.target.__class__ is not ast.Tuple or len(node.target.elts) != 2 \
+                        or any(elt.__class__ is not ast.Name for elt in node.target.elts):
+                    raise pcex.TranslationNotSupported("TODO: Unpacking in for loops")
+                loop_vars = [elt.id for elt in node.target.elts]
+                self.check_loop_variables(node, loop_vars, file_index, function_key)
+                for_str, loop_types, body_lines = self.parse_enumerate_loop(
+                    node, loop_vars, file_index, function_key)
+            else:
+                if node.target.__class__ is not ast.Name:
+                    raise pcex.TranslationNotSupported("TODO: Unpacking in for loops")
+                loop_vars = [node.target.id]
+                self.check_loop_variables(node, loop_vars, file_index, function_key)
+                if iter_func == "range":
+                    for_str = self.parse_range_loop(node, loop_vars[0], file_index,
+                                                    function_key)
+                    loop_types, body_lines = ["int"], []
+                    reserve_lines = self.find_reserve_lines(node, file_index,
+                                                            function_key)
+                elif iter_node.__class__ is ast.Name and iter_node.id in func_ref.vectors:
+                    for_str, loop_types = self.parse_vector_loop(node, loop_vars[0],
+                                                                 file_index,
+                                                                 function_key)
+                    body_lines = []
+                else:
+                    raise pcex.TranslationNotSupported("TODO: Only loops over range or lists are supported")
+        except pcex.TranslationNotSupported as ex:
+            self.parse_unhandled(node, file_index, function_key, indent, ex.reason)
+            return
+
+        tabs = indent * cline.CPPCodeLine.tab_delimiter
+        for reserve_line in reversed(reserve_lines):
+            for_str = reserve_line + "\n" + tabs + for_str
+        for_str += "\n" + tabs + "{"
+        for body_line in body_lines:
+            for_str += "\n" + tabs + cline.CPPCodeLine.tab_delimiter + body_line
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        for_str)
+        for loop_var, loop_type in zip(loop_vars, loop_types):
+            func_ref.scoped_variables[loop_var] = cvar.CPPVariable(loop_var,
+                                                                   node.lineno,
+                                                                   cvar.TypeCell.get(loop_type))
+
+        if iter_func in ("range", "enumerate"):
+            self.mark_non_negative(iter_node, loop_vars[0], function_key)
+
+        self.analyze_tree(node.body, file_index, function_key, indent + 1)
+
+        # Closing the body of the loop, after which the loop variables are gone
+        self.defer(self.close_block, function_key, file_index, node.body, indent)
+        for loop_var in loop_vars:
+            self.defer(self.end_scope, function_key, file_index, loop_var)
+
+    def mark_non_negative(self, iter_node, loop_var, function_key):
         """
-        Handles parsing an ast.Break node.
+        Records a loop counter that can never be negative. Counters that
+        can't go negative let integer division skip the corrections for
+        python's rounding
 
         Parameters
         ----------
-        node : ast.Break
-            The ast.Break node to be translated
-        file_index : int
-            Index of the file to write to in the output_files list
+        iter_node : ast.Call
+            The call to range or enumerate the loop iterates over
+        loop_var : str
+            Name of the counter
         function_key : str
             Key used to find the correct function in the function dictionary
-        indent : int
-            How much indentation a line should have
         """
-        func_ref = self.output_files[file_index].functions[function_key]
-        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
-                                                        node.end_lineno,
-                                                        node.end_col_offset,
-                                                        indent,
-                                                        "break;")
-        
-    def parse_Continue(self, node, file_index, function_key, indent):
+        args = iter_node.args
+        if iter_node.func.id == "range":
+            counts_up = len(args) < 3 or self.get_constant_int(args[2]) > 0
+            start_node = args[0] if len(args) > 1 else None
+        else:
+            counts_up = True
+            start_node = args[1] if len(args) > 1 else None
+        if counts_up and (start_node is None
+                          or self.is_non_negative(start_node, function_key)):
+            self.non_negative_names.setdefault(function_key, set()).add(loop_var)
+
+    def check_loop_variables(self, node, loop_vars, file_index, function_key):
         """
-        Handles parsing an ast.Continue node.
+        Makes sure loop variables behave the same in C++. Python keeps the
+        loop variables around after the loop and ignores assignments to them
+        inside the body, C++ does neither
 
         Parameters
         ----------
-        node : ast.Continue
-            The ast.Continue node to be translated
+        node : ast.For
+            The loop
+        loop_vars : list of str
+            Names of the loop variables
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
-        indent : int
-            How much indentation a line should have
+
+        Raises
+        ------
+        TranslationNotSupported
+            If a loop variable already exists or is assigned in the body
         """
-        func_ref = self.output_files[file_index].functions[function_key]
-        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
-                                                        node.end_lineno,
-                                                        node.end_col_offset,
-                                                        indent,
-                                                        "continue;")
-        
-    
-    def parse_Return(self, node, file_index, function_key, indent):
+        for loop_var in loop_vars:
+            try:
+                self.find_var_type(loop_var, file_index, function_key)
+                raise pcex.TranslationNotSupported("TODO: Loop variable already declared")
+            except pcex.VariableNotFound:
+                pass
+        for body_node in node.body:
+            for child in ast.walk(body_node):
+                if child.__class__ is ast.Name and child.id in loop_vars \
+                        and child.ctx.__class__ is not ast.Load:
+                    raise pcex.TranslationNotSupported("TODO: Loop variable assigned in loop body")
+
+    def get_loop_vector(self, node, vector_node, file_index, function_key):
         """
-        Handles parsing an ast.Return node.
+        Finds the vector a loop iterates over, making sure the body leaves it
+        alone. Resizing a vector while iterating over it invalidates the
+        iteration in C++
 
         Parameters
         ----------
-        node : ast.Return
-            The ast.Return node to be translated
+        node : ast.For
+            The loop
+        vector_node : ast node
+            The expression being iterated over
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
-        indent : int
-            How much indentation a line should have
-        """
-        func_ref = self.output_files[file_index].functions[function_key]
+
+        Returns
+        -------
+        CPPVector
+            The vector being iterated over
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the loop isn't over a known vector or the body changes it
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        if vector_node.__class__ is not ast.Name or vector_node.id not in func_ref.vectors:
+            raise pcex.TranslationNotSupported("TODO: Only loops over range or lists are supported")
+        for body_node in node.body:
+            for child in ast.walk(body_node):
+                if child.__class__ is ast.Name and child.id == vector_node.id \
+                        and child.ctx.__class__ is not ast.Load:
+                    raise pcex.TranslationNotSupported("TODO: List assigned while iterating over it")
+                if child.__class__ is ast.Attribute and child.value.__class__ is ast.Name \
+                        and child.value.id == vector_node.id:
+                    raise pcex.TranslationNotSupported("TODO: List modified while iterating over it")
+        return func_ref.vectors[vector_node.id]
+
+    def parse_vector_loop(self, node, loop_var, file_index, function_key):
+        """
+        Builds the header of a range based for loop over a vector. Scalars
+        are copied, anything else is bound by const reference so no element
+        is copied
+
+        Parameters
+        ----------
+        node : ast.For
+            The loop, iterating over a vector
+        loop_var : str
+            Name of the loop variable
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        for_str : str
+            The C++ for loop header
+        loop_types : list of str
+            Python type of the loop variable
+        """
+        vector = self.get_loop_vector(node, node.iter, file_index, function_key)
+        return "for (" + vector.get_element_binding(loop_var) + " : " \
+            + vector.name + ")", [vector.get_py_element_type()]
+
+    def parse_enumerate_loop(self, node, loop_vars, file_index, function_key):
+        """
+        Builds an index loop over a vector from enumerate, counting the index
+        directly instead of creating a tuple per element
+
+        Parameters
+        ----------
+        node : ast.For
+            The loop, iterating over a call to enumerate
+        loop_vars : list of str
+            Names of the index and element variables
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        for_str : str
+            The C++ for loop header
+        loop_types : list of str
+            Python types of the index and element variables
+        body_lines : list of str
+            Line binding the element, placed at the start of the body
+        """
+        args = node.iter.args
+        start_str = "0"
+        if len(node.iter.keywords) == 1 and node.iter.keywords[0].arg == "start" \
+                and len(args) == 1:
+            start_node = node.iter.keywords[0].value
+        elif len(node.iter.keywords) == 0 and len(args) == 2:
+            start_node = args[1]
+        elif len(node.iter.keywords) == 0 and len(args) == 1:
+            start_node = None
+        else:
+            raise pcex.TranslationNotSupported("TODO: enumerate takes a list and a start")
+        vector = self.get_loop_vector(node, args[0], file_index, function_key)
+        if start_node is not None:
+            start_str, start_type = self.recurse_operator(start_node, file_index,
+                                                          function_key)
+            if start_type[0] not in ("int", "bool", "auto"):
+                raise pcex.TranslationNotSupported("TODO: enumerate start must be an integer")
+
+        index_var, element_var = loop_vars
+        if start_str == "0":
+            for_str = "for (int " + index_var + " = 0; " + index_var + " < (int)" \
+                      + vector.name + ".size(); " + index_var + "++)"
+            element_str = vector.access_element(index_var)
+        else:
+            # The start is kept in a counter of its own so it's only
+            # evaluated once, like Python does
+            position_var = index_var + "_position"
+            for_str = "for (int " + position_var + " = 0, " + index_var + " = " \
+                      + start_str + "; " + position_var + " < (int)" + vector.name \
+                      + ".size(); " + position_var + "++, " + index_var + "++)"
+            element_str = vector.access_element(position_var)
+
+        return for_str, ["int", vector.get_py_element_type()], \
+            [vector.get_element_binding(element_var) + " = " + element_str + ";"]
+
+    def parse_range_loop(self, node, loop_var, file_index, function_key):
+        """
+        Builds the header of a counted for loop over a call to range
+
+        Parameters
+        ----------
+        node : ast.For
+            The loop, iterating over a call to range
+        loop_var : str
+            Name of the loop variable
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        str
+            The C++ for loop header
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the range or the loop variable can't be translated
+        """
+        args = node.iter.args
+        if len(node.iter.keywords) > 0 or len(args) < 1 or len(args) > 3:
+            raise pcex.TranslationNotSupported("TODO: range takes 1 to 3 arguments")
+
+        arg_strs = []
+        for arg in args:
+            arg_str, arg_type = self.recurse_operator(arg, file_index, function_key)
+            # Parameters whose type isn't known yet are allowed through since
+            # they're most often the loop bound
+            if arg_type[0] not in ("int", "bool", "auto"):
+                raise pcex.TranslationNotSupported("TODO: range arguments must be integers")
+            arg_strs.append(arg_str)
+
+        if len(args) == 1:
+            start_str, stop_str, step = "0", arg_strs[0], 1
+        else:
+            start_str, stop_str = arg_strs[0], arg_strs[1]
+            step = 1 if len(args) == 2 else self.get_constant_int(args[2])
+            if step is None:
+                raise pcex.TranslationNotSupported("TODO: range step must be a constant")
+            elif step == 0:
+                raise pcex.TranslationNotSupported("TODO: range step cannot be zero")
+
+        # range evaluates its stop once, so anything that isn't a constant is
+        # kept in a second loop variable instead of being checked every time
+        stop_node = args[0] if len(args) == 1 else args[1]
+        init_str = "int " + loop_var + " = " + start_str
+        if self.get_constant_int(stop_node) is None:
+            stop_var = loop_var + "_stop"
+            while True:
+                try:
+                    self.find_var_type(stop_var, file_index, function_key)
+                    stop_var += "_"
+                except pcex.VariableNotFound:
+                    break
+            init_str += ", " + stop_var + " = " + stop_str
+            stop_str = stop_var
+
+        if step > 0:
+            test_str = loop_var + " < " + stop_str
+            update_str = loop_var + "++" if step == 1 else loop_var + " += " + str(step)
+        else:
+            test_str = loop_var + " > " + stop_str
+            update_str = loop_var + "--" if step == -1 else loop_var + " -= " + str(-step)
+        return "for (" + init_str + "; " + test_str + "; " + update_str + ")"
+
+    def find_reserve_lines(self, node, file_index, function_key):
+        """
+        Builds the lines reserving room in the vectors and strings a counted
+        loop appends to on every iteration, so they don't reallocate as they
+        grow. Strings are only reserved when every piece appended is a
+        literal, since only then is the final length known
+
+        Parameters
+        ----------
+        node : ast.For
+            The loop, iterating over a call to range
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        list of str
+            The reserve calls to put before the loop
+        """
+        # Reserving an exact size on every pass of an outer loop stops
+        # vectors and strings growing geometrically, so they would reallocate
+        # every pass
+        if node in self.nested_loops:
+            return []
+        func_ref = self.output_files[file_index].functions[function_key]
+
+        # Only appends directly in the body are sure to run every iteration
+        # Dictionary of {Vector Name: Appends Per Iteration}
+        appends = {}
+        # Dictionary of {String Name: Bytes Per Iteration or None if unknown}
+        string_appends = {}
+        for body_node in node.body:
+            if body_node.__class__ is ast.Expr and body_node.value.__class__ is ast.Call:
+                func = body_node.value.func
+                if func.__class__ is ast.Attribute and func.attr == "append" \
+                        and func.value.__class__ is ast.Name \
+                        and func.value.id in func_ref.vectors:
+                    appends[func.value.id] = appends.get(func.value.id, 0) + 1
+                continue
+            appended = self.find_string_appends(body_node)
+            if appended is None:
+                continue
+            name, operands = appended
+            try:
+                if self.find_var_type(name, file_index, function_key)[0] != "str":
+                    continue
+            except pcex.VariableNotFound:
+                continue
+            length = string_appends.get(name, 0)
+            for operand in operands:
+                if length is None or operand.__class__ is not ast.Constant \
+                        or operand.value.__class__ is not str:
+                    length = None
+                else:
+                    length += len(operand.value.encode("utf-8"))
+            string_appends[name] = length
+        # Any other assignment could shrink or replace the string
+        for child in ast.walk(node):
+            if child.__class__ in [ast.Assign, ast.AnnAssign, ast.AugAssign] \
+                    and self.find_string_appends(child) is None:
+                targets = child.targets if child.__class__ is ast.Assign else [child.target]
+                for target in targets:
+                    for name_node in ast.walk(target):
+                        if name_node.__class__ is ast.Name:
+                            string_appends.pop(name_node.id, None)
+        string_appends = {name: length for name, length in string_appends.items()
+                          if length}
+        if len(appends) == 0 and len(string_appends) == 0:
+            return []
+
+        count = self.get_range_count(node.iter, file_index, function_key)
+        if count is None:
+            return []
+
+        reserve_lines = []
+        for name, per_iteration in appends.items():
+            if count.__class__ is int:
+                count_str = str(count * per_iteration)
+            elif per_iteration > 1:
+                count_str = count + " * " + str(per_iteration)
+            else:
+                count_str = count
+            reserve_lines.append(func_ref.vectors[name].reserve_elements(count_str) + ";")
+        for name, length in string_appends.items():
+            if count.__class__ is int:
+                count_str = str(count * length)
+            else:
+                count_str = count + " * " + str(length)
+            reserve_lines.append(name + ".reserve(" + name + ".size() + " + count_str + ");")
+        return reserve_lines
+
+    def get_range_count(self, node, file_index, function_key):
+        """
+        Finds the number of values a call to range produces. Only ranges over
+        literals and int variables are counted, so the count can be
+        evaluated ahead of the loop without side effects
+
+        Parameters
+        ----------
+        node : ast.Call
+            The call to range
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        int, str or None
+            The count if every argument is a literal, a C++ expression
+            computing it otherwise, or None if it can't be counted
+        """
+        values = []
+        for arg in node.args:
+            constant = self.get_constant_int(arg)
+            if constant is not None:
+                values.append(constant)
+                continue
+            if arg.__class__ is not ast.Name:
+                return None
+            try:
+                if self.find_var_type(arg.id, file_index, function_key)[0] != "int":
+                    return None
+            except pcex.VariableNotFound:
+                return None
+            values.append(arg.id)
+
+        if all(value.__class__ is int for value in values):
+            count = len(range(*values))
+            return count if count > 0 else None
+
+        if len(values) == 1:
+            start, stop, step = 0, values[0], 1
+        else:
+            start, stop = values[0], values[1]
+            step = 1 if len(values) == 2 else values[2]
+        if step < 0:
+            start, stop = stop, start
+
+        terms = [str(term) if term.__class__ is str or term >= 0 else "(" + str(term) + ")"
+                 for term in (start, stop)]
+        distance = terms[1] if start == 0 else terms[1] + " - " + terms[0]
+        if abs(step) > 1:
+            distance = "(" + distance + " + " + str(abs(step) - 1) + ") / " \
+                       + str(abs(step))
+        # An empty range has a negative distance
+        self.add_include_file(file_index, function_key, "algorithm")
+        return "std::max(0, " + distance + ")"
+
+    def get_constant_int(self, node):
+        """
+        Finds the value of an integer literal, including negative ones
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+
+        Returns
+        -------
+        int or None
+            The value of the literal, or None if the node isn't one
+        """
+        sign = 1
+        if node.__class__ is ast.UnaryOp and node.op.__class__ is ast.USub:
+            sign = -1
+            node = node.operand
+        if node.__class__ is ast.Constant and node.value.__class__ is int:
+            return sign * node.value
+        return None
+
+    def end_scope(self, function_key, file_index, name):
+        """
+        Removes a variable that only existed inside a block once the block
+        has been translated
+
+        Parameters
+        ----------
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        file_index : int
+            Index of the file to write to in the output_files list
+        name : str
+            Name of the variable going out of scope
+        """
+        self.output_files[file_index].functions[function_key].scoped_variables.pop(name, None)
+        self.non_negative_names.get(function_key, set()).discard(name)
+
+    def parse_Pass(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Pass node. We don't translate this
+        so we just pass on calls to it
+
+        Parameters
+        ----------
+        node : ast.Pass
+            The ast.Pass node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        pass        
+    
+                                               
+    def parse_Break(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Break node.
+
+        Parameters
+        ----------
+        node : ast.Break
+            The ast.Break node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        "break;")
+        
+    def parse_Continue(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Continue node.
+
+        Parameters
+        ----------
+        node : ast.Continue
+            The ast.Continue node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        "continue;")
+        
+    
+    def parse_Return(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Return node.
+
+        Parameters
+        ----------
+        node : ast.Return
+            The ast.Return node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
         if node.value is None:
             func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
                                                             node.end_lineno,
@@ -633,6 +1762,10 @@ class PyAnalyzer():
                                  "TODO: Unable to translate chained assignment")
             return
         
+        if node.value.__class__ is ast.ListComp and node.targets[0].__class__ is ast.Name:
+            self.parse_list_comprehension(node, file_index, function_key, indent)
+            return
+
         var_name = node.targets[0].id
         try:
             assign_str, assign_type = self.recurse_operator(node.value,
@@ -644,9 +1777,12 @@ class PyAnalyzer():
                                  ex.reason)
             return
         if(assign_type[0]=="List"):
-            self.output_files[file_index].add_include_file("vector")
-            vector = cvec.CPPVector(name=var_name, element_type=assign_type[1], elements=assign_str)
+            self.add_include_file(file_index, function_key, "vector")
+            vector = cvec.CPPVector(name=var_name, element_type=assign_type[1],
+                                    elements=assign_str, line_num=node.lineno)
             function_ref.vectors[var_name] = vector
+            if var_name in function_ref.single_assignments:
+                vector.qualifier = "const "
             code_str= vector.declaration()
             c_code_line = cline.CPPCodeLine(node.lineno, node.end_lineno,
                                                 node.end_col_offset, indent,
@@ -669,7 +1805,14 @@ class PyAnalyzer():
                                      "precision occurred")
                     return
                 else:
-                    code_str = var_name + " = " + str(assign_str) + ";"
+                    appended = self.find_string_appends(node)
+                    if py_var_type[0] == "str" and appended is not None \
+                            and hasattr(assign_str, "parts"):
+                        # Appending in place instead of copying the string
+                        # keeps loops building a string linear
+                        code_str = self.append_strings(var_name, assign_str.parts[1:]) + ";"
+                    else:
+                        code_str = var_name + " = " + str(assign_str) + ";"
                     c_code_line = cline.CPPCodeLine(node.lineno, node.end_lineno,
                                                 node.end_col_offset, indent,
                                                 code_str)
@@ -677,6 +1820,13 @@ class PyAnalyzer():
                 # Declaration
                 # print(var_name,assign_type)
                 c_var = cvar.CPPVariable(var_name, node.lineno, assign_type)
+                # Values known at compile time let the compiler fold them
+                # into every use
+                if var_name in function_ref.single_assignments:
+                    if self.is_literal(node.value):
+                        c_var.qualifier = "constexpr "
+                    else:
+                        c_var.qualifier = "const "
                 function_ref.variables[var_name] = c_var
                 code_str = var_name + " = " + str(assign_str) + ";"
                 c_code_line = cline.CPPCodeLine(node.lineno, node.end_lineno,
@@ -685,6 +1835,380 @@ class PyAnalyzer():
 
         function_ref.lines[node.lineno] = c_code_line
         
+    def parse_list_comprehension(self, node, file_index, function_key, indent):
+        """
+        Handles assigning a list comprehension to a name. The vector is
+        filled in place by a loop for every for clause, nested in order, with
+        an if for every filter. Room for the elements is reserved before the
+        loops when their number is known up front
+
+        Parameters
+        ----------
+        node : ast.Assign
+            Assignment of an ast.ListComp to a name
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        function_ref = self.output_files[file_index].functions[function_key]
+        var_name = node.targets[0].id
+        tab = cline.CPPCodeLine.tab_delimiter
+        # Comprehension variables are only in scope while it's translated
+        scoped_names = []
+        try:
+            existing = function_ref.vectors.get(var_name)
+            if existing is None:
+                try:
+                    self.find_var_type(var_name, file_index, function_key)
+                    raise pcex.TranslationNotSupported("TODO: Refactor for C++. Variable types "
+                                                       "cannot change")
+                except pcex.VariableNotFound:
+                    pass
+            elif any(child.__class__ is ast.Name and child.id == var_name
+                     for child in ast.walk(node.value)):
+                raise pcex.TranslationNotSupported("TODO: List comprehension reads the list it replaces")
+
+            steps = self.get_comprehension_steps(node.value)
+            count_str = self.get_comprehension_count(steps, file_index, function_key)
+            lines = []
+            depth = 0
+            for step in steps:
+                step_tabs = depth * tab
+                if step[0] == "if":
+                    test_str = self.recurse_operator(step[1], file_index, function_key)[0]
+                    lines += [step_tabs + "if (" + test_str + ")", step_tabs + "{"]
+                    depth += 1
+                    continue
+
+                name = step[1].id if step[0] == "for" else step[1]
+                loop_node = ast.For(target=step[1], iter=step[2], body=[], orelse=[])
+                self.check_loop_variables(loop_node, [name], file_index, function_key)
+                if step[0] == "bind":
+                    value_str, value_type = self.recurse_operator(step[2], file_index,
+                                                                  function_key)
+                    if value_type[0] not in typeinference.SCALAR_TYPES:
+                        raise pcex.TranslationNotSupported("TODO: Comprehension values must be "
+                                                           "numbers, bools or strings")
+                    lines.append(step_tabs + "const " + cvar.CPPVariable.types[value_type[0]]
+                                 + name + " = " + value_str + ";")
+                    name_type = value_type[0]
+                elif step[2].__class__ is ast.Call and step[2].func.__class__ is ast.Name \
+                        and step[2].func.id == "range":
+                    lines.append(step_tabs + self.parse_range_loop(loop_node, name, file_index,
+                                                                   function_key))
+                    lines.append(step_tabs + "{")
+                    depth += 1
+                    name_type = "int"
+                    self.mark_non_negative(step[2], name, function_key)
+                elif step[2].__class__ is ast.Name and step[2].id in function_ref.vectors:
+                    for_str, loop_types = self.parse_vector_loop(loop_node, name, file_index,
+                                                                 function_key)
+                    lines += [step_tabs + for_str, step_tabs + "{"]
+                    depth += 1
+                    name_type = loop_types[0]
+                else:
+                    raise pcex.TranslationNotSupported("TODO: Only loops over range or lists are supported")
+                function_ref.scoped_variables[name] = cvar.CPPVariable(name, node.lineno,
+                                                                       cvar.TypeCell.get(name_type))
+                scoped_names.append(name)
+
+            element_str, element_type = self.recurse_operator(node.value.elt, file_index,
+                                                              function_key)
+            if element_type[0] not in typeinference.SCALAR_TYPES:
+                raise pcex.TranslationNotSupported("TODO: List comprehension elements must be "
+                                                   "numbers, bools or strings")
+            cpp_type = cvar.CPPVariable.types[element_type[0]].strip()
+            if existing is not None:
+                self.add_element_type(existing, cpp_type)
+                vector = existing
+                first_line = var_name + ".clear();"
+            else:
+                # Declared by the line filling it, so it's never redeclared
+                # once its element type is applied
+                vector = cvec.CPPVector(var_name, cpp_type)
+                first_line = vector.declaration()
+            if count_str is not None:
+                lines.insert(0, var_name + ".reserve(" + count_str + ");")
+            lines.append(depth * tab + vector.append_element(element_str) + ";")
+            for level in reversed(range(depth)):
+                lines.append(level * tab + "}")
+        except pcex.TranslationNotSupported as ex:
+            self.parse_unhandled(node, file_index, function_key, indent, ex.reason)
+            return
+        finally:
+            for name in scoped_names:
+                self.end_scope(function_key, file_index, name)
+
+        self.add_include_file(file_index, function_key, "vector")
+        if element_type[0] == "str":
+            self.add_include_file(file_index, function_key, "string")
+        function_ref.vectors[var_name] = vector
+        tabs = indent * tab
+        function_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno, node.end_lineno,
+                                                            node.end_col_offset, indent,
+                                                            ("\n" + tabs).join([first_line] + lines))
+
+    def get_comprehension_steps(self, node):
+        """
+        Flattens a list comprehension into the loops, filters and bindings
+        that produce its elements. A comprehension iterated over by another
+        is run inside it instead of being built, binding each of its elements
+        to the outer loop variable
+
+        Parameters
+        ----------
+        node : ast.ListComp
+            The comprehension
+
+        Returns
+        -------
+        list of tuple
+            Steps in order of nesting, one of ("for", Target Node, Iterable
+            Node), ("if", Test Node) or ("bind", Name, Value Node)
+
+        Raises
+        ------
+        TranslationNotSupported
+            If a loop unpacks its values
+        """
+        steps = []
+        for generator in node.generators:
+            if generator.is_async or generator.target.__class__ is not ast.Name:
+                raise pcex.TranslationNotSupported("TODO: Unpacking in for loops")
+            if generator.iter.__class__ is ast.ListComp:
+                steps.extend(self.get_comprehension_steps(generator.iter))
+                steps.append(("bind", generator.target.id, generator.iter.elt))
+            else:
+                steps.append(("for", generator.target, generator.iter))
+            steps.extend(("if", test) for test in generator.ifs)
+        return steps
+
+    def get_comprehension_count(self, steps, file_index, function_key):
+        """
+        Finds the number of elements a list comprehension produces before
+        any of its loops run
+
+        Parameters
+        ----------
+        steps : list of tuple
+            The steps of the comprehension from get_comprehension_steps
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        str or None
+            C++ expression of the count, or None if it has filters or a loop
+            whose length depends on an outer loop
+        """
+        function_ref = self.output_files[file_index].functions[function_key]
+        bound_names = set()
+        constant = 1
+        terms = []
+        for step in steps:
+            if step[0] == "if":
+                return None
+            elif step[0] == "bind":
+                bound_names.add(step[1])
+                continue
+            iter_node = step[2]
+            if any(child.__class__ is ast.Name and child.id in bound_names
+                   for child in ast.walk(iter_node)):
+                return None
+            if iter_node.__class__ is ast.Call and iter_node.func.__class__ is ast.Name \
+                    and iter_node.func.id == "range":
+                count = self.get_range_count(iter_node, file_index, function_key)
+            elif iter_node.__class__ is ast.Name and iter_node.id in function_ref.vectors:
+                count = iter_node.id + ".size()"
+            else:
+                count = None
+            if count is None:
+                return None
+            elif count.__class__ is int:
+                constant *= count
+            else:
+                terms.append(count)
+            bound_names.add(step[1].id)
+        if constant != 1 or len(terms) == 0:
+            terms.append(str(constant))
+        return " * ".join(terms)
+
+    def parse_AugAssign(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.AugAssign node. += on a list adds the elements
+        to the end of the vector, operators C++ has a compound assignment for
+        keep it and the rest are written out as an assignment
+
+        Parameters
+        ----------
+        node : ast.AugAssign
+            The ast.AugAssign node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        function_ref = self.output_files[file_index].functions[function_key]
+        if node.target.__class__ is not ast.Name:
+            self.parse_unhandled(node, file_index, function_key, indent,
+                                 "TODO: Augmented assignment only supported on names")
+            return
+
+        var_name = node.target.id
+        operator = node.op.__class__.__name__
+        try:
+            if var_name in function_ref.vectors:
+                if operator != "Add":
+                    raise pcex.TranslationNotSupported("TODO: Only += is supported on lists")
+                code_str = self.extend_vector(function_ref.vectors[var_name],
+                                              node.value, file_index, function_key)
+            else:
+                var_type = self.find_var_type(var_name, file_index, function_key)
+                # Checked operators have no compound assignment
+                checked = self.options.get("checked_ints") and var_type[0] == "int" \
+                    and operator in PyAnalyzer.checked_operators
+                if operator in PyAnalyzer.compound_operator_map and not checked \
+                        and (var_type[0] != "str" or operator == "Add"):
+                    value_str, value_type = self.recurse_operator(node.value,
+                                                                  file_index,
+                                                                  function_key)
+                    assign_type = self.type_precedence(var_type, value_type)
+                    if var_type[0] == "str" and self.find_string_appends(node) is None:
+                        # The whole value is built before the string changes
+                        code_str = var_name + " += " + str(value_str)
+                    elif var_type[0] == "str":
+                        code_str = self.append_strings(var_name,
+                                                       getattr(value_str, "parts", [value_str]))
+                    else:
+                        code_str = var_name + PyAnalyzer.compound_operator_map[operator] \
+                            + value_str
+                else:
+                    operation = ast.copy_location(
+                        ast.BinOp(ast.Name(var_name, ast.Load()), node.op, node.value),
+                        node)
+                    assign_str, assign_type = self.recurse_operator(operation,
+                                                                    file_index,
+                                                                    function_key)
+                    code_str = var_name + " = " + assign_str
+
+                # Can't do changing types in C++
+                if var_type[0] != "auto" and assign_type[0] != var_type[0]:
+                    raise pcex.TranslationNotSupported("TODO: Refactor for C++. Variable "
+                                                       "types cannot change or "
+                                                       "potential loss of precision "
+                                                       "occurred")
+        except pcex.VariableNotFound:
+            self.parse_unhandled(node, file_index, function_key, indent,
+                                 "TODO: Variable not declared")
+            return
+        except pcex.TranslationNotSupported as ex:
+            self.parse_unhandled(node, file_index, function_key, indent,
+                                 ex.reason)
+            return
+
+        function_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                            node.end_lineno,
+                                                            node.end_col_offset,
+                                                            indent,
+                                                            code_str + ";")
+
+    def find_string_appends(self, node):
+        """
+        Finds what a statement appends to the end of a variable, either with
+        += or by assigning the variable plus something to itself
+
+        Parameters
+        ----------
+        node : ast.Assign or ast.AugAssign
+            The statement
+
+        Returns
+        -------
+        name : str
+            Name of the variable appended to
+        appended : list of ast nodes
+            Every operand added after the variable, in order
+
+        Or None if the statement isn't an append, or one that can't be done
+        in place
+        """
+        if node.__class__ is ast.AugAssign:
+            if node.target.__class__ is not ast.Name or node.op.__class__ is not ast.Add:
+                return None
+            name = node.target.id
+            appended = self.get_added_operands(node.value)
+            # The first operand is appended before the variable changes
+            later = appended[1:]
+        elif node.__class__ is not ast.Assign or len(node.targets) != 1 \
+                or node.targets[0].__class__ is not ast.Name:
+            return None
+        else:
+            name = node.targets[0].id
+            operands = self.get_added_operands(node.value)
+            if len(operands) < 2 or operands[0].__class__ is not ast.Name \
+                    or operands[0].id != name:
+                return None
+            appended = later = operands[1:]
+
+        # Appending in place, an operand after the variable has changed would
+        # read its new value instead of the one python uses
+        for operand in later:
+            for child in ast.walk(operand):
+                if child.__class__ is ast.Name and child.id == name:
+                    return None
+        return name, appended
+
+    def get_added_operands(self, node):
+        """
+        Flattens a chain of + into its operands
+
+        Parameters
+        ----------
+        node : ast node
+            The expression
+
+        Returns
+        -------
+        list of ast nodes
+            The operands in order, just the node if it isn't an addition
+        """
+        operands = []
+        stack = [node]
+        while len(stack) > 0:
+            current = stack.pop()
+            if current.__class__ is ast.BinOp and current.op.__class__ is ast.Add:
+                stack += [current.right, current.left]
+            else:
+                operands.append(current)
+        return operands
+
+    def append_strings(self, var_name, parts):
+        """
+        Generates code appending strings to the end of a string variable
+
+        Parameters
+        ----------
+        var_name : str
+            Name of the variable
+        parts : list of str
+            C++ code of every string appended, in order
+
+        Returns
+        -------
+        str
+            The C++ statement without a semicolon
+        """
+        if len(parts) == 1:
+            return var_name + " += " + parts[0]
+        return var_name + "".join(".append(" + part + ")" for part in parts)
+
     def parse_Call(self, node, file_index, function_key):
         """
         Handles parsing an ast.Call node.
@@ -710,6 +2234,8 @@ class PyAnalyzer():
         TranslationNotSupported
             If the python code cannot be directly translated
         """
+        if node.func.__class__ is ast.Attribute:
+            return self.parse_method_call(node, file_index, function_key)
         if node.func.__class__ is not ast.Name:
             raise pcex.TranslationNotSupported("TODO: Not a valid call")
         
@@ -727,10 +2253,16 @@ class PyAnalyzer():
         # functions get called
         arg_types = []
         arg_list = []
-        for arg in node.args:
-            arg_str, arg_type = self.recurse_operator(arg,
-                                                      file_index,
-                                                      function_key)
+        callee = func_ref.get(func_name)
+        param_names = list(callee.parameters) if callee is not None else []
+        for arg_index, arg in enumerate(node.args):
+            if arg_index < len(param_names) and param_names[arg_index] in callee.vectors:
+                arg_str, arg_type = self.parse_vector_argument(
+                    arg, callee, param_names[arg_index], file_index, function_key)
+            else:
+                arg_str, arg_type = self.recurse_operator(arg,
+                                                          file_index,
+                                                          function_key)
             arg_list.append(arg_str)
             arg_types.append(arg_type)
             
@@ -740,38 +2272,228 @@ class PyAnalyzer():
             # a variable declaration
             if (func_name == "str"):
                 return_str = "std::to_string("
-                self.output_files[file_index].add_include_file("string")
-                return_type = ["str"]
+                self.add_include_file(file_index, function_key, "string")
+                return_type = cvar.TypeCell.get("str")
+            elif func_name == "int" and len(arg_types) == 1 and arg_types[0][0] == "float" \
+                    and self.options.get("checked_ints"):
+                return self.call_checked(file_index, function_key, "int", arg_list[0]), \
+                    cvar.TypeCell.get("int")
             else:
                 return_str = "(" + cvar.CPPVariable.types[func_name][:-1] + ")("
-                return_type = [func_name]
+                return_type = cvar.TypeCell.get(func_name)
         elif func_name in func_ref:
             return_str = func_name + "("
 
-            # Now we try to update the parameter types if applicable
-            function = func_ref[func_name]
-            for param, passed_type in zip(function.parameters.values(),
-                                          arg_types):
-                param.py_var_type[0] = self.type_precedence(param.py_var_type,
-                                                         passed_type)[0]
-            return_type = function.return_type
+            # Now we try to update the parameter types if applicable
+            function = func_ref[func_name]
+            inferred = self.inferred_parameters.get(func_name, ())
+            for (param_name, param), passed_type in zip(
+                    function.parameters.items(), arg_types):
+                if param_name not in inferred:
+                    param.py_var_type[0] = self.type_precedence(param.py_var_type,
+                                                                passed_type)[0]
+            return_type = function.return_type
+
+            # Kept so incremental runs can replay the call's effect on the
+            # parameter types without analyzing this function again
+            self.recorded_calls.setdefault(function_key, []).append(
+                (func_name, [passed_type[0] for passed_type in arg_types]))
+
+        elif func_name in self.ported_functions:
+            return self.parse_ported_function(file_index, function_key,
+                                              func_name, arg_list, arg_types,
+                                              node.keywords)
+
+        else:
+            raise pcex.TranslationNotSupported("TODO: Call to function not in scope")
+
+        # Finish generating function call with parameters inserted
+        for arg in arg_list:
+            return_str += arg + ", "
+        return_str = return_str[:-2] + ")"
+
+        return return_str, return_type
+    
+    def parse_vector_argument(self, node, callee, param_name, file_index, function_key):
+        """
+        Translates an argument passed to a list parameter, which has to hold
+        exactly the parameter's element type since vectors of different
+        types don't convert
+
+        Parameters
+        ----------
+        node : ast node
+            The argument
+        callee : CPPFunction
+            The function called
+        param_name : str
+            Name of the list parameter the argument is passed to
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        arg_str : str
+            The argument represented as a string
+        arg_type : list of str
+            The type of the argument
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the argument isn't a list of the parameter's element type
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        element_type = callee.vectors[param_name].element_type[0]
+        if node.__class__ is ast.Name and node.id in func_ref.vectors:
+            # The vector is passed by value, so the caller wouldn't see the
+            # changes python makes to its list
+            if param_name in callee.mutated_parameters:
+                raise pcex.TranslationNotSupported("TODO: Function changes the list "
+                                                   "passed to it")
+            if func_ref.vectors[node.id].element_type[0] != element_type:
+                raise pcex.TranslationNotSupported("TODO: List passed holds a different "
+                                                   "type than the parameter")
+            return node.id, cvar.TypeCell.get("auto")
+        elif node.__class__ is ast.List:
+            values, list_type = self.parse_List(node, file_index, function_key)
+            if len(values) > 0 and list_type[1] != element_type:
+                raise pcex.TranslationNotSupported("TODO: List passed holds a different "
+                                                   "type than the parameter")
+            return "std::vector<" + element_type + ">{" + ", ".join(values) + "}", \
+                cvar.TypeCell.get("auto")
+        raise pcex.TranslationNotSupported("TODO: Only named lists and list literals "
+                                           "can be passed as lists")
+
+    def parse_method_call(self, node, file_index, function_key):
+        """
+        Handles calls to methods. Only the methods growing a list are
+        supported, which become push_back and insert on the vector
+
+        Parameters
+        ----------
+        node : ast.Call
+            The call, whose function is an ast.Attribute
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The call represented as a string
+        return_type : list of str
+            The return type of the call
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        owner = node.func.value
+        if owner.__class__ is not ast.Name or owner.id not in func_ref.vectors:
+            raise pcex.TranslationNotSupported("TODO: Not a valid call")
+
+        vector = func_ref.vectors[owner.id]
+        method = node.func.attr
+        if method not in ("append", "extend"):
+            raise pcex.TranslationNotSupported("TODO: List method " + method
+                                               + " not supported")
+        if len(node.args) != 1 or len(node.keywords) > 0:
+            raise pcex.TranslationNotSupported("TODO: List " + method
+                                               + " takes one argument")
+
+        if method == "append":
+            value_str, value_type = self.recurse_operator(node.args[0], file_index,
+                                                          function_key)
+            if value_type[0] not in ("int", "float", "str", "bool", "auto"):
+                raise pcex.TranslationNotSupported("TODO: List element type not supported")
+            self.add_element_type(vector,
+                                  cvar.CPPVariable.types[value_type[0]].strip())
+            if value_type[0] == "str":
+                self.add_include_file(file_index, function_key, "string")
+            return vector.append_element(value_str), cvar.TypeCell.get("None")
+
+        return self.extend_vector(vector, node.args[0], file_index,
+                                  function_key), cvar.TypeCell.get("None")
+
+    def extend_vector(self, vector, values_node, file_index, function_key):
+        """
+        Translates adding the elements of a list to the end of a vector, as
+        done by extend and +=
+
+        Parameters
+        ----------
+        vector : CPPVector
+            The vector being extended
+        values_node : ast node
+            The list whose elements are added, either a list literal or
+            another vector
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        str
+            The C++ code adding the elements
 
-        elif func_name in self.ported_functions:
-            return self.parse_ported_function(file_index, function_key,
-                                              func_name, arg_list, arg_types)
+        Raises
+        ------
+        TranslationNotSupported
+            If the elements can't be added
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        if values_node.__class__ is ast.List:
+            if len(values_node.elts) == 0:
+                raise pcex.TranslationNotSupported("TODO: Extending by an empty list")
+            values, values_type = self.recurse_operator(values_node, file_index,
+                                                        function_key)
+            self.add_element_type(vector, values_type[1])
+            return vector.insert_elements(values)
 
-        else:
-            raise pcex.TranslationNotSupported("TODO: Call to function not in scope")
+        elif values_node.__class__ is ast.Name and values_node.id in func_ref.vectors:
+            other = func_ref.vectors[values_node.id]
+            # Inserting a range of a vector into itself is undefined in C++
+            if other is vector:
+                raise pcex.TranslationNotSupported("TODO: Extending a list by itself")
+            self.add_element_type(vector, other.element_type[0])
+            return vector.insert_vector(other)
 
-        # Finish generating function call with parameters inserted
-        for arg in arg_list:
-            return_str += arg + ", "
-        return_str = return_str[:-2] + ")"
+        raise pcex.TranslationNotSupported("TODO: Lists can only be extended by lists")
+
+    def add_element_type(self, vector, element_type):
+        """
+        Checks that elements of a type can be added to a vector. An empty
+        list takes the type of the first elements added to it
+
+        Parameters
+        ----------
+        vector : CPPVector
+            The vector elements are added to
+        element_type : str
+            The C++ type of the elements added
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the elements would change the type of the vector
+        """
+        current_type = vector.element_type[0]
+        if current_type == "auto" and vector.element_type.__class__ is not cvar.TypeCell:
+            vector.element_type[0] = element_type
+        elif current_type != element_type and element_type != "auto" \
+                and not (current_type == "double" and element_type in ("int", "bool")) \
+                and not (current_type == "int" and element_type == "bool"):
+            raise pcex.TranslationNotSupported("TODO: List element types cannot change")
 
-        return return_str, return_type
-    
     def parse_ported_function(self, file_index, function_key, function, args,
-                              arg_types):
+                              arg_types, keywords=()):
         """
         Converts a python version of a function to a C++ version
 
@@ -787,6 +2509,8 @@ class PyAnalyzer():
             List containing the arguments represented as strings
         arg_types : list of list of str
             List containing the types of each argument in a list of str
+        keywords : list of ast.keyword
+            Keyword arguments passed to the function
 
         Returns
         -------
@@ -800,20 +2524,90 @@ class PyAnalyzer():
         TranslationNotSupported
             If the python code cannot be directly translated
         """
-        if function == "print":
+        if function == "print" and self.options.get("fast_io"):
+            return_str = self.parse_fast_print(file_index, function_key, args,
+                                               keywords)
+            return_type = cvar.TypeCell.get("None")
+            self.add_include_file(file_index, function_key, "iostream")
+
+        elif function == "print":
             return_str = pf.print_translation(args)
-            return_type = ["None"]
-            self.output_files[file_index].add_include_file("iostream")
+            return_type = cvar.TypeCell.get("None")
+            self.add_include_file(file_index, function_key, "iostream")
 
         elif function == "sqrt":
             if len(args) > 1:
                 raise pcex.TranslationNotSupported("TODO: Can't square more than 1 item")
             return_str = pf.sqrt_translation(args)
-            return_type = ["float"]
-            self.output_files[file_index].add_include_file("math.h")
+            return_type = cvar.TypeCell.get("float")
+            self.add_include_file(file_index, function_key, "math.h")
 
         return return_str, return_type
     
+    def parse_fast_print(self, file_index, function_key, args, keywords):
+        """
+        Converts a call to print into a chain of stream insertions, handling
+        the sep, end and flush keywords the same way python does
+
+        Parameters
+        ----------
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        args : list of str
+            List containing the arguments represented as strings
+        keywords : list of ast.keyword
+            Keyword arguments passed to print
+
+        Returns
+        -------
+        str
+            The converted print statement
+
+        Raises
+        ------
+        TranslationNotSupported
+            If a keyword can't be translated
+        """
+        separators = {"sep": " ", "end": "\n"}
+        flush = False
+        for keyword in keywords:
+            value = keyword.value
+            if keyword.arg in separators:
+                if value.__class__ is ast.Constant and value.value is None:
+                    continue
+                if value.__class__ is ast.Constant and type(value.value) is str:
+                    separators[keyword.arg] = value.value
+                else:
+                    value_str, value_type = self.recurse_operator(value, file_index,
+                                                                  function_key)
+                    if value_type[0] != "str":
+                        raise pcex.TranslationNotSupported("TODO: " + keyword.arg
+                                                           + " must be a string")
+                    separators[keyword.arg] = [value_str]
+            elif keyword.arg == "flush":
+                if value.__class__ is not ast.Constant or type(value.value) is not bool:
+                    raise pcex.TranslationNotSupported("TODO: flush must be True or False")
+                flush = value.value
+            else:
+                raise pcex.TranslationNotSupported("TODO: print keyword "
+                                                   + str(keyword.arg) + " not supported")
+
+        # Literal separators are written as characters where possible, which
+        # is the cheapest thing to insert into a stream
+        for name, value in separators.items():
+            if value.__class__ is list:
+                separators[name] = value[0]
+            elif len(value) == 0:
+                separators[name] = None
+            elif len(value) == 1:
+                separators[name] = pf.char_literal(value)
+            else:
+                separators[name] = pf.string_literal(value)
+        return pf.fast_print_translation(args, separators["sep"],
+                                         separators["end"], flush)
+
     def parse_Constant(self, node, file_index, function_key):
         """
         Handles parsing an ast.Constant node.
@@ -836,19 +2630,19 @@ class PyAnalyzer():
         """
         # Strings need to be wrapped in quotes
         if type(node.value) is str:
-            self.output_files[file_index].add_include_file("string")
-            return_str = ("\"" + node.value + "\"")
-            return_type = ["str"]
+            self.add_include_file(file_index, function_key, "string")
+            return_str = pf.string_literal(node.value)
+            return_type = cvar.TypeCell.get("str")
 
         # Python booleans are capital while C++ is lowercase, so we need to
         # translate it
         elif type(node.value) is bool:
             return_str = cvar.CPPVariable.bool_map[str(node.value)]
-            return_type = ["bool"]
+            return_type = cvar.TypeCell.get("bool")
 
         else:
             return_str = str(node.value)
-            return_type = [type(node.value).__name__]
+            return_type = cvar.TypeCell.get(type(node.value).__name__)
 
         return return_str, return_type
     
@@ -912,7 +2706,7 @@ class PyAnalyzer():
         # keep they type if all items being compared are the same type
         
         if mixed_types:
-            return_type = ["auto"]
+            return_type = cvar.TypeCell.get("auto")
         else:
             return_type = compare_nodes[0][1]
             
@@ -952,21 +2746,63 @@ class PyAnalyzer():
                                                       file_index,
                                                       function_key)
 
+        operator = node.op.__class__.__name__
+        if operator == "Add" and left_type[0] == "str" and right_type[0] == "str":
+            # A chain of + would make a temporary string for every operand,
+            # so the whole chain is joined by a single call
+            parts = getattr(left_str, "parts", [left_str]) \
+                + getattr(right_str, "parts", [right_str])
+            self.add_helper(file_index, function_key, "pyc_concat")
+            return ConcatenationStr("pyc_concat(" + ", ".join(parts) + ")", parts), \
+                cvar.TypeCell.get("str")
+
         left_str = str(left_str)
         right_str = str(right_str)
-        operator = node.op.__class__.__name__
+        integer_types = ("int", "bool")
+        numeric_types = ("int", "bool", "float")
+        both_ints = left_type[0] in integer_types and right_type[0] in integer_types
+        both_numeric = left_type[0] in numeric_types and right_type[0] in numeric_types
         if operator in PyAnalyzer.operator_map:
             if operator == "Pow":
-                self.output_files[file_index].add_include_file("math.h")
-                return_str = "pow(" + left_str + ", " + right_str + ")"
-                return_type = ["float"]
-
-            elif operator == "FloorDiv":
-                return_str = left_str + " / " + right_str
-                # If they aren't both ints, we need to cast to int to truncate
-                if left_type[0] != "int" or right_type[0] != "int":
-                    return_str = "(int)(" + return_str + ")"
-                return_type = ["int"]
+                return_str, return_type = self.reduce_power(node, file_index,
+                                                            function_key,
+                                                            left_str, left_type,
+                                                            right_str, right_type)
+
+            elif operator in PyAnalyzer.checked_operators and both_ints \
+                    and self.options.get("checked_ints"):
+                return_str = self.call_checked(file_index, function_key,
+                                               PyAnalyzer.checked_operators[operator],
+                                               left_str, right_str)
+                return_type = cvar.TypeCell.get("int")
+
+            elif operator in ("FloorDiv", "Mod") and both_ints:
+                return_str = self.reduce_integer_division(node, file_index,
+                                                          function_key, left_str,
+                                                          right_str)
+                return_type = cvar.TypeCell.get("int")
+
+            elif operator == "FloorDiv" and both_numeric:
+                # Python floors float division and keeps the result a float
+                self.add_include_file(file_index, function_key, "cmath")
+                return_str = "std::floor(" + left_str + " / " + right_str + ")"
+                return_type = cvar.TypeCell.get("float")
+
+            elif operator == "Mod" and both_numeric:
+                self.add_helper(file_index, function_key, "pyc_fmod")
+                return_str = "pyc_fmod(" + left_str + ", " + right_str + ")"
+                return_type = cvar.TypeCell.get("float")
+
+            elif operator in ("FloorDiv", "Mod"):
+                if "str" in (left_type[0], right_type[0]):
+                    raise pcex.TranslationNotSupported("TODO: Floor division and modulo "
+                                                       "only supported on numbers")
+                # Operand types are left to the C++ compiler, which picks
+                # integer or float rounding
+                helper = "pyc_floordiv_any" if operator == "FloorDiv" else "pyc_mod_any"
+                self.add_helper(file_index, function_key, helper)
+                return_str = helper + "(" + left_str + ", " + right_str + ")"
+                return_type = cvar.TypeCell.get("auto")
 
             elif operator == "Div":
                 return_str = left_str + " / " + right_str
@@ -974,7 +2810,7 @@ class PyAnalyzer():
                 # math
                 if left_type[0] != "float" or right_type[0] != "float":
                     return_str = "(double)" + return_str
-                return_type = ["float"]
+                return_type = cvar.TypeCell.get("float")
 
             else:
                 return_str = left_str \
@@ -986,6 +2822,170 @@ class PyAnalyzer():
         return_str = "(" + return_str + ")"
         return return_str, return_type
     
+    def reduce_power(self, node, file_index, function_key, left_str, left_type,
+                     right_str, right_type):
+        """
+        Translates a power into the cheapest C++ giving the same result as
+        python. Small constant exponents become multiplications, other
+        integer powers with a non-negative exponent use exponentiation by
+        squaring, and everything else falls back to pow
+
+        Parameters
+        ----------
+        node : ast.BinOp
+            The power being translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        left_str, right_str : str
+            The translated base and exponent
+        left_type, right_type : list of str
+            Types of the base and exponent
+
+        Returns
+        -------
+        return_str : str
+            The power represented as a string
+        return_type : list of str
+            The type of the power
+        """
+        exponent = self.get_constant_int(node.right)
+        # Repeating anything more than a name or literal could repeat its side
+        # effects
+        simple_base = node.left.__class__ in (ast.Name, ast.Constant)
+
+        if left_type[0] in ("int", "bool") and right_type[0] in ("int", "bool"):
+            checked = self.options.get("checked_ints")
+            if exponent == 0:
+                # The base still has to run for any calls it makes
+                if any(child.__class__ is ast.Call for child in ast.walk(node.left)):
+                    return "((void)" + left_str + ", 1)", cvar.TypeCell.get("int")
+                return "1", cvar.TypeCell.get("int")
+            elif exponent is not None and simple_base and not checked \
+                    and 1 <= exponent <= PyAnalyzer.max_multiplied_power:
+                return " * ".join([left_str] * exponent), cvar.TypeCell.get("int")
+            elif (exponent is not None and exponent > 0) \
+                    or self.is_non_negative(node.right, function_key):
+                if checked:
+                    return self.call_checked(file_index, function_key, "ipow",
+                                             left_str, right_str), \
+                        cvar.TypeCell.get("int")
+                self.add_helper(file_index, function_key, "pyc_ipow")
+                return "pyc_ipow(" + left_str + ", " + right_str + ")", \
+                    cvar.TypeCell.get("int")
+            # A negative exponent gives a float in python
+
+        elif left_type[0] == "float" and exponent == 2 and simple_base:
+            # A single multiplication rounds exactly like pow does
+            return left_str + " * " + left_str, cvar.TypeCell.get("float")
+
+        self.add_include_file(file_index, function_key, "math.h")
+        return "pow(" + left_str + ", " + right_str + ")", cvar.TypeCell.get("float")
+
+    def reduce_integer_division(self, node, file_index, function_key, left_str,
+                                right_str):
+        """
+        Translates integer floor division or modulo. C++ rounds towards zero
+        where python floors, so they only agree when neither operand is
+        negative. Then powers of two become shifts and masks, otherwise a
+        helper applies python's rounding
+
+        Parameters
+        ----------
+        node : ast.BinOp
+            The floor division or modulo being translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        left_str, right_str : str
+            The translated operands
+
+        Returns
+        -------
+        str
+            The operation represented as a string
+        """
+        is_floordiv = node.op.__class__ is ast.FloorDiv
+        divisor = self.get_constant_int(node.right)
+        if self.options.get("checked_ints") and (divisor is None or divisor in (0, -1)):
+            # Python raises on a zero divisor and INT_MIN // -1 overflows
+            return self.call_checked(file_index, function_key,
+                                     "floordiv" if is_floordiv else "mod",
+                                     left_str, right_str)
+        if self.is_non_negative(node.left, function_key):
+            if divisor is not None and divisor > 0 and divisor & (divisor - 1) == 0:
+                if is_floordiv:
+                    return left_str + " >> " + str(divisor.bit_length() - 1)
+                return left_str + " & " + str(divisor - 1)
+            elif self.is_non_negative(node.right, function_key):
+                return left_str + (" / " if is_floordiv else " % ") + right_str
+
+        helper = "pyc_floordiv" if is_floordiv else "pyc_mod"
+        self.add_helper(file_index, function_key, helper)
+        return helper + "(" + left_str + ", " + right_str + ")"
+
+    def call_checked(self, file_index, function_key, operation, *operands):
+        """
+        Generates a call to one of the checked integer helpers, which note
+        when the result differs from python's instead of wrapping around
+
+        Parameters
+        ----------
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        operation : str
+            Name of the helper without the pyc_checked_ prefix
+        operands : str
+            The translated operands
+
+        Returns
+        -------
+        str
+            The call represented as a string
+        """
+        self.add_helper(file_index, function_key, "pyc_checked")
+        return "pyc_checked_" + operation + "(" + ", ".join(operands) + ")"
+
+    def is_non_negative(self, node, function_key):
+        """
+        Checks whether an integer expression can be proven to never be
+        negative
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        bool
+            True if the expression is never negative
+        """
+        node_type = node.__class__
+        if node_type is ast.Constant:
+            return type(node.value) in (int, bool) and node.value >= 0
+        elif node_type is ast.Name:
+            return node.id in self.non_negative_names.get(function_key, ())
+        elif node_type is ast.BinOp:
+            op_type = node.op.__class__
+            if op_type is ast.Mod:
+                # Python's modulo takes the sign of the divisor
+                return self.is_non_negative(node.right, function_key)
+            elif op_type is ast.BitAnd:
+                return self.is_non_negative(node.left, function_key) \
+                    or self.is_non_negative(node.right, function_key)
+            elif op_type in (ast.Add, ast.Mult, ast.FloorDiv, ast.Pow,
+                             ast.RShift, ast.BitOr):
+                return self.is_non_negative(node.left, function_key) \
+                    and self.is_non_negative(node.right, function_key)
+        return False
+
     def type_precedence(self, type_a, type_b):
         """
         We determine which type takes precedent based on loss of
@@ -1015,7 +3015,7 @@ class PyAnalyzer():
 
         else:
             # Type doesn't exist in our precedence table
-            return_type = ["auto"]
+            return_type = cvar.TypeCell.get("auto")
 
         return return_type
     
@@ -1052,11 +3052,17 @@ class PyAnalyzer():
                                                         file_index,
                                                         function_key)
 
+        if operator is ast.USub and return_type[0] in ("int", "bool") \
+                and self.options.get("checked_ints"):
+            return self.call_checked(file_index, function_key, "neg", return_str), \
+                cvar.TypeCell.get("int")
+
         # Not operation becomes a bool no matter what type it operated on
         if operator is ast.Not:
-            return_type = ["bool"]
-        else:
-            return_type = ["int"]
+            return_type = cvar.TypeCell.get("bool")
+        # Negating a float keeps it a float, anything else ends up an int
+        elif operator is ast.Invert or return_type[0] != "float":
+            return_type = cvar.TypeCell.get("int")
 
         return_str = "(" + PyAnalyzer.operator_map[operator.__name__] + return_str + ")"
         return return_str, return_type
@@ -1100,12 +3106,12 @@ class PyAnalyzer():
 
         return_str = ""
         # Chaining comparisons together with ands
-        for index in range(1, len(node.ops)-1):
+        for index in range(len(node.ops)-1):
             comparator = self.recurse_operator(node.comparators[index],
                                                file_index,
                                                function_key)[0]
             return_str += "(" + last_comparator \
-                          + PyAnalyzer.comparison_map[node.ops[index-1].__class__.__name__] \
+                          + PyAnalyzer.comparison_map[node.ops[index].__class__.__name__] \
                           + comparator + ") && "
             last_comparator = comparator
 
@@ -1119,7 +3125,7 @@ class PyAnalyzer():
                       + comparator + ")"
 
         # All comparisons come back as a bool
-        return_type = ["bool"]
+        return_type = cvar.TypeCell.get("bool")
         return return_str, return_type
     
     def recurse_operator(self, node, file_index, function_key):
@@ -1149,51 +3155,172 @@ class PyAnalyzer():
             If the python code cannot be directly translated
         """
         
+        # Sub expressions may already have been evaluated by the traversal
+        # below, in which case the handler calling us just takes the result
+        if node in self.expression_results:
+            return self.expression_results.pop(node)
+
+        self.expression_depth += 1
+        try:
+            # Evaluate operands bottom up with an explicit stack so long
+            # operator chains don't recurse once per operand
+            stack = [(operand, False) for operand in reversed(self.get_operands(node))]
+            while len(stack) > 0:
+                current, operands_done = stack.pop()
+                operands = self.get_operands(current)
+                if operands_done or len(operands) == 0:
+                    self.expression_results[current] = \
+                        self.parse_expression(current, file_index, function_key)
+                else:
+                    stack.append((current, True))
+                    stack.extend((operand, False) for operand in reversed(operands))
+
+            return self.parse_expression(node, file_index, function_key)
+        finally:
+            self.expression_depth -= 1
+            if self.expression_depth == 0:
+                # Drop anything left over from an expression that failed part
+                # way through
+                self.expression_results.clear()
+
+    def get_operands(self, node):
+        """
+        Finds the operands of an operator node that can be evaluated before
+        the operator itself. Calls aren't included since their arguments
+        shouldn't be evaluated if the call can't be translated, and neither
+        are operators the handler will reject before looking at the operands
+
+        Parameters
+        ----------
+        node : ast node
+            The expression node
+
+        Returns
+        -------
+        list of ast nodes
+            The operands in the order the handler evaluates them
+        """
         node_type = node.__class__
         if node_type is ast.BinOp:
-            return self.parse_BinOp(node, file_index, function_key)
-
+            return [node.left, node.right]
         elif node_type is ast.BoolOp:
-            return self.parse_BoolOp(node, file_index, function_key)
-
+            return node.values
         elif node_type is ast.UnaryOp:
-            return self.parse_UnaryOp(node, file_index, function_key)
-
+            if node.op.__class__.__name__ in PyAnalyzer.operator_map:
+                return [node.operand]
         elif node_type is ast.Compare:
-            return self.parse_Compare(node, file_index, function_key)
-
-        elif node_type is ast.Call:
-            return self.parse_Call(node, file_index, function_key)
+            for op in node.ops:
+                if op.__class__.__name__ not in PyAnalyzer.comparison_map:
+                    return []
+            return [node.left] + node.comparators
+        return []
 
-        elif node_type is ast.Name:
-            # Variable should already exist if we're using it, so we just grab
-            # it from the current context
-            try:
-                return node.id, self.find_var_type(node.id,
-                                                   file_index,
-                                                   function_key)
-            except pcex.VariableNotFound:
-                # Can't handle non declared variables being used
-                raise pcex.TranslationNotSupported("TODO: Variable used before declaration")
+    def parse_expression(self, node, file_index, function_key):
+        """
+        Calls the handler for an expression node
 
-        elif node_type is ast.Constant:
-            return self.parse_Constant(node, file_index, function_key)
-        
-        elif node_type is ast.List:
-            return self.parse_List(node,file_index,function_key)
-        elif node_type is ast.Subscript:
-            try:
-                return self.parse_Subscript(node,file_index,function_key)
-            except pcex.VariableNotFound:
-                raise pcex.TranslationNotSupported("TODO: Variable used before declaration")
+        Parameters
+        ----------
+        node : ast node
+            The ast node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
 
+        Returns
+        -------
+        tuple : (str, [str])
+            Tuple with the string representation of the operation and the
+            return type in a list of a string
 
-        else:
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        handler = self.expression_handlers.get(node.__class__)
+        if handler is None:
             # Anything we don't handle
             raise pcex.TranslationNotSupported()
+        try:
+            if self.profiler is not None and self.profiler.count_nodes:
+                return self.profiler.call_handler(node, handler, self, node,
+                                                  file_index, function_key)
+            return handler(self, node, file_index, function_key)
+        except pcex.VariableNotFound:
+            # Can't handle non declared variables being used
+            raise pcex.TranslationNotSupported("TODO: Variable used before declaration")
+
+    def parse_Name(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.Name node.
+
+        Parameters
+        ----------
+        node : ast.Name
+            The ast.Name node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The name of the variable
+        return_type : list of str
+            The type of the variable
+
+        Raises
+        ------
+        VariableNotFound
+            If the variable hasn't been declared
+        """
+        # Variable should already exist if we're using it, so we just grab
+        # it from the current context
+        return node.id, self.find_var_type(node.id, file_index, function_key)
         
         
      # Helper methods
+    def add_include_file(self, file_index, function_key, file):
+        """
+        Adds an include file to the output file, remembering which function
+        needed it so restored functions bring their includes with them
+
+        Parameters
+        ----------
+        file_index : int
+            Index of the file to add the include to
+        function_key : str
+            Key of the function that needs the include
+        file : str
+            Name of the include file to add
+        """
+        self.output_files[file_index].add_include_file(file)
+        includes = self.recorded_includes.setdefault(function_key, [])
+        if file not in includes:
+            includes.append(file)
+
+    def add_helper(self, file_index, function_key, name):
+        """
+        Adds a helper function to the output file, remembering which function
+        needed it so restored functions bring their helpers with them
+
+        Parameters
+        ----------
+        file_index : int
+            Index of the file to add the helper to
+        function_key : str
+            Key of the function that calls the helper
+        name : str
+            Name of the helper function in portedfunctions.helper_functions
+        """
+        self.output_files[file_index].add_helper(name)
+        helpers = self.recorded_helpers.setdefault(function_key, [])
+        if name not in helpers:
+            helpers.append(name)
+
     def find_var_type(self, name, file_index, function_key):
         """
         Finds the type of a variable in a given context
@@ -1225,6 +3352,9 @@ class PyAnalyzer():
         elif name in function_ref.variables:
             return function_ref.variables[name].py_var_type
 
+        elif name in function_ref.scoped_variables:
+            return function_ref.scoped_variables[name].py_var_type
+
         else:
             raise pcex.VariableNotFound()
     
@@ -1245,6 +3375,10 @@ class PyAnalyzer():
         """
         func_ref = self.output_files[file_index].functions[function_key]
 
+        # The element type of an empty list is found once elements are added
+        if len(node.elts) == 0:
+            return [], ["List", "auto"]
+
         # Parse elements of the list
         elements = [self.recurse_operator(el, file_index, function_key) for el in node.elts]
          # Extract data types and values
@@ -1266,42 +3400,105 @@ class PyAnalyzer():
     
     def parse_Subscript(self, node, file_index, function_key):
         """
-        Handles parsing an ast.Subscript node for list indexing.
+        Handles parsing an ast.Subscript node for list indexing.
+
+        Parameters
+        ----------
+        node : ast.Subscript
+            The ast.Subscript node to be translated.
+        file_index : int
+            Index of the file to write to in the output_files list.
+        function_key : str
+            Key used to find the correct function in the function dictionary.
+        indent : int
+            How much indentation a line should have.
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+
+        list_name = func_ref.vectors.get(node.value.id)
+        if list_name is None:
+            raise pcex.VariableNotFound()
+
+        index = self.recurse_operator(node.slice, file_index, function_key)[0]
+        # print(index)
+        if index is None:
+            raise pcex.TranslationNotSupported("TODO: Range query on vector")
+
+        
+        # Generate the C++ code for element access
+        access_code = f"{list_name.name}[{index}]"
+        
+        # print(access_code,list_name.element_type)
+        return access_code,cvar.TypeCell.get(list_name.get_py_element_type())
+
+class TypeCell(list):
+    """
+    A read only type holder shared by every object with the same type. Types
+    are stored in one element lists so they can be updated in place, but most
+    types never change once found, so those share a single interned cell
+    instead of each object holding its own list
+    """
+    __slots__ = ()
+
+    # Dictionary of {Type Name: TypeCell}
+    cells = {}
+
+    @staticmethod
+    def get(name):
+        """
+        Finds the shared cell for a type, creating it on first use
+
+        Parameters
+        ----------
+        name : str
+            Name of the type
+
+        Returns
+        -------
+        TypeCell
+            The shared cell holding the type
+        """
+        cell = TypeCell.cells.get(name)
+        if cell is None:
+            cell = TypeCell([sys.intern(name)])
+            TypeCell.cells[name] = cell
+        return cell
+
+    def __setitem__(self, index, value):
+        # Writing to a shared cell would change the type of every object
+        # using it, so anything that gets updated needs its own list
+        raise TypeError("Shared type cells cannot be modified")
+
+
+class ConcatenationStr(str):
+    """
+    The C++ code of a string concatenation, remembering the strings it joins
+    so concatenations built on top of it can join them all at once
+    """
+
+    def __init__(self, code, parts):
+        """
+        Constructs a ConcatenationStr, the code itself is passed to str
 
         Parameters
         ----------
-        node : ast.Subscript
-            The ast.Subscript node to be translated.
-        file_index : int
-            Index of the file to write to in the output_files list.
-        function_key : str
-            Key used to find the correct function in the function dictionary.
-        indent : int
-            How much indentation a line should have.
+        code : str
+            The C++ code of the concatenation
+        parts : list of str
+            C++ code of every string joined, in order
         """
-        func_ref = self.output_files[file_index].functions[function_key]
-
-        list_name = func_ref.vectors.get(node.value.id)
-        if list_name is None:
-            raise pcex.VariableNotFound()
+        self.parts = parts
 
-        index = self.recurse_operator(node.slice, file_index, function_key)[0]
-        # print(index)
-        if index is None:
-            raise pcex.TranslationNotSupported("TODO: Range query on vector")
+    def __new__(cls, code, parts):
+        return str.__new__(cls, code)
 
-        
-        # Generate the C++ code for element access
-        access_code = f"{list_name.name}[{index}]"
-        
-        # print(access_code,list_name.element_type)
-        return access_code,list_name.element_type
 
 class CPPVariable():
     """
     This class represents a variable, holding information about it to be used
     while outputting to the C++ file
     """
+    __slots__ = ("name", "line_num", "py_var_type", "qualifier")
     
     # Using redundant mapping to allow for changes to mapped type
     types = {
@@ -1331,13 +3528,56 @@ class CPPVariable():
         
         # We use a list here to get a mutable type
         self.py_var_type = py_var_type
+
+        # Written before the type on declaration, such as "const " for
+        # variables that are never assigned again
+        self.qualifier = ""
+
+    def to_dict(self):
+        """
+        Converts this variable to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The variable represented as a dictionary
+        """
+        return {"name": self.name, "line_num": self.line_num,
+                "py_var_type": self.py_var_type[0], "qualifier": self.qualifier}
+
+    @staticmethod
+    def from_dict(data, line_offset=0):
+        """
+        Recreates a variable from the output of to_dict
+
+        Parameters
+        ----------
+        data : dict
+            The variable represented as a dictionary
+        line_offset : int
+            Amount to shift the line number by if the code moved
+
+        Returns
+        -------
+        CPPVariable
+            The recreated variable
+        """
+        variable = CPPVariable(data["name"], data["line_num"] + line_offset,
+                               TypeCell.get(data["py_var_type"]))
+        variable.qualifier = data["qualifier"]
+        return variable
 class cvar:
-    CPPVariable=CPPVariable 
+    CPPVariable=CPPVariable
+    TypeCell=TypeCell
     
 class CPPCodeLine():
     """
     Class to represent a line of code in C++
     """
+    # Every translated line becomes one of these, so slots keep them small
+    __slots__ = ("start_line_num", "end_line_num", "end_char_index", "indent",
+                 "code_str", "comment_str", "pre_comment_str")
+
     # Using a variable in case we want to use tabs instead of spaces
     tab_delimiter = "    "
     
@@ -1389,6 +3629,45 @@ class CPPCodeLine():
         # Used to help put comments about a line of code that couldn't be
         # converted
         self.pre_comment_str = pre_comment_str
+
+    def to_dict(self):
+        """
+        Converts this code line to a dictionary that can be serialized to JSON
+
+        Returns
+        -------
+        dict
+            The code line represented as a dictionary
+        """
+        return {"start_line_num": self.start_line_num,
+                "end_line_num": self.end_line_num,
+                "end_char_index": self.end_char_index,
+                "indent": self.indent, "code_str": self.code_str,
+                "comment_str": self.comment_str,
+                "pre_comment_str": self.pre_comment_str}
+
+    @staticmethod
+    def from_dict(data, line_offset=0):
+        """
+        Recreates a code line from the output of to_dict
+
+        Parameters
+        ----------
+        data : dict
+            The code line represented as a dictionary
+        line_offset : int
+            Amount to shift the line numbers by if the code moved
+
+        Returns
+        -------
+        CPPCodeLine
+            The recreated code line
+        """
+        return CPPCodeLine(data["start_line_num"] + line_offset,
+                           data["end_line_num"] + line_offset,
+                           data["end_char_index"], data["indent"],
+                           data["code_str"], data["comment_str"],
+                           data["pre_comment_str"])
         
     def get_formatted_code_line(self):
         """
@@ -1399,33 +3678,41 @@ class CPPCodeLine():
         str
             A string with the converted C++ code
         """
-        return_str = ""
+        out = io.StringIO()
+        self.write_formatted_code_line(out)
+        return out.getvalue()
+
+    def write_formatted_code_line(self, out):
+        """
+        Writes the C++ code of this line to a text stream
+
+        Parameters
+        ----------
+        out : io.TextIOBase
+            Stream to write the code line to
+        """
+        indent_str = CPPCodeLine.tab_delimiter * self.indent
         # Goes through various permutations of how this object could be
         # populated. We need different handlers to ensure indentation is done
         # correctly
         if self.pre_comment_str != "":
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.pre_comment_str + "\n"
+            out.write(indent_str + "//" + self.pre_comment_str + "\n")
         
         if self.code_str != "":
             # Standard code line
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + self.code_str
+            out.write(indent_str)
+            out.write(self.code_str)
             if self.comment_str != "":
                 # Inline comment as well
-                return_str += CPPCodeLine.tab_delimiter \
-                              + "//" + self.comment_str
+                out.write(CPPCodeLine.tab_delimiter + "//" + self.comment_str)
                               
         elif self.comment_str != "":
             # Only a comment present
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.comment_str
+            out.write(indent_str + "//" + self.comment_str)
                           
         else:
             # Empty line
-            return_str += CPPCodeLine.tab_delimiter * self.indent
-            
-        return return_str        
+            out.write(indent_str)
 class cline:
     CPPCodeLine=CPPCodeLine
     
@@ -1433,6 +3720,17 @@ class CPPFile():
     """
     Class to represent a C++ file that will be exported
     """
+    __slots__ = ("includes", "helpers", "functions", "filename")
+
+    # Entry point of libraries using checked arithmetic, telling the caller
+    # whether the last call on this thread gave a different result than
+    # python would
+    take_overflow_definition = """bool pyc_take_overflow()
+{
+    bool overflowed = pyc_overflowed;
+    pyc_overflowed = false;
+    return overflowed;
+}"""
     
     def __init__(self,filename):
         """
@@ -1445,6 +3743,10 @@ class CPPFile():
         """
         # Includes are just strings of name of include file
         self.includes=[]
+
+        # Helper functions the generated code calls, written before any other
+        # function. Dictionary of {Helper Name: Definition}
+        self.helpers = {}
         
         # Stored as a dictionary of {Function Name: CPPFunction object}
         self.functions = {}
@@ -1463,35 +3765,198 @@ class CPPFile():
         """
         if file not in self.includes:
             self.includes.append(file)
+
+    def add_helper(self, name):
+        """
+        Adds one of the helper functions from portedfunctions to the file if
+        it isn't already there, along with the files it includes
+
+        Parameters
+        ----------
+        name : str
+            Name of the helper function
+        """
+        if name not in self.helpers:
+            includes, definition = pf.helper_functions[name]
+            for file in includes:
+                self.add_include_file(file)
+            self.helpers[name] = definition
             
-    def get_formatted_file_text(self):
+    def get_formatted_file_text(self, line_map=None):
         """
         Generates the text representing the entire C++ file
 
+        Parameters
+        ----------
+        line_map : list or None
+            If given, filled in like write_formatted_file_text does
+
         Returns
         -------
         return_str : str
             The text of the converted C++ file
         """
-        return_str= ""
-        
+        out = io.StringIO()
+        self.write_formatted_file_text(out, line_map)
+        return out.getvalue()
+
+    def write_formatted_file_text(self, out, line_map=None):
+        """
+        Writes the entire C++ file to a text stream one piece at a time, so
+        the whole file never has to be held in memory
+
+        Parameters
+        ----------
+        out : io.TextIOBase
+            Stream to write the file to
+        line_map : list or None
+            If given, a [First C++ Line, Last C++ Line, Python Line] entry is
+            appended for every translated line written, in file order
+        """
+        if line_map is not None:
+            out = LineCountingStream(out)
+
         for file in self.includes:
-            return_str+= "#include <"+ file + ">\n"
+            out.write("#include <" + file + ">\n")
             
-        return_str += "\n"
+        out.write("\n")
+
+        for definition in self.helpers.values():
+            out.write(definition + "\n\n")
         
         # Now put in forward declarations
         # Skip main since it doesn't need a forward declaration
         for function_key in list(self.functions.keys())[1:]:
-            return_str+= self.functions[function_key].get_forward_declaration() + ";\n"
+            out.write(self.functions[function_key].get_forward_declaration() + ";\n")
             
-        return_str +="\n"
+        out.write("\n")
         
         # Now we put in all of the functions for the file
         for function in self.functions.values():
-            return_str +=function.get_formatted_function_text() + "\n\n"
-            
-        return return_str
+            function.write_formatted_function_text(out, line_map)
+            out.write("\n\n")
+
+    def get_library_text(self, line_map=None, exported=None, included=None):
+        """
+        Generates the text of the file as a shared library, see
+        write_library_text
+
+        Returns
+        -------
+        str
+            The text of the library's C++ file
+        """
+        out = io.StringIO()
+        self.write_library_text(out, line_map, exported, included)
+        return out.getvalue()
+
+    def write_library_text(self, out, line_map=None, exported=None, included=None):
+        """
+        Writes the file as a shared library instead of a program. There is no
+        main, and every exported function gets an extern "C" entry point
+        taking C types
+
+        Parameters
+        ----------
+        out : io.TextIOBase
+            Stream to write the file to
+        line_map : list or None
+            If given, filled in like write_formatted_file_text does
+        exported : list of str or None
+            Functions to give entry points, every function with a C
+            compatible signature if None
+        included : list of str or None
+            Functions to write, which must include every exported function
+            and everything they call. Every function except main if None
+        """
+        if line_map is not None:
+            out = LineCountingStream(out)
+        if included is None:
+            included = [key for key in self.functions if key != "0"]
+        if exported is None:
+            exported = included
+
+        for file in self.includes + ["cstddef"]:
+            out.write("#include <" + file + ">\n")
+        out.write("\n")
+
+        for definition in self.helpers.values():
+            out.write(definition + "\n\n")
+
+        for function_key in included:
+            out.write(self.functions[function_key].get_forward_declaration() + ";\n")
+        out.write("\n")
+
+        for function_key in included:
+            self.functions[function_key].write_formatted_function_text(out, line_map)
+            out.write("\n\n")
+
+        out.write('extern "C" {\n\n')
+        for function_key in exported:
+            try:
+                self.functions[function_key].write_c_entry_point(out)
+            except pcex.TranslationNotSupported as ex:
+                out.write("// " + function_key + " not exported, " + ex.reason)
+            out.write("\n\n")
+        if "pyc_checked" in self.helpers:
+            out.write(CPPFile.take_overflow_definition + "\n\n")
+        out.write("}\n")
+
+    def get_header_text(self, exported=None):
+        """
+        Generates a C header declaring the entry points of the library, see
+        write_library_text
+
+        Parameters
+        ----------
+        exported : list of str or None
+            Functions given entry points, every function with a C compatible
+            signature if None
+
+        Returns
+        -------
+        str
+            The text of the header
+        """
+        if exported is None:
+            exported = [key for key in self.functions if key != "0"]
+        declarations = []
+        for function_key in exported:
+            try:
+                declarations.append(self.functions[function_key].get_c_declaration() + ";")
+            except pcex.TranslationNotSupported:
+                continue
+        if "pyc_checked" in self.helpers:
+            declarations.append("bool pyc_take_overflow();")
+
+        return ("#pragma once\n\n#include <stdbool.h>\n#include <stddef.h>\n\n"
+                + "#ifdef __cplusplus\nextern \"C\" {\n#endif\n\n"
+                + "\n".join(declarations)
+                + "\n\n#ifdef __cplusplus\n}\n#endif\n")
+
+
+class LineCountingStream():
+    """
+    Wraps a text stream, counting the lines written through it so positions
+    in the output can be recorded while it's streamed
+    """
+    __slots__ = ("out", "line_count")
+
+    def __init__(self, out):
+        """
+        Constructs a LineCountingStream
+
+        Parameters
+        ----------
+        out : io.TextIOBase
+            Stream to write to
+        """
+        self.out = out
+        self.line_count = 0
+
+    def write(self, text):
+        self.line_count += text.count("\n")
+        return self.out.write(text)
 class cfile:
     CPPFile=CPPFile    
         
@@ -1499,6 +3964,23 @@ class CPPFunction():
     """
     Class to represent Python functions as C++ functions
     """
+    __slots__ = ("name", "lineno", "end_lineno", "parameters", "lines",
+                 "variables", "scoped_variables", "vectors", "return_type",
+                 "mutated_parameters", "single_assignments", "setup_lines")
+
+    # Parameter types too large to copy on every call, passed by const
+    # reference unless the function changes them
+    reference_types = ("str", "auto")
+
+    # Python types passed through the C ABI unchanged, with their C type
+    c_types = {"int": "int", "float": "double", "bool": "bool"}
+
+    # Return types of functions that don't return a value
+    void_types = ("void", "None", "NoneType")
+
+    # Prepended to the name of every extern "C" entry point, so the symbols
+    # can't clash with anything else linked into the same process
+    c_symbol_prefix = "pyc_"
     
     def __init__(self, name, lineno, end_lineno, parameters={}):
         """
@@ -1540,12 +4022,58 @@ class CPPFunction():
         # allowing for type updates as the file is parsed
         # Dictionary of Variable Name : CPPVariable Object
         self.variables = {}
+
+        # Variables that only exist inside a block, such as loop variables.
+        # These are declared by the line opening the block instead of on
+        # their first assignment, and are removed once the block ends
+        # Dictionary of Variable Name : CPPVariable Object
+        self.scoped_variables = {}
         
         self.vectors= {}
         
         # Using a list so type gets updated if more information is found about
         # a related variable
         self.return_type = ["void"]
+
+        # Names of parameters the body assigns to or may otherwise change,
+        # which have to be passed by value
+        self.mutated_parameters = set()
+
+        # Names the body assigns exactly once and never changes afterwards,
+        # which can be declared const
+        self.single_assignments = set()
+
+        # Statements run at the start of the function before any translated
+        # code, such as stream setup in main
+        self.setup_lines = []
+
+    def get_parameter_type(self, name):
+        """
+        Generates the C++ type a parameter is passed as. Scalars and
+        parameters the function changes are passed by value, lists it only
+        reads as a span so any contiguous array can be passed without
+        copying it, and anything else by const reference
+
+        Parameters
+        ----------
+        name : str
+            Key of the parameter in the parameters dictionary
+
+        Returns
+        -------
+        str
+            The parameter's type, followed by a space
+        """
+        py_var_type = self.parameters[name].py_var_type[0]
+        if name in self.vectors:
+            element_type = self.vectors[name].element_type[0]
+            if name in self.mutated_parameters:
+                return "std::vector<" + element_type + "> "
+            return "std::span<const " + element_type + "> "
+        if py_var_type in CPPFunction.reference_types \
+                and name not in self.mutated_parameters:
+            return "const " + cvar.CPPVariable.types[py_var_type].strip() + "& "
+        return cvar.CPPVariable.types[py_var_type]
         
     def get_forward_declaration(self):
         """
@@ -1564,7 +4092,7 @@ class CPPFunction():
         
         if len(self.parameters) > 0:
             for parameter in self.parameters:
-                function_signature += cvar.CPPVariable.types[self.parameters[parameter].py_var_type[0]]
+                function_signature += self.get_parameter_type(parameter)
                 function_signature += parameter + ", "
             function_signature = function_signature[:-2]
             
@@ -1588,9 +4116,9 @@ class CPPFunction():
 
         # Check if there are any parameters before attempting to add them
         if len(self.parameters.values()) > 0:
-            for parameter in self.parameters.values():
+            for key, parameter in self.parameters.items():
                 # Prepend the param type in C++ style before the param name
-                function_signature += cvar.CPPVariable.types[parameter.py_var_type[0]]
+                function_signature += self.get_parameter_type(key)
                 function_signature += parameter.name + ", "
 
             # Remove the extra comma and space
@@ -1598,25 +4126,127 @@ class CPPFunction():
 
         return function_signature + ")"
     
+    def get_c_interface(self):
+        """
+        Finds how this function is called through the C ABI. Vectors are
+        passed as a pointer to their first element followed by their length
+
+        Returns
+        -------
+        return_type : str
+            C return type
+        parameters : list of str
+            C declaration of every parameter of the entry point
+        arguments : list of str
+            Expressions passing the entry point's parameters on to this
+            function
+
+        Raises
+        ------
+        TranslationNotSupported
+            If a parameter or the return value has no C equivalent
+        """
+        if self.return_type[0] in CPPFunction.c_types:
+            return_type = CPPFunction.c_types[self.return_type[0]]
+        elif self.return_type[0] in CPPFunction.void_types:
+            return_type = "void"
+        else:
+            raise pcex.TranslationNotSupported("returns " + self.return_type[0])
+
+        parameters = []
+        arguments = []
+        for key, parameter in self.parameters.items():
+            if key in self.vectors:
+                element_type = self.vectors[key].element_type[0]
+                if element_type not in CPPFunction.c_types.values():
+                    raise pcex.TranslationNotSupported("parameter " + key
+                                                       + " holds " + element_type)
+                # A copy made from the caller's array can't pass changes back
+                if key in self.mutated_parameters:
+                    raise pcex.TranslationNotSupported("changes list parameter " + key)
+                parameters.append("const " + element_type + "* " + key)
+                parameters.append("size_t " + key + "_len")
+                # Wraps the caller's array where it is, without copying it
+                arguments.append("std::span<const " + element_type + ">(" + key + ", "
+                                 + key + "_len)")
+            elif parameter.py_var_type[0] in CPPFunction.c_types:
+                parameters.append(CPPFunction.c_types[parameter.py_var_type[0]] + " " + key)
+                arguments.append(key)
+            else:
+                raise pcex.TranslationNotSupported("parameter " + key + " has type "
+                                                   + parameter.py_var_type[0])
+        return return_type, parameters, arguments
+
+    def get_c_declaration(self):
+        """
+        Generates the declaration of this function's extern "C" entry point
+
+        Returns
+        -------
+        str
+            The entry point's declaration
+
+        Raises
+        ------
+        TranslationNotSupported
+            If a parameter or the return value has no C equivalent
+        """
+        return_type, parameters, _ = self.get_c_interface()
+        return return_type + " " + CPPFunction.c_symbol_prefix + self.name \
+            + "(" + ", ".join(parameters) + ")"
+
+    def write_c_entry_point(self, out):
+        """
+        Writes an extern "C" function calling this function
+
+        :param out: Stream to write the entry point to
+        :raises TranslationNotSupported: If a parameter or the return value
+            has no C equivalent
+        """
+        return_type, _, arguments = self.get_c_interface()
+        out.write(self.get_c_declaration() + "\n{\n" + CPPCodeLine.tab_delimiter)
+        if return_type != "void":
+            out.write("return ")
+        out.write(self.name + "(" + ", ".join(arguments) + ");\n}")
+
     def get_formatted_function_text(self):
         """
         Generates a string with all of this function's code within it
 
         :return: String containing all of the function's C++ code
         """
-        return_str = ""
+        out = io.StringIO()
+        self.write_formatted_function_text(out)
+        return out.getvalue()
+
+    def write_formatted_function_text(self, out, line_map=None):
+        """
+        Writes all of this function's code to a text stream
 
+        :param out: Stream to write the function to
+        :param line_map: If given, a [First C++ Line, Last C++ Line, Python
+            Line] entry is appended for every translated line. out must then
+            be a LineCountingStream
+        """
         # First line is the function signature
-        return_str += self.get_signature() + "\n{\n"
+        out.write(self.get_signature() + "\n{\n")
+        for setup_line in self.setup_lines:
+            out.write(CPPCodeLine.tab_delimiter + setup_line + "\n")
 
-        # Go through all lines and get their formatted string version and
-        # append to the string we will return
+        # Go through all lines and write their formatted version
         for line in self.lines.values():
-            return_str += line.get_formatted_code_line() + "\n"
+            if line_map is None:
+                line.write_formatted_code_line(out)
+            else:
+                first_line = out.line_count + 1
+                line.write_formatted_code_line(out)
+                line_map.append([first_line, out.line_count + 1,
+                                 line.start_line_num])
+            out.write("\n")
         if(self.name=="0"):
-            return_str+="\n\treturn 0;\n"
+            out.write("\n\treturn 0;\n")
         # Add a closing bracket for the end of the function
-        return return_str + "}"
+        out.write("}")
 class cfun:
     CPPFunction=CPPFunction 
         
@@ -1625,7 +4255,12 @@ class CPPVector:
     """
     Represents a C++ vector and provides methods to handle vector operations.
     """
-    def __init__(self, name, element_type="auto", elements=None):
+    __slots__ = ("name", "element_type", "elements", "line_num", "qualifier")
+
+    # Element types cheap enough to copy rather than reference
+    scalar_types = ("int", "double", "bool")
+
+    def __init__(self, name, element_type="auto", elements=None, line_num=-1):
         """
         Initialize a CPPVector.
 
@@ -1637,10 +4272,58 @@ class CPPVector:
             Type of elements in the vector (e.g., int, float).
         elements : list, optional
             Initial elements for the vector.
+        line_num : int
+            The line number the vector was declared on in python.
         """
         self.name = name
-        self.element_type = [element_type]
         self.elements = elements or []
+        self.line_num = line_num
+
+        # Written before the type on declaration, "const " for vectors that
+        # are never changed
+        self.qualifier = ""
+
+        # An empty list gets its element type from what is added to it later,
+        # so it needs a cell of its own that can be updated
+        if len(self.elements) == 0 and element_type == "auto":
+            self.element_type = [element_type]
+        else:
+            self.element_type = TypeCell.get(element_type)
+
+    def to_dict(self):
+        """
+        Converts this vector to a dictionary that can be serialized to JSON
+
+        Returns:
+        -------
+        dict
+            The vector represented as a dictionary.
+        """
+        return {"name": self.name, "element_type": self.element_type[0],
+                "elements": list(self.elements), "line_num": self.line_num,
+                "qualifier": self.qualifier}
+
+    @staticmethod
+    def from_dict(data, line_offset=0):
+        """
+        Recreates a vector from the output of to_dict.
+
+        Parameters:
+        ----------
+        data : dict
+            The vector represented as a dictionary.
+        line_offset : int
+            Amount to shift the line number by if the code moved.
+
+        Returns:
+        -------
+        CPPVector
+            The recreated vector.
+        """
+        vector = CPPVector(data["name"], data["element_type"], data["elements"],
+                           data["line_num"] + line_offset)
+        vector.qualifier = data["qualifier"]
+        return vector
 
     def declaration(self):
         """
@@ -1651,8 +4334,44 @@ class CPPVector:
         str
             The C++ declaration as a string.
         """
+        if len(self.elements) == 0:
+            return f"{self.qualifier}std::vector<{self.element_type[0]}> {self.name};"
         elements_str = ", ".join(map(str, self.elements))
-        return f"std::vector<{self.element_type[0]}> {self.name} = {{ {elements_str} }};"
+        return f"{self.qualifier}std::vector<{self.element_type[0]}> {self.name} = {{ {elements_str} }};"
+
+    def get_py_element_type(self):
+        """
+        Finds the python type of the elements, since element types are kept
+        as C++ types
+
+        Returns:
+        -------
+        str
+            The python type of the elements.
+        """
+        for py_type, cpp_type in CPPVariable.types.items():
+            if cpp_type.strip() == self.element_type[0]:
+                return py_type
+        return "auto"
+
+    def get_element_binding(self, name):
+        """
+        Generate the C++ declaration of a variable bound to an element, copying
+        scalars and referencing anything else.
+
+        Parameters:
+        ----------
+        name : str
+            Name of the variable.
+
+        Returns:
+        -------
+        str
+            The C++ declaration without an initializer.
+        """
+        if self.element_type[0] in CPPVector.scalar_types:
+            return f"{self.element_type[0]} {name}"
+        return f"const auto& {name}"
 
     def access_element(self, index):
         """
@@ -1669,5 +4388,72 @@ class CPPVector:
             The C++ code for accessing the element.
         """
         return f"{self.name}[{index}]"
+
+    def append_element(self, value):
+        """
+        Generate C++ code to add an element to the end of the vector.
+
+        Parameters:
+        ----------
+        value : str
+            The element to add.
+
+        Returns:
+        -------
+        str
+            The C++ code for adding the element.
+        """
+        return f"{self.name}.push_back({value})"
+
+    def insert_elements(self, values):
+        """
+        Generate C++ code to add a list of elements to the end of the vector.
+
+        Parameters:
+        ----------
+        values : list of str
+            The elements to add.
+
+        Returns:
+        -------
+        str
+            The C++ code for adding the elements.
+        """
+        values_str = ", ".join(values)
+        return f"{self.name}.insert({self.name}.end(), {{ {values_str} }})"
+
+    def insert_vector(self, other):
+        """
+        Generate C++ code to add the elements of another vector to the end of
+        the vector.
+
+        Parameters:
+        ----------
+        other : CPPVector
+            The vector whose elements are added.
+
+        Returns:
+        -------
+        str
+            The C++ code for adding the elements.
+        """
+        return f"{self.name}.insert({self.name}.end(), {other.name}.begin(), {other.name}.end())"
+
+    def reserve_elements(self, count):
+        """
+        Generate C++ code to make room for more elements ahead of adding
+        them, so the vector doesn't reallocate as it grows.
+
+        Parameters:
+        ----------
+        count : str
+            Number of elements that are going to be added.
+
+        Returns:
+        -------
+        str
+            The C++ code reserving the space.
+        """
+        return f"{self.name}.reserve({self.name}.size() + {count})"
 class cvec:
     CPPVector=CPPVector
\ No newline at end of file
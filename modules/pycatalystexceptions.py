@@ -17,4 +17,12 @@ class VariableNotFound(PyPlusException):
     """
     Exception to indicate variable was not found in the current context
     """
-    pass
\ No newline at end of file
+    pass
+
+
+class CompilerNotFound(PyPlusException):
+    """
+    Exception to indicate no usable C++ compiler was found
+    """
+    def __init__(self, reason="No C++ compiler found"):
+        self.reason = reason
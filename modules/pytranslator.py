@@ -1,5 +1,28 @@
 import ast 
+import bisect
+import io
+import json
+import os
+import tokenize
+from modules import constantfolder
 from modules import pyanalyzer
+from modules.pyanalyzer import cvar, cline, cfile, cfun
+
+# Appended to the name of a C++ file to name the file mapping its lines back
+# to the python script
+LINE_MAP_SUFFIX = ".map.json"
+
+# Build rule written next to the C++ files of the library target
+MAKEFILE_TEMPLATE = """CXXFLAGS ?= -std=c++20 -O2
+
+{library}: {sources}
+\t$(CXX) $(CXXFLAGS) -fPIC -shared $^ -o $@
+
+clean:
+\trm -f {library}
+
+.PHONY: clean
+"""
 
 
 class PyTranslator():
@@ -7,16 +30,56 @@ class PyTranslator():
     This class starts the launching of the analysis on the script and writing the analysis output
     to a usable C++ file
     """
+    # Size of the buffer used when streaming C++ code into output files
+    write_buffer_size = 1024 * 1024
     
-    def __init__(self,script_path, output_path):
+    def __init__(self,script_path, output_path, options=None, cache=None,
+                 snapshots=None, profiler=None, preserve_unchanged=False):
         """
         Constructor of a python to C++ translator.
         This will automatically create a main.cpp and main function for code
         
+        Parameters
+        ----------
+        script_path : str
+            Path to the python script to translate
+        output_path : str
+            Directory to write the C++ files to
+        options : dict or None
+            Translation options that affect the generated code
+        cache : TranslationCache or None
+            Cache to serve unchanged translations from
+        snapshots : FunctionSnapshotStore or None
+            Function snapshots used to only re-analyze functions that changed
+            since the last run
+        profiler : PhaseProfiler or None
+            Records the time and memory of every phase when given
+        preserve_unchanged : bool
+            Leave output files whose text wouldn't change untouched, so their
+            modification times don't trigger needless C++ rebuilds. This
+            renders each file in memory instead of streaming it
         """
         self.script_path= script_path
         self.output_path= output_path
+        self.options= dict(options or {})
+        self.cache= cache
+        self.snapshots= snapshots
+        self.profiler= profiler
+        self.preserve_unchanged= preserve_unchanged
+
+        # Names of the files the last run actually wrote to disk
+        self.changed_files= []
+
+        # The analyzer from the last run, kept for inspecting the results
+        self.analyzer= None
         
+        self.reset_output_files()
+
+    def reset_output_files(self):
+        """
+        Creates a fresh main.cpp with an empty main function, discarding any
+        previous analysis
+        """
         self.output_files= [cfile.CPPFile("main")]
         main_params={"argc": cvar.CPPVariable("argc",-1,["int"]),
                      "argv": cvar.CPPVariable("argv",-1,["char **"])}
@@ -34,20 +97,193 @@ class PyTranslator():
         """
         This performs the process of converting the object representations
         of the code into usable strings and writes them to the appropriate
-        output file
+        output file. The code is streamed into the file as it is generated
+        so the full text is never held in memory
+
+        Returns
+        -------
+        list of str
+            Names of the files that were written
         """
         # Currently only one file, but this forms a basis to allow for multi-
         # file outputs from classes in C++
+        written_files = []
+        library = self.options.get("target") == "library"
         for file in self.output_files:
+            filename = file.filename + ".cpp"
+            line_map = [] if self.options.get("line_maps") else None
             try:
-                f = open(self.output_path + file.filename + ".cpp", "w")
-                f.write(file.get_formatted_file_text())
-                f.close()
+                if self.preserve_unchanged:
+                    if library:
+                        self.write_if_changed(filename, file.get_library_text(line_map))
+                    else:
+                        self.write_if_changed(filename, file.get_formatted_file_text(line_map))
+                else:
+                    with open(self.output_path + filename, "w",
+                              buffering=PyTranslator.write_buffer_size) as f:
+                        if library:
+                            file.write_library_text(f, line_map)
+                        else:
+                            file.write_formatted_file_text(f, line_map)
+                    self.changed_files.append(filename)
+                written_files.append(filename)
+
+                # Lets compiler diagnostics be traced back to the script
+                if line_map is not None:
+                    map_filename = filename + LINE_MAP_SUFFIX
+                    self.write_text_file(map_filename,
+                                         json.dumps({"script": os.path.basename(self.script_path),
+                                                     "lines": line_map}))
+                    written_files.append(map_filename)
+
+                if library:
+                    self.write_text_file(file.filename + ".h", file.get_header_text())
+                    written_files.append(file.filename + ".h")
             except IOError:
-                print("Error writing file: " + self.output_path
-                      + file.filename + ".cpp")
+                print("Error writing file: " + self.output_path + filename)
+
+        if library:
+            try:
+                self.write_text_file("Makefile", MAKEFILE_TEMPLATE.format(
+                    library="lib" + self.output_files[0].filename + ".so",
+                    sources=" ".join(file.filename + ".cpp" for file in self.output_files)))
+                written_files.append("Makefile")
+            except IOError:
+                print("Error writing file: " + self.output_path + "Makefile")
         print("Output written to " + self.output_path)
-        
+        return written_files
+
+    def count_output_files(self):
+        """
+        Counts the files write_cpp_files writes when nothing goes wrong
+
+        Returns
+        -------
+        int
+            Number of files
+        """
+        files_per_output = 1
+        if self.options.get("line_maps"):
+            files_per_output += 1
+        if self.options.get("target") == "library":
+            # A header for each file and one Makefile for all of them
+            return len(self.output_files) * (files_per_output + 1) + 1
+        return len(self.output_files) * files_per_output
+
+    def write_text_file(self, filename, text):
+        """
+        Writes a small file that isn't streamed to the output directory,
+        leaving it untouched if preserve_unchanged is set and it wouldn't
+        change
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file to write
+        text : str
+            The full text of the file
+        """
+        if self.preserve_unchanged:
+            self.write_if_changed(filename, text)
+        else:
+            with open(self.output_path + filename, "w") as f:
+                f.write(text)
+            self.changed_files.append(filename)
+
+    def read_output_files(self, filenames):
+        """
+        Reads back files from the output directory
+
+        Parameters
+        ----------
+        filenames : list of str
+            Names of the files to read
+
+        Returns
+        -------
+        dict of {str: str}
+            Dictionary of {File Name: File Text}
+        """
+        files = {}
+        for filename in filenames:
+            with open(self.output_path + filename, "r") as f:
+                files[filename] = f.read()
+        return files
+
+    def write_files(self, files):
+        """
+        Writes already formatted file text to the output directory
+
+        Parameters
+        ----------
+        files : dict of {str: str}
+            Dictionary of {File Name: File Text} to write
+        """
+        for filename, text in files.items():
+            try:
+                if self.preserve_unchanged:
+                    self.write_if_changed(filename, text)
+                else:
+                    f = open(self.output_path + filename, "w")
+                    f.write(text)
+                    f.close()
+                    self.changed_files.append(filename)
+            except IOError:
+                print("Error writing file: " + self.output_path + filename)
+        print("Output written to " + self.output_path)
+
+    def write_if_changed(self, filename, text):
+        """
+        Writes text to a file in the output directory unless the file already
+        holds exactly that text
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file to write
+        text : str
+            The full text of the file
+
+        Returns
+        -------
+        bool
+            True if the file was written
+        """
+        try:
+            with open(self.output_path + filename, "r") as f:
+                if f.read() == text:
+                    return False
+        except (OSError, UnicodeDecodeError):
+            pass
+        with open(self.output_path + filename, "w") as f:
+            f.write(text)
+        self.changed_files.append(filename)
+        return True
+        
+    def build_comment_index(self, raw_lines):
+        """
+        Finds every comment in the original script in a single tokenize pass
+
+        Parameters
+        ----------
+        raw_lines : list of str
+            List of strings containing the original python script line by line
+
+        Returns
+        -------
+        list of (int, int, bool)
+            List of (Line Number, Column, Is Inline) for every comment, in
+            line order. A comment is inline if code precedes it on its line
+        """
+        comments = []
+        source = io.StringIO("\n".join(raw_lines) + "\n")
+        for token in tokenize.generate_tokens(source.readline):
+            if token.type == tokenize.COMMENT:
+                line_num, column = token.start
+                is_inline = raw_lines[line_num - 1][:column].strip() != ""
+                comments.append((line_num, column, is_inline))
+        return comments
+
     def ingest_comments(self,raw_lines):
         """
         Pulls comments from the original script, converts them to C++ style comments, then puts them
@@ -59,54 +295,48 @@ class PyTranslator():
         raw_lines : list of str
             List of strings containing the original python script line by line
         """
-        # First get a dictionary with every existing line of code. That way
-        # we know whether to look for an inline comment or a full line comment
+        comments = self.build_comment_index(raw_lines)
         
         for file in self.output_files:
-            all_lines_dict={}
-            for cfunction in file.functions.values():
-                # -merge-two-dictionaries-in-a-single-expression-in-python
-                # -taking-union-o
-                all_lines_dict={**all_lines_dict,**cfunction.lines}
-                
-            # Going through all lines in the script we are parsing   
-            for index in range(len(raw_lines)):
-                # Line numbers count from 1 while list starts from 0, so we need to offset by 1
-                if (index+1) in all_lines_dict:
-                    # Looking fo inline comments
-                    code_line=all_lines_dict[index+1]
-                    comment=raw_lines[index][code_line.end_char_index:].lstrip()
-                    
-                    if len(comment)>0 and comment[0]=="#":
+            # Functions are sorted by where they start so the function owning
+            # a line can be found with a binary search instead of checking
+            # every function
+            functions = sorted((function for function in file.functions.values()
+                                if function.name != "0"),
+                               key=lambda function: function.lineno)
+            starts = [function.lineno for function in functions]
+
+            for line_num, column, is_inline in comments:
+                owner = file.functions["0"]
+                position = bisect.bisect_right(starts, line_num) - 1
+                if position >= 0 and line_num <= functions[position].end_lineno:
+                    owner = functions[position]
+
+                line = raw_lines[line_num - 1]
+                if line_num in owner.lines:
+                    if is_inline:
                         # Trim off the comment symbol as it will be changed
                         # to the C++ style comment
-                        all_lines_dict[index+1].comment_str=comment[1:].lstrip()
-                else:
-                    # Determine which function the line belongs to
-                    for function in file.functions.values():
-                        if function.lineno< index+1< function.end_lineno:
-                            line= raw_lines[index]
-                            comment= line.lstrip()
-                            if len(comment)>0 and comment[0]== "#":
-                                # C++ uses '//' to indicate comments instead of '#'
-                                comment= line.replace("#","//",1)
-                                function.lines[index+1]= cline.CPPCodeLine(index+1, index+1, len(line),0,comment)
-                                break
-                    else:
-                        line= raw_lines[index]
-                        comment=line.lstrip()
-                        if len(comment)>0 and comment[0]=="#":
-                            # We add an extra indent on code not in a function
-                            # since it will go into a function in C++
-                            comment=cline.CPPCodeLine.tab_delimiter+line.replace("#","//",1)
-                            file.functions["0"].lines[index+1]= cline.CPPCodeLine(index+1,index+1,len(line),0,comment)
-        
-        # Sort function line dictionaries so output is in proper order
-        for function in file.functions.values():
-            sorted_lines= {}
-            for line in sorted(function.lines.keys()):
-                sorted_lines[line]= function.lines[line]
-            function.lines = sorted_lines
+                        owner.lines[line_num].comment_str = line[column + 1:].lstrip()
+                elif not is_inline:
+                    # C++ uses '//' to indicate comments instead of '#'
+                    comment = line[:column] + "//" + line[column + 1:]
+                    if owner.name == "0":
+                        # We add an extra indent on code not in a function
+                        # since it will go into a function in C++
+                        comment = cline.CPPCodeLine.tab_delimiter + comment
+                    elif not owner.lineno < line_num < owner.end_lineno:
+                        continue
+                    owner.lines[line_num] = cline.CPPCodeLine(line_num, line_num,
+                                                              len(line), 0,
+                                                              comment)
+        
+            # Sort function line dictionaries so output is in proper order.
+            # Comments were appended in line order after the already ordered
+            # code lines, so the sort only has to merge two runs
+            for function in file.functions.values():
+                function.lines = {line: function.lines[line]
+                                  for line in sorted(function.lines.keys())}
             
     def apply_variable_types(self):
         """
@@ -122,8 +352,27 @@ class PyTranslator():
                         
                     # Prepend lne with variable type to apply type
                     cfunction.lines[variable.line_num].code_str \
-                        = cvar.CPPVariable.types[variable.py_var_type[0]] + cfunction.lines[variable.line_num].code_str
+                        = variable.qualifier + cvar.CPPVariable.types[variable.py_var_type[0]] \
+                        + cfunction.lines[variable.line_num].code_str
+
+                # Empty lists only find their element type once elements are
+                # added after the declaration
+                for vector in cfunction.vectors.values():
+                    if len(vector.elements) == 0 and vector.line_num in cfunction.lines:
+                        cfunction.lines[vector.line_num].code_str = vector.declaration()
     
+    def add_fast_io_setup(self):
+        """
+        Unsyncs the C++ streams from C stdio and unties cin from cout at the
+        start of main when the program uses them, so output isn't flushed
+        before every read and writes don't go through stdio
+        """
+        for file in self.output_files:
+            if "iostream" in file.includes:
+                self.output_files[0].functions["0"].setup_lines.extend(
+                    ["std::ios::sync_with_stdio(false);", "std::cin.tie(nullptr);"])
+                return
+
     def run(self):
         """
         Entry point for parsing a python script. This will read the script
@@ -136,339 +385,127 @@ class PyTranslator():
         
         indent=1
         
-        with open(self.script_path, "r") as py_source:
-            tree = ast.parse(py_source.read())
-            # resets pointer
-            py_source.seek(0)        
-            all_lines=py_source.read().splitlines()
-            
-        analyzer=pyanalyzer.PyAnalyzer(self.output_files,all_lines)
-        analyzer.analyze(tree.body,file_index,function_key,indent)
-        
-        self.apply_variable_types()
-        self.ingest_comments(all_lines)
-        self.write_cpp_files()
-        
-class CPPVariable():
-    """
-    This class represents a variable, holding information about it to be used
-    while outputting to the C++ file
-    """
-    
-    # Using redundant mapping to allow for changes to mapped type
-    types = {
-             "int": "int ", "float": "double ", "str": "std::string ",
-             "bool": "bool ", "None": "NULL", "char **": "char **",
-             "void": "void ", "auto": "auto ", "NoneType": "void "
-             }
-    
-    # Python uses capital letters while C++ uses lowercase
-    bool_map = {"True": "true", "False": "false"}
-    
-    def __init__(self, name, line_num, py_var_type):
-        """
-        Constructs a C++ variable object representation converted from python
-
-        Parameters
-        ----------
-        name : str
-            The name of the variable
-        line_num : int
-            The line number this variable was declared on in python
-        py_var_type : list of str
-            The type of the variable in python
-        """
-        self.name = name
-        self.line_num= line_num
-        
-        # We use a list here to get a mutable type
-        self.py_var_type = py_var_type
-class cvar:
-    CPPVariable=CPPVariable 
-    
-class CPPCodeLine():
-    """
-    Class to represent a line of code in C++
-    """
-    # Using a variable in case we want to use tabs instead of spaces
-    tab_delimiter = "    "
-    
-    def __init__(self, start_line_num, end_line_num, end_char_index,
-                 indent, code_str="", comment_str="", pre_comment_str=""):
-        """
-        Constructs a CPPLine object
-
-        Parameters
-        ----------
-        start_line_num : int
-            Line number the code starts on in the python file
-        end_line_num : int
-            Line number the code ends on in the python file
-        end_char_index : int
-             Index of the last character in this line in the python file
-        indent : int
-            Amount to indent the line by in the C++ file
-        code_str : str
-            The text for this line of C++ code
-        comment_str : str
-            The text for any inline comments, if applicable
-        pre_comment_str : str
-            The text for any comment that should precede this line of code, if
-            applicable
-        """
-        
-        # Line in the original python script
-        self.start_line_num = start_line_num
-
-        # Allows us to handle multiline code lines
-        self.end_line_num = end_line_num
+        self.changed_files= []
+        with open(self.script_path, "rb") as py_source:
+            source = py_source.read()
 
-        # Tells us where to start searching for inline comments, if any
-        self.end_char_index = end_char_index
+        # Unchanged scripts are served straight from the cache without
+        # parsing or analysis
+        if self.cache is not None:
+            key_options = self.options
+            # Line maps name the script, so scripts with the same source
+            # don't share them
+            if self.options.get("line_maps"):
+                key_options = dict(self.options,
+                                   script=os.path.basename(self.script_path))
+            cache_key = self.cache.make_key(source, key_options)
+            cached_files = self.cache.get(cache_key)
+            if cached_files is not None:
+                self.write_files(cached_files)
+                return
 
-        # How much to indent the line in the C++ file
-        self.indent = indent
+        source = source.decode()
+        all_lines = source.splitlines()
+        tree = self.run_phase("parse", ast.parse, source)
+        if self.options.get("fold_constants"):
+            tree = self.run_phase("fold_constants", self.fold_constants, tree)
+        self.analyzer = self.run_phase("analyze", self.analyze_script,
+                                       tree.body, all_lines, file_index,
+                                       function_key, indent)
+        self.run_phase("apply_variable_types", self.apply_variable_types)
+        if self.options.get("fast_io"):
+            self.add_fast_io_setup()
+        self.run_phase("ingest_comments", self.ingest_comments, all_lines)
+        written_files = self.run_phase("write_cpp_files", self.write_cpp_files)
 
-        # String containing the converted C++ code
-        self.code_str = code_str
+        if self.cache is not None and len(written_files) == self.count_output_files():
+            self.cache.put(cache_key, self.read_output_files(written_files))
 
-        # String containing any inline comments
-        # Also applicable if it is a comment only line, the code_str field
-        # will just be an empty string
-        self.comment_str = comment_str
-
-        # String containing a comment that should precede a line of code
-        # Used to help put comments about a line of code that couldn't be
-        # converted
-        self.pre_comment_str = pre_comment_str
-        
-    def get_formatted_code_line(self):
+    def run_phase(self, name, phase, *args):
         """
-        Generates a string representation of this C++ code line object
+        Runs one phase of the translation. This is the single place every
+        phase passes through, so timing and profiling can hook in here
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase
+        phase : callable
+            Function performing the phase
+        *args
+            Arguments to pass to the phase
 
         Returns
         -------
-        str
-            A string with the converted C++ code
-        """
-        return_str = ""
-        # Goes through various permutations of how this object could be
-        # populated. We need different handlers to ensure indentation is done
-        # correctly
-        if self.pre_comment_str != "":
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.pre_comment_str + "\n"
-        
-        if self.code_str != "":
-            # Standard code line
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + self.code_str
-            if self.comment_str != "":
-                # Inline comment as well
-                return_str += CPPCodeLine.tab_delimiter \
-                              + "//" + self.comment_str
-                              
-        elif self.comment_str != "":
-            # Only a comment present
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.comment_str
-                          
-        else:
-            # Empty line
-            return_str += CPPCodeLine.tab_delimiter * self.indent
-            
-        return return_str        
-class cline:
-    CPPCodeLine=CPPCodeLine
-    
-class CPPFile():
-    """
-    Class to represent a C++ file that will be exported
-    """
-    
-    def __init__(self,filename):
+        Whatever the phase returns
         """
-        Constructs a CPPFile object
+        if self.profiler is None:
+            return phase(*args)
+        return self.profiler.measure(name, phase, *args)
 
-        Parameters
-        ----------
-        filename : str
-            Name for the file
-        """
-        # Includes are just strings of name of include file
-        self.includes=[]
-        
-        # Stored as a dictionary of {Function Name: CPPFunction object}
-        self.functions = {}
-        
-        self.filename = filename
-        
-    def add_include_file(self, file):
+    def fold_constants(self, tree):
         """
-        Adds the provided include file to the current cpp file if it doesn't
-        already exist
+        Folds constant expressions and propagates module constants before
+        analysis. Functions depend on the constants propagated into them, so
+        those become part of their snapshot hashes
 
         Parameters
         ----------
-        file : str
-            Name of the include file to add
-        """
-        if file not in self.includes:
-            self.includes.append(file)
-            
-    def get_formatted_file_text(self):
-        """
-        Generates the text representing the entire C++ file
+        tree : ast.Module
+            The parsed script
 
         Returns
         -------
-        return_str : str
-            The text of the converted C++ file
+        ast.Module
+            The folded script
         """
-        return_str= ""
-        
-        for file in self.includes:
-            return_str+= "#include <"+ file + ">\n"
-            
-        return_str += "\n"
-        
-        # Now put in forward declarations
-        # Skip main since it doesn't need a forward declaration
-        for function_key in list(self.functions.keys())[1:]:
-            return_str+= self.functions[function_key].get_forward_declaration() + ";\n"
-            
-        return_str +="\n"
-        
-        # Now we put in all of the functions for the file
-        for function in self.functions.values():
-            return_str +=function.get_formatted_function_text() + "\n\n"
-            
-        return return_str
-class cfile:
-    CPPFile=CPPFile    
+        folder = constantfolder.ConstantFolder()
+        tree = folder.fold(tree)
+        if self.snapshots is not None:
+            self.snapshots.extra_inputs = {
+                name: repr(sorted(constants.items()))
+                for name, constants in folder.function_constants.items()}
+        return tree
 
-class CPPFunction():
-    """
-    Class to represent Python functions as C++ functions
-    """
-    
-    def __init__(self, name, lineno, end_lineno, parameters={}):
+    def analyze_script(self, tree, all_lines, file_index, function_key, indent):
         """
-        Constructs a CPPFunction object
+        Runs the analyzer over the parsed script, filling in the output files
 
         Parameters
         ----------
-        name : str
-            The name of the function
-        lineno : int
-            The line where the function is declared in the python file
-        end_lineno : int
-            The line where the function ends in the python file
-        parameters : dict of {str: CPPVariable}
-            The parameters this function has passed in
-        """
-        
-        self.name= name
-        
-        # We store these to help with performing the comment and blank line
-        # pass on the script file to know where to put the lines
-        # Note: doesn't apply for the main function which takes code from
-        # anywhere in the file
-        self.lineno = lineno
-        self.end_lineno = end_lineno
-        
-        # Provides a lookup table for parameters, allowing for type updates
-        # as file is parsed
-        # Dictionary of {Variable Name : CPPVariable Object}
-        self.parameters = parameters
-        
-        
-        # Lines in a function stored as a dictionary of format
-        # {LineNumber : CPPCodeLine} where line number is an int of the line
-        # number in the python script
-        self.lines = {}
-        
-        # Provides a lookup table for variables declared in the scope,
-        # allowing for type updates as the file is parsed
-        # Dictionary of Variable Name : CPPVariable Object
-        self.variables = {}
-        
-        self.vectors= {}
-        
-        # Using a list so type gets updated if more information is found about
-        # a related variable
-        self.return_type = ["void"]
-        
-    def get_forward_declaration(self):
-        """
-        Generates the string representation of this function's forward
-        declaration. This is separate from get signature because we don't
-        want to include any default values in the forward declaration
-
-        Returns
-        -------
-        str
-            The function's forward declaration
-        """
-        
-        function_signature = cvar.CPPVariable.types[self.return_type[0]]
-        function_signature += self.name + "("
-        
-        if len(self.parameters) > 0:
-            for parameter in self.parameters:
-                function_signature += cvar.CPPVariable.types[self.parameters[parameter].py_var_type[0]]
-                function_signature += parameter + ", "
-            function_signature = function_signature[:-2]
-            
-        return function_signature + ")"
-    
-    def get_signature(self):
-        """
-        Generates the string representation of this function's signature
+        tree : List of ast nodes
+            The body of the parsed script
+        all_lines : list of str
+            List containing the original python script, line by line
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key of the function module level code goes into
+        indent : int
+            How much indentation module level code should have
 
         Returns
         -------
-        str
-            The function's signature
+        PyAnalyzer
+            The analyzer that produced the final output
         """
-        function_signature = cvar.CPPVariable.types[self.return_type[0]]
-        # Convert internally named main function to proper name
-        if self.name == "0":
-            function_signature += "main("
-        else:
-            function_signature += self.name + "("
-
-        # Check if there are any parameters before attempting to add them
-        if len(self.parameters.values()) > 0:
-            for parameter in self.parameters.values():
-                # Prepend the param type in C++ style before the param name
-                function_signature += cvar.CPPVariable.types[parameter.py_var_type[0]]
-                function_signature += parameter.name + ", "
-
-            # Remove the extra comma and space
-            function_signature = function_signature[:-2]
-
-        return function_signature + ")"
-    
-    def get_formatted_function_text(self):
-        """
-        Generates a string with all of this function's code within it
-
-        :return: String containing all of the function's C++ code
-        """
-        return_str = ""
-
-        # First line is the function signature
-        return_str += self.get_signature() + "\n{\n"
+        analyzer=pyanalyzer.PyAnalyzer(self.output_files,all_lines,self.snapshots,
+                                       self.profiler, self.options)
+        analyzer.analyze(tree,file_index,function_key,indent)
 
-        # Go through all lines and get their formatted string version and
-        # append to the string we will return
-        for line in self.lines.values():
-            return_str += line.get_formatted_code_line() + "\n"
-        if(self.name=="0"):
-            return_str+="\n\treturn 0;\n"
-        # Add a closing bracket for the end of the function
-        return return_str + "}"
-class cfun:
-    CPPFunction=CPPFunction 
-        
\ No newline at end of file
+        if self.snapshots is not None:
+            # Restored functions whose surroundings changed types have to be
+            # analyzed again, which can in turn affect other functions
+            new_stale_functions = analyzer.find_stale_functions(file_index)
+            while len(new_stale_functions) > 0:
+                stale_functions = analyzer.stale_functions | new_stale_functions
+                self.reset_output_files()
+                analyzer = pyanalyzer.PyAnalyzer(self.output_files, all_lines,
+                                                 self.snapshots, self.profiler,
+                                                 self.options)
+                analyzer.stale_functions = stale_functions
+                analyzer.analyze(tree, file_index, function_key, indent)
+                new_stale_functions = analyzer.find_stale_functions(file_index)
+            analyzer.record_snapshots(tree, file_index)
+            self.snapshots.save()
+        return analyzer
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Bump when the output format changes in a way the source fingerprint
+# wouldn't catch
+TRANSLATOR_VERSION = "0.2.0"
+
+_translator_fingerprint = None
+
+
+def translator_fingerprint():
+    """
+    Computes a hash identifying the current translator. This combines the
+    version string with the source of every translator module so edits to the
+    translator invalidate old cache entries even without a version bump
+
+    Returns
+    -------
+    str
+        Hex digest identifying the translator
+    """
+    global _translator_fingerprint
+    if _translator_fingerprint is None:
+        digest = hashlib.sha256(TRANSLATOR_VERSION.encode())
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(module_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(module_dir, name), "rb") as module_file:
+                    digest.update(name.encode())
+                    digest.update(module_file.read())
+        _translator_fingerprint = digest.hexdigest()
+    return _translator_fingerprint
+
+
+class TranslationCache():
+    """
+    On disk cache of translated C++ files keyed by the content of the python
+    script, the translator version and the options used. Entries are evicted
+    least recently used first once the cache grows past its size limit
+    """
+    # File in the cache directory holding the total size of the entries, so
+    # storing an entry doesn't have to stat every other entry
+    size_file_name = "size"
+
+    # Fraction of max_bytes eviction shrinks the cache to, so a full cache
+    # is only scanned every so many puts instead of on every one
+    low_water = 0.75
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        """
+        Constructs a TranslationCache object
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory to store cache entries in, created if needed
+        max_bytes : int
+            Total size the cache entries may take before eviction starts
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, source, options=None):
+        """
+        Generates the cache key for a script
+
+        Parameters
+        ----------
+        source : bytes
+            The raw bytes of the python script
+        options : dict or None
+            Translation options that affect the output
+
+        Returns
+        -------
+        str
+            Hex digest to use as the cache key
+        """
+        digest = hashlib.sha256(translator_fingerprint().encode())
+        digest.update(json.dumps(options or {}, sort_keys=True).encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Looks up a cache entry, marking it as recently used
+
+        Parameters
+        ----------
+        key : str
+            The cache key from make_key
+
+        Returns
+        -------
+        dict of {str: str} or None
+            Dictionary of {File Name: File Text} or None on a cache miss
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, "r") as entry:
+                files = json.load(entry)
+            # The modification time doubles as the last used time for
+            # eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted by another process or a partial write
+            return None
+        return files
+
+    def put(self, key, files):
+        """
+        Stores the translated files for a key, then evicts old entries if the
+        cache has grown too large
+
+        Parameters
+        ----------
+        key : str
+            The cache key from make_key
+        files : dict of {str: str}
+            Dictionary of {File Name: File Text} to store
+        """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced_size = os.stat(path).st_size
+        except OSError:
+            replaced_size = 0
+
+        # Write to a temporary file first so concurrent readers never see a
+        # partially written entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as entry:
+            json.dump(files, entry)
+        os.replace(temp_path, path)
+
+        total_size = self.read_total_size()
+        if total_size is None:
+            self.evict()
+            return
+        total_size += os.stat(path).st_size - replaced_size
+        if total_size > self.max_bytes:
+            self.evict()
+        else:
+            self.write_total_size(total_size)
+
+    def read_total_size(self):
+        """
+        Reads the running total size of the entries
+
+        Returns
+        -------
+        int or None
+            The total in bytes, None if it hasn't been recorded
+        """
+        try:
+            with open(os.path.join(self.cache_dir, self.size_file_name), "r") as size_file:
+                return int(size_file.read())
+        except (OSError, ValueError):
+            return None
+
+    def write_total_size(self, total_size):
+        """
+        Records the running total size of the entries. Processes sharing the
+        cache can overwrite each other's totals, which only lets the cache
+        run over its limit until the next eviction recounts it
+
+        Parameters
+        ----------
+        total_size : int
+            The total in bytes
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "w") as size_file:
+            size_file.write(str(total_size))
+        os.replace(temp_path, os.path.join(self.cache_dir, self.size_file_name))
+
+    def evict(self):
+        """
+        Counts every entry and removes the least recently used ones until the
+        cache is down to low_water of max_bytes, recording the total left
+        """
+        entries = []
+        total_size = 0
+        for directory, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if not file_name.endswith(".json"):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        entries.sort()
+        if total_size > self.max_bytes:
+            for _, size, path in entries:
+                if total_size <= self.max_bytes * self.low_water:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total_size -= size
+        self.write_total_size(total_size)
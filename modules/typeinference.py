@@ -0,0 +1,628 @@
+import ast
+
+
+# Types are python type names such as "int" or "str". Lists are ("list",
+# Element Type) tuples. None is the bottom of the lattice, meaning nothing is
+# known yet, and TOP means values of incompatible types meet
+TOP = "auto"
+
+# Numeric types from narrowest to widest. Python promotes along this chain,
+# so meeting numbers gives the wider of the two
+NUMERIC_TYPES = ("bool", "int", "float")
+
+# Types a C++ parameter or return value can be declared as
+SCALAR_TYPES = ("bool", "int", "float", "str")
+
+# Deepest nesting of lists kept before widening to TOP. Code like x = [x] in
+# a loop nests one level deeper on every pass, so without a bound the
+# inference would never finish
+MAX_LIST_DEPTH = 4
+
+
+def list_depth(inferred_type):
+    """
+    Counts how many lists are nested in a type
+
+    Parameters
+    ----------
+    inferred_type : str, tuple or None
+        The type to measure
+
+    Returns
+    -------
+    int
+        0 for anything but a list, 1 for a list of scalars and so on
+    """
+    depth = 0
+    while type(inferred_type) is tuple:
+        depth += 1
+        inferred_type = inferred_type[1]
+    return depth
+
+
+def join(type_a, type_b):
+    """
+    Finds the narrowest type both types fit in
+
+    Parameters
+    ----------
+    type_a : str, tuple or None
+        One of the types to join
+    type_b : str, tuple or None
+        The other type to join
+
+    Returns
+    -------
+    str, tuple or None
+        The least upper bound of the two types, TOP for lists nested deeper
+        than MAX_LIST_DEPTH
+    """
+    if type_a is None or type_a == type_b:
+        joined = type_b
+    elif type_b is None:
+        joined = type_a
+    elif type_a in NUMERIC_TYPES and type_b in NUMERIC_TYPES:
+        return max(type_a, type_b, key=NUMERIC_TYPES.index)
+    elif type(type_a) is tuple and type(type_b) is tuple:
+        joined = ("list", join(type_a[1], type_b[1]))
+    else:
+        return TOP
+    return TOP if list_depth(joined) > MAX_LIST_DEPTH else joined
+
+
+def arithmetic(type_a, type_b):
+    """
+    Finds the type of arithmetic on two numbers, where bools act as ints
+
+    Parameters
+    ----------
+    type_a : str
+        Type of the left operand
+    type_b : str
+        Type of the right operand
+
+    Returns
+    -------
+    str
+        The type of the result, TOP if either operand isn't a number
+    """
+    if type_a not in NUMERIC_TYPES or type_b not in NUMERIC_TYPES:
+        return TOP
+    return join(join(type_a, type_b), "int")
+
+
+class TypeInferencer():
+    """
+    Infers the parameter and return types of every function in a script
+    before any body is translated. Every function body and the module body
+    are walked repeatedly, joining the types of the arguments at every call
+    site into the parameters of the called function and the types of every
+    return into its return type, until nothing changes. Types only ever move
+    up the lattice, and join widens lists nested deeper than MAX_LIST_DEPTH
+    to TOP, so the lattice has a finite height and this always reaches a
+    fixed point
+    """
+    # Builtins whose result type is known without looking at their arguments
+    # Dictionary of {Function Name: Return Type}
+    builtin_returns = {"int": "int", "float": "float", "str": "str",
+                       "bool": "bool", "len": "int", "sqrt": "float",
+                       "print": "None"}
+
+    # Builtins that return one of their arguments
+    joining_builtins = ("abs", "min", "max")
+
+    def __init__(self, functions, module_body):
+        """
+        Constructs a TypeInferencer
+
+        Parameters
+        ----------
+        functions : dict of {str: ast.FunctionDef}
+            The functions to infer types for, by name
+        module_body : list of ast nodes
+            The module level statements, whose calls count as call sites
+        """
+        self.functions = functions
+        self.module_body = module_body
+
+        # Dictionary of {Function Name: {Parameter Name: Type}}
+        self.parameter_types = {}
+
+        # Dictionary of {Function Name: Type}
+        self.return_types = {}
+
+        # Types of the variables assigned in each body, None for the module
+        # Dictionary of {Function Name: {Variable Name: Type}}
+        self.variable_types = {}
+
+        # Types of operands found ahead of the operator that uses them
+        # Dictionary of {ast node: Type}
+        self.expression_results = {}
+
+        self.changed = False
+
+    def infer(self):
+        """
+        Runs the inference to its fixed point
+
+        Returns
+        -------
+        int
+            Number of passes over the script it took
+        """
+        for name, node in self.functions.items():
+            args = node.args.args
+            defaults = [None] * (len(args) - len(node.args.defaults)) \
+                + list(node.args.defaults)
+            self.parameter_types[name] = {
+                arg.arg: None if default is None else self.expression_type(default, {})
+                for arg, default in zip(args, defaults)}
+            self.return_types[name] = None
+            self.variable_types[name] = {}
+        self.variable_types[None] = {}
+
+        passes = 0
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            passes += 1
+            for name, node in self.functions.items():
+                env = self.variable_types[name]
+                for param_name, param_type in self.parameter_types[name].items():
+                    self.update(env, param_name, param_type)
+                self.visit_body(node.body, env, name)
+                # Like the translation, a function only returns None when it
+                # never returns a value
+                if not any(child.__class__ is ast.Return and child.value is not None
+                           for child in ast.walk(node)):
+                    self.add_return(name, "None")
+            self.visit_body(self.module_body, self.variable_types[None], None)
+        return passes
+
+    def update(self, types, key, new_type):
+        """
+        Joins a type into an entry of a type dictionary, noting whether it
+        changed
+
+        Parameters
+        ----------
+        types : dict
+            The dictionary to update
+        key : str
+            The entry to update
+        new_type : str, tuple or None
+            The type to join in
+        """
+        old_type = types.get(key)
+        joined = join(old_type, new_type)
+        if joined != old_type:
+            types[key] = joined
+            self.changed = True
+
+    def add_return(self, function, return_type):
+        """
+        Joins a returned type into the return type of a function
+
+        Parameters
+        ----------
+        function : str
+            Name of the function returning
+        return_type : str, tuple or None
+            Type of the returned value
+        """
+        self.update(self.return_types, function, return_type)
+
+    def visit_body(self, body, env, function):
+        """
+        Walks a list of statements, updating the types they affect
+
+        Parameters
+        ----------
+        body : list of ast nodes
+            The statements to walk
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+        function : str or None
+            Name of the function being walked, None for the module body
+        """
+        for node in body:
+            node_type = node.__class__
+            if node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                continue
+            elif node_type is ast.Assign:
+                value_type = self.expression_type(node.value, env)
+                for target in node.targets:
+                    self.bind(target, value_type, env)
+            elif node_type is ast.AnnAssign:
+                if node.value is not None:
+                    self.bind(node.target, self.expression_type(node.value, env), env)
+            elif node_type is ast.AugAssign:
+                value_type = self.expression_type(ast.BinOp(node.target, node.op,
+                                                            node.value), env)
+                self.bind(node.target, value_type, env)
+            elif node_type is ast.For:
+                self.bind_loop_target(node, env)
+                self.visit_body(node.body, env, function)
+                self.visit_body(node.orelse, env, function)
+            elif node_type is ast.Return:
+                if function is None:
+                    continue
+                if node.value is None:
+                    self.add_return(function, "None")
+                else:
+                    self.add_return(function, self.expression_type(node.value, env))
+            else:
+                for child in ast.iter_child_nodes(node):
+                    if isinstance(child, ast.expr):
+                        self.expression_type(child, env)
+                for field in ("body", "orelse", "finalbody"):
+                    self.visit_body(getattr(node, field, []), env, function)
+                for handler in getattr(node, "handlers", []):
+                    self.visit_body(handler.body, env, function)
+
+    def bind(self, target, value_type, env):
+        """
+        Joins the type of an assigned value into the variables it's assigned to
+
+        Parameters
+        ----------
+        target : ast node
+            The target of the assignment
+        value_type : str, tuple or None
+            Type of the assigned value
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+        """
+        if target.__class__ is ast.Name:
+            self.update(env, target.id, value_type)
+        elif target.__class__ in (ast.Tuple, ast.List):
+            for element in target.elts:
+                self.bind(element, TOP, env)
+        else:
+            # Storing into a subscript or attribute still evaluates it
+            self.expression_type(target, env)
+
+    def bind_loop_target(self, node, env):
+        """
+        Joins the types a for loop gives its loop variables into them
+
+        Parameters
+        ----------
+        node : ast.For or ast.comprehension
+            The loop
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+        """
+        iter_node = node.iter
+        iter_type = self.expression_type(iter_node, env)
+        iter_func = None
+        if iter_node.__class__ is ast.Call and iter_node.func.__class__ is ast.Name:
+            iter_func = iter_node.func.id
+
+        if iter_func == "range":
+            self.bind(node.target, "int", env)
+        elif iter_func == "enumerate" and node.target.__class__ is ast.Tuple \
+                and len(node.target.elts) == 2 and len(iter_node.args) > 0:
+            list_type = self.expression_type(iter_node.args[0], env)
+            self.bind(node.target.elts[0], "int", env)
+            self.bind(node.target.elts[1], self.element_type(list_type), env)
+        else:
+            self.bind(node.target, self.element_type(iter_type), env)
+
+    def element_type(self, container_type):
+        """
+        Finds the type of the elements of a container
+
+        Parameters
+        ----------
+        container_type : str, tuple or None
+            Type of the container
+
+        Returns
+        -------
+        str, tuple or None
+            Type of its elements, TOP if it isn't a known container
+        """
+        if container_type is None:
+            return None
+        elif type(container_type) is tuple:
+            return container_type[1]
+        elif container_type == "str":
+            return "str"
+        return TOP
+
+    def expression_type(self, node, env):
+        """
+        Finds the type of an expression, recording the argument types of any
+        calls to the script's functions within it
+
+        Parameters
+        ----------
+        node : ast node
+            The expression
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+
+        Returns
+        -------
+        str, tuple or None
+            The type of the expression, None if it depends on something not
+            known yet
+        """
+        # Operands may already have been typed by the traversal below, in
+        # which case the operator typing them just takes the result
+        if node in self.expression_results:
+            return self.expression_results.pop(node)
+
+        # Type operands bottom up with an explicit stack so long operator
+        # chains don't recurse once per operand
+        stack = [(operand, False) for operand in reversed(self.get_operands(node))]
+        while len(stack) > 0:
+            current, operands_done = stack.pop()
+            operands = self.get_operands(current)
+            if operands_done or len(operands) == 0:
+                self.expression_results[current] = self.evaluate_type(current, env)
+            else:
+                stack.append((current, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+        return self.evaluate_type(node, env)
+
+    def get_operands(self, node):
+        """
+        Finds the operands of an operator node, which its type is built from
+
+        Parameters
+        ----------
+        node : ast node
+            The expression node
+
+        Returns
+        -------
+        list of ast nodes
+            The operands in the order they're typed
+        """
+        node_type = node.__class__
+        if node_type is ast.BinOp:
+            return [node.left, node.right]
+        elif node_type is ast.BoolOp:
+            return node.values
+        elif node_type is ast.UnaryOp:
+            return [node.operand]
+        elif node_type is ast.Compare:
+            return [node.left] + node.comparators
+        return []
+
+    def evaluate_type(self, node, env):
+        """
+        Finds the type of a single expression node, typing its operands
+        through expression_type
+
+        Parameters
+        ----------
+        node : ast node
+            The expression
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+
+        Returns
+        -------
+        str, tuple or None
+            The type of the expression, None if it depends on something not
+            known yet
+        """
+        node_type = node.__class__
+        if node_type is ast.Constant:
+            if node.value is None:
+                return "None"
+            value_type = type(node.value).__name__
+            return value_type if value_type in SCALAR_TYPES else TOP
+
+        elif node_type is ast.Name:
+            return env.get(node.id)
+
+        elif node_type is ast.BinOp:
+            return self.binop_type(node, env)
+
+        elif node_type is ast.UnaryOp:
+            operand_type = self.expression_type(node.operand, env)
+            if node.op.__class__ is ast.Not:
+                return "bool"
+            elif operand_type is None:
+                return None
+            elif node.op.__class__ is ast.Invert:
+                return arithmetic(operand_type, "int") if operand_type != "float" else TOP
+            return arithmetic(operand_type, "int")
+
+        elif node_type is ast.BoolOp:
+            value_type = None
+            for value in node.values:
+                value_type = join(value_type, self.expression_type(value, env))
+            return value_type
+
+        elif node_type is ast.Compare:
+            self.expression_type(node.left, env)
+            for comparator in node.comparators:
+                self.expression_type(comparator, env)
+            return "bool"
+
+        elif node_type is ast.IfExp:
+            self.expression_type(node.test, env)
+            return join(self.expression_type(node.body, env),
+                        self.expression_type(node.orelse, env))
+
+        elif node_type is ast.Call:
+            return self.call_type(node, env)
+
+        elif node_type is ast.List:
+            element_type = None
+            for element in node.elts:
+                element_type = join(element_type, self.expression_type(element, env))
+            return ("list", element_type)
+
+        elif node_type is ast.ListComp:
+            # The comprehension's variables don't leak into the enclosing
+            # scope
+            comprehension_env = dict(env)
+            for generator in node.generators:
+                # Binding into the fresh copy always looks like a change, so
+                # only typing the iterable, which records its calls, counts
+                # towards the fixed point
+                self.expression_type(generator.iter, comprehension_env)
+                changed = self.changed
+                self.bind_loop_target(generator, comprehension_env)
+                self.changed = changed
+                for test in generator.ifs:
+                    self.expression_type(test, comprehension_env)
+            return ("list", self.expression_type(node.elt, comprehension_env))
+
+        elif node_type is ast.Subscript:
+            value_type = self.expression_type(node.value, env)
+            self.expression_type(node.slice, env)
+            if node.slice.__class__ is ast.Slice:
+                return value_type if value_type == "str" \
+                    or type(value_type) is tuple else TOP
+            return self.element_type(value_type)
+
+        # Anything else still has its sub expressions walked for calls
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                self.expression_type(child, env)
+        return TOP
+
+    def binop_type(self, node, env):
+        """
+        Finds the type of a binary operation with python's promotion rules
+
+        Parameters
+        ----------
+        node : ast.BinOp
+            The operation
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+
+        Returns
+        -------
+        str, tuple or None
+            The type of the result
+        """
+        left_type = self.expression_type(node.left, env)
+        right_type = self.expression_type(node.right, env)
+        if left_type is None or right_type is None:
+            return None
+
+        operator = node.op.__class__
+        if operator is ast.Add and left_type == right_type == "str":
+            return "str"
+        elif operator is ast.Add and type(left_type) is tuple \
+                and type(right_type) is tuple:
+            return join(left_type, right_type)
+        elif operator is ast.Mult and "str" in (left_type, right_type):
+            other_type = right_type if left_type == "str" else left_type
+            return "str" if other_type in ("int", "bool") else TOP
+        elif operator is ast.Div:
+            return "float" if arithmetic(left_type, right_type) != TOP else TOP
+        elif operator is ast.Pow:
+            result_type = arithmetic(left_type, right_type)
+            # An integer to a negative power is a float, which is only ruled
+            # out when the exponent is a literal
+            if result_type == "int" and not (node.right.__class__ is ast.Constant
+                                             and node.right.value >= 0):
+                return "float"
+            return result_type
+        elif operator in (ast.LShift, ast.RShift, ast.BitOr, ast.BitAnd, ast.BitXor):
+            return "int" if arithmetic(left_type, right_type) == "int" else TOP
+        return arithmetic(left_type, right_type)
+
+    def call_type(self, node, env):
+        """
+        Finds the type a call returns. Calls to the script's functions join
+        their argument types into its parameters
+
+        Parameters
+        ----------
+        node : ast.Call
+            The call
+        env : dict of {str: str, tuple or None}
+            Types of the variables in scope
+
+        Returns
+        -------
+        str, tuple or None
+            The type the call returns
+        """
+        arg_types = [self.expression_type(arg, env) for arg in node.args]
+        for keyword in node.keywords:
+            self.expression_type(keyword.value, env)
+        if node.func.__class__ is ast.Attribute and node.func.value.__class__ is ast.Name \
+                and node.func.attr in ("append", "extend") and len(arg_types) == 1:
+            # Growing a list joins the new elements into its element type
+            if node.func.attr == "append":
+                self.update(env, node.func.value.id, ("list", arg_types[0]))
+            elif type(arg_types[0]) is tuple:
+                self.update(env, node.func.value.id, arg_types[0])
+            return "None"
+        if node.func.__class__ is not ast.Name:
+            self.expression_type(node.func, env)
+            return TOP
+
+        name = node.func.id
+        if name in self.functions:
+            parameters = self.parameter_types[name]
+            for param_name, arg_type in zip(parameters, arg_types):
+                self.update(parameters, param_name, arg_type)
+            for keyword in node.keywords:
+                if keyword.arg in parameters:
+                    self.update(parameters, keyword.arg,
+                                self.expression_type(keyword.value, env))
+            return self.return_types[name]
+        elif name in TypeInferencer.builtin_returns:
+            return TypeInferencer.builtin_returns[name]
+        elif name in TypeInferencer.joining_builtins and len(arg_types) > 0:
+            result_type = None
+            for arg_type in arg_types:
+                result_type = join(result_type, arg_type)
+            return result_type
+        elif name == "round":
+            return "int" if len(arg_types) == 1 else "float"
+        return TOP
+
+    def get_declared_type(self, inferred_type):
+        """
+        Converts an inferred type to the type a C++ declaration should use
+
+        Parameters
+        ----------
+        inferred_type : str, tuple or None
+            The inferred type
+
+        Returns
+        -------
+        str or None
+            The python type name to declare with, "auto" if there isn't a
+            single concrete type, or None if nothing was inferred
+        """
+        if inferred_type is None:
+            return None
+        elif inferred_type in SCALAR_TYPES:
+            return inferred_type
+        return TOP
+
+    def get_declared_element_type(self, inferred_type):
+        """
+        Converts an inferred list type to the element type a C++ vector
+        should be declared with
+
+        Parameters
+        ----------
+        inferred_type : str, tuple or None
+            The inferred type
+
+        Returns
+        -------
+        str or None
+            The python type name of the elements, or None if the type isn't a
+            list of a single concrete type
+        """
+        if type(inferred_type) is tuple and inferred_type[1] in SCALAR_TYPES:
+            return inferred_type[1]
+        return None
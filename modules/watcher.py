@@ -0,0 +1,193 @@
+import os
+import time
+import traceback
+
+from modules import batchtranslator
+from modules import incremental
+from modules import pytranslator
+
+
+class WatchResult():
+    """
+    The outcome of retranslating one script after it changed
+    """
+
+    def __init__(self, script_path, output_path, changed_files, error=""):
+        """
+        Constructs a WatchResult
+
+        Parameters
+        ----------
+        script_path : str
+            Path of the script that was retranslated
+        output_path : str
+            Directory the output was written to
+        changed_files : list of str
+            Names of the output files whose text changed and were rewritten
+        error : str
+            Description of the failure, empty on success
+        """
+        self.script_path = script_path
+        self.output_path = output_path
+        self.changed_files = changed_files
+        self.error = error
+
+    @property
+    def success(self):
+        return self.error == ""
+
+    def format_report(self):
+        if not self.success:
+            return "FAIL " + self.script_path + ": " + self.error
+        if len(self.changed_files) == 0:
+            return "OK   " + self.script_path + " (output unchanged)"
+        return "OK   " + self.script_path + " -> " + ", ".join(
+            self.output_path + filename for filename in self.changed_files)
+
+
+class ScriptWatcher():
+    """
+    Keeps translating a set of scripts as they change. The process stays
+    alive between changes, so the interpreter, the translator modules and the
+    function snapshots of every script stay loaded. Only the scripts touched
+    since the last poll are retranslated, only their changed functions are
+    analyzed again, and only output files whose text changed are rewritten
+    """
+
+    def __init__(self, patterns, output_root, interval=0.5, single_output=False,
+                 options=None):
+        """
+        Constructs a ScriptWatcher
+
+        Parameters
+        ----------
+        patterns : list of str
+            Paths to scripts, directories or glob patterns to watch. They are
+            expanded again on every poll so new scripts are picked up
+        output_root : str
+            Directory to write the outputs to. Each script gets its own
+            subdirectory, laid out the same as in batch mode
+        interval : float
+            Seconds to wait between polls
+        single_output : bool
+            Write a single watched script straight into output_root instead
+            of a subdirectory, matching a normal single script conversion
+        options : dict or None
+            Translation options that affect the generated code
+        """
+        self.patterns = patterns
+        self.output_root = output_root
+        self.interval = interval
+        self.single_output = single_output
+        self.options = options
+
+        # Dictionary of {Script Path: (Modification Time, Size)} as of the
+        # last translation of each script
+        self.signatures = {}
+
+        # Dictionary of {Script Path: FunctionSnapshotStore}, kept in memory
+        # between translations
+        self.snapshots = {}
+
+    def find_scripts(self):
+        """
+        Finds the scripts currently matched by the watched patterns
+
+        Returns
+        -------
+        dict of {str: str}
+            Dictionary of {Script Path: Output Directory}
+        """
+        scripts = batchtranslator.collect_scripts(self.patterns)
+        if self.single_output and len(scripts) == 1:
+            return {scripts[0]: os.path.join(self.output_root, "")}
+        return dict(zip(scripts, batchtranslator.get_output_dirs(scripts,
+                                                                 self.output_root)))
+
+    def translate(self, script_path, output_path):
+        """
+        Retranslates one script, reusing the snapshots of its unchanged
+        functions from the previous translation
+
+        Parameters
+        ----------
+        script_path : str
+            Path of the script to translate
+        output_path : str
+            Directory to write the output to
+
+        Returns
+        -------
+        WatchResult
+            The outcome of the translation
+        """
+        try:
+            os.makedirs(output_path, exist_ok=True)
+            snapshot_path = os.path.join(output_path, incremental.SNAPSHOT_FILE_NAME)
+            snapshots = self.snapshots.get(script_path)
+            # The output directory moves if new scripts change the layout
+            if snapshots is None or snapshots.path != snapshot_path:
+                snapshots = incremental.FunctionSnapshotStore(snapshot_path,
+                                                              self.options)
+                self.snapshots[script_path] = snapshots
+            translator = pytranslator.PyTranslator(script_path, output_path,
+                                                   self.options,
+                                                   snapshots=snapshots,
+                                                   preserve_unchanged=True)
+            translator.run()
+            return WatchResult(script_path, output_path, translator.changed_files)
+        except Exception as ex:
+            error = "".join(traceback.format_exception_only(type(ex), ex)).strip()
+            return WatchResult(script_path, output_path, [], error)
+
+    def poll(self):
+        """
+        Retranslates every script that is new or has changed since the last
+        poll. A script that fails is retried once it changes again
+
+        Returns
+        -------
+        list of WatchResult
+            The outcome of every retranslation, empty if nothing changed
+        """
+        results = []
+        scripts = self.find_scripts()
+        for script_path, output_path in scripts.items():
+            try:
+                stat = os.stat(script_path)
+            except OSError:
+                # Removed between finding and checking it
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.signatures.get(script_path) == signature:
+                continue
+            self.signatures[script_path] = signature
+            results.append(self.translate(script_path, output_path))
+
+        for script_path in list(self.signatures):
+            if script_path not in scripts:
+                del self.signatures[script_path]
+                self.snapshots.pop(script_path, None)
+        return results
+
+    def run(self, max_polls=None, report=print):
+        """
+        Polls for changes until interrupted
+
+        Parameters
+        ----------
+        max_polls : int or None
+            Stop after this many polls, runs until interrupted if None
+        report : callable
+            Called with a line of text for every retranslation
+        """
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                for result in self.poll():
+                    report(result.format_report())
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
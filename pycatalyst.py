@@ -1,22 +1,277 @@
+import argparse
+import json
 import os
+import subprocess
+import sys
+from modules import cppcompiler
+from modules import hybrid
 from modules import pytranslator
+from modules import batchtranslator
+from modules import translationcache
+from modules import incremental
+from modules import instrumentation
+from modules import pycatalystexceptions as pcex
+from modules import watcher
 
-def convert(script_path, output_path):
+def convert(script_path, output_path, cache_dir=None, incremental_mode=False,
+            profile_path=None, options=None):
     """
-    The entry point of the translator. 
-    
+    The entry point of the translator.
+
     Parameters
     -----------
     script_path: str
         The relative path to the script to convert
     output_path: str
         The relative path to the directory to output to
+    cache_dir: str or None
+        Directory of the translation cache, no caching if None
+    incremental_mode: bool
+        Only re-analyze functions that changed since the last conversion into
+        the same output directory
+    profile_path: str or None
+        Write a JSON report of the time and memory each translation phase and
+        node type took to this file
+    options: dict or None
+        Translation options that affect the generated code, such as fast_io
     """
-    
+
     full_path=os.path.dirname(__file__)
+    cache = None
+    if cache_dir is not None:
+        cache = translationcache.TranslationCache(os.path.join(full_path, cache_dir))
+    snapshots = None
+    if incremental_mode:
+        snapshots = incremental.FunctionSnapshotStore(
+            os.path.join(full_path, output_path, incremental.SNAPSHOT_FILE_NAME),
+            options)
+    profiler = None
+    if profile_path is not None:
+        profiler = instrumentation.PhaseProfiler()
     translator= pytranslator.PyTranslator(os.path.join(full_path,script_path),
-                                          os.path.join(full_path, output_path))
-    translator.run()
-    
+                                          os.path.join(full_path, output_path),
+                                          options, cache=cache, snapshots=snapshots,
+                                          profiler=profiler)
+    if profiler is None:
+        translator.run()
+        return
+    with profiler:
+        translator.run()
+    print(profiler.format_report())
+    with open(profile_path, "w") as profile_file:
+        json.dump(profiler.report(), profile_file, indent=4)
+
+
+def compile_output(output_path, profile="release", compiler=None, run=False,
+                   shared=False):
+    """
+    Compiles a translated script into a binary next to its C++ files
+
+    Parameters
+    -----------
+    output_path: str
+        The relative path to the directory the script was translated into
+    profile: str
+        Build profile from cppcompiler.PROFILES
+    compiler: str or None
+        Compiler to use, g++ or clang++ if None
+    run: bool
+        Run the binary once it's built
+    shared: bool
+        Build a shared library from the library target instead of a program
+
+    Returns
+    -------
+    int
+        Exit code for the process, the binary's if it was run
+    """
+    full_path=os.path.dirname(__file__)
+    try:
+        builder = cppcompiler.CppCompiler(compiler, profile,
+                                          extra_flags=cppcompiler.SHARED_FLAGS if shared else None)
+    except pcex.CompilerNotFound as ex:
+        print(ex.reason)
+        return 1
+    result = builder.build(os.path.join(full_path, output_path),
+                           "libmain.so" if shared else "main")
+    print(result.format_report())
+    if not result.success:
+        return 1
+    if run:
+        return subprocess.run([result.binary_path]).returncode
+    return 0
+
+
+def accelerate(script_path, output_path, script_args=None, profile="release",
+               compiler=None):
+    """
+    Compiles the hot functions of a script into a library and writes a shim
+    script that runs the original with them swapped in
+
+    Parameters
+    -----------
+    script_path: str
+        The relative path to the script to accelerate
+    output_path: str
+        The relative path to the directory to write the library and shim to
+    script_args: list of str or None
+        Arguments of the representative run the script is profiled with
+    profile: str
+        Build profile from cppcompiler.PROFILES
+    compiler: str or None
+        Compiler to use, g++ or clang++ if None
+
+    Returns
+    -------
+    int
+        Exit code for the process
+    """
+    full_path=os.path.dirname(__file__)
+    try:
+        result = hybrid.accelerate(os.path.join(full_path, script_path),
+                                   os.path.join(full_path, output_path),
+                                   script_args, profile=profile, compiler=compiler)
+    except pcex.CompilerNotFound as ex:
+        print(ex.reason)
+        return 1
+    print(result.format_report())
+    return 0 if result.shim_path is not None else 1
+
+
+def convert_batch(scripts, output_path, jobs=None, timeout=None, cache_dir=None,
+                  incremental_mode=False, options=None):
+    """
+    Converts many scripts at once, spreading the work across a pool of
+    processes
+
+    Parameters
+    -----------
+    scripts: list of str
+        Paths, directories or glob patterns of the scripts to convert
+    output_path: str
+        The directory to output to. Every script gets its own subdirectory
+    jobs: int or None
+        Number of worker processes, defaults to the number of CPUs
+    timeout: float or None
+        Seconds each script is allowed to take before it counts as failed
+    cache_dir: str or None
+        Directory of the translation cache shared by all workers
+    incremental_mode: bool
+        Only re-analyze functions that changed since the last conversion
+    options: dict or None
+        Translation options that affect the generated code
+
+    Returns
+    -------
+    BatchSummary
+        Summary of the successes and failures in the batch
+    """
+    return batchtranslator.translate_batch(scripts, output_path, jobs, timeout,
+                                           cache_dir, incremental_mode, options)
+
+
+def main(argv=None):
+    """
+    Command line interface for the translator
+
+    Parameters
+    -----------
+    argv: list of str or None
+        Command line arguments, defaults to sys.argv
+
+    Returns
+    -------
+    int
+        Exit code for the process
+    """
+    parser = argparse.ArgumentParser(description="Translate python scripts to C++")
+    parser.add_argument("scripts", nargs="*",
+                        help="Scripts, directories or glob patterns to translate")
+    parser.add_argument("-o", "--output", default="output/",
+                        help="Directory to write the C++ files to")
+    parser.add_argument("--batch", action="store_true",
+                        help="Translate all scripts in parallel, each into its own subdirectory")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of worker processes in batch mode")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds each script may take in batch mode")
+    parser.add_argument("--summary", default=None,
+                        help="Write a JSON summary of the batch to this file")
+    parser.add_argument("--cache", default=None,
+                        help="Directory to cache translations in")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-analyze functions changed since the last run")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and retranslate scripts whenever they change")
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="Seconds between checks for changes in watch mode")
+    parser.add_argument("--fast-io", action="store_true",
+                        help="Translate print into unsynced, unflushed stream output")
+    parser.add_argument("--fold-constants", action="store_true",
+                        help="Evaluate constant expressions and propagate module constants")
+    parser.add_argument("--target", default="executable", choices=["executable", "library"],
+                        help="Write a program, or a shared library with extern \"C\" "
+                        "functions, a header and a Makefile")
+    parser.add_argument("--profile", default=None,
+                        help="Write a JSON report of time and memory per phase to this file")
+    parser.add_argument("--compile", default=None, choices=list(cppcompiler.PROFILES),
+                        help="Compile the translation with this build profile")
+    parser.add_argument("--compiler", default=None,
+                        help="Compiler to use with --compile, g++ or clang++ if not given")
+    parser.add_argument("--run", action="store_true",
+                        help="Run the binary after compiling it")
+    parser.add_argument("--hybrid", action="store_true",
+                        help="Only compile the hot functions into a library used from python")
+    parser.add_argument("--script-args", default="",
+                        help="Arguments of the representative run profiled in hybrid mode")
+    args = parser.parse_args(argv)
+    if args.hybrid and (args.batch or args.watch or len(args.scripts) != 1):
+        parser.error("--hybrid only works on a single script")
+    if args.hybrid:
+        return accelerate(args.scripts[0], args.output, args.script_args.split(),
+                          args.compile or "release", args.compiler)
+    if (args.compile is not None or args.run) and (args.batch or args.watch
+                                                   or len(args.scripts) > 1):
+        parser.error("--compile and --run only work on a single script")
+    if args.run and args.target == "library":
+        parser.error("--run can't run a library")
+    if args.run and args.compile is None:
+        args.compile = "release"
+
+    options = {}
+    if args.fast_io:
+        options["fast_io"] = True
+    if args.fold_constants:
+        options["fold_constants"] = True
+    if args.compile is not None:
+        options["line_maps"] = True
+    if args.target == "library":
+        options["target"] = "library"
+
+    if args.watch:
+        scripts = args.scripts if len(args.scripts) > 0 else ["examples/example_if.py"]
+        print("Watching " + ", ".join(scripts) + " (Ctrl+C to stop)")
+        watcher.ScriptWatcher(scripts, args.output, args.interval,
+                              single_output=not args.batch and len(scripts) == 1,
+                              options=options).run()
+        return 0
+
+    if not args.batch and len(args.scripts) <= 1:
+        script = args.scripts[0] if len(args.scripts) > 0 else "examples/example_if.py"
+        convert(script, os.path.join(args.output, ""), args.cache,
+                args.incremental, args.profile, options)
+        if args.compile is not None:
+            return compile_output(args.output, args.compile, args.compiler, args.run,
+                                  args.target == "library")
+        return 0
+
+    summary = convert_batch(args.scripts, args.output, args.jobs, args.timeout,
+                            args.cache, args.incremental, options)
+    print(summary.format_report())
+    if args.summary is not None:
+        with open(args.summary, "w") as summary_file:
+            json.dump(summary.to_dict(), summary_file, indent=4)
+    return 1 if len(summary.failed) > 0 else 0
+
 if __name__ == "__main__":
-    convert("examples/example_if.py","output/")
\ No newline at end of file
+    sys.exit(main())
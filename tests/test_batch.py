@@ -0,0 +1,41 @@
+import os
+
+import modules.batchtranslator as bt
+
+
+def test_batch_isolates_failures(tmp_path):
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    (scripts / "good.py").write_text("x = 1\n")
+    (scripts / "bad.py").write_text("def broken(:\n")
+
+    summary = bt.translate_batch([str(scripts)], str(tmp_path / "out"), jobs=2,
+                                 timeout=30)
+
+    assert len(summary.succeeded) == 1
+    assert len(summary.failed) == 1
+    assert summary.failed[0].script_path.endswith("bad.py")
+    assert "SyntaxError" in summary.failed[0].error
+    assert os.path.isfile(tmp_path / "out" / "good" / "main.cpp")
+
+
+def test_get_output_dirs_keeps_subdirectories():
+    scripts = [os.path.join("a", "x.py"), os.path.join("a", "b", "x.py")]
+    output_dirs = bt.get_output_dirs(scripts, "out")
+
+    assert output_dirs == [os.path.join("out", "x", ""),
+                           os.path.join("out", "b", "x", "")]
+
+
+def _exit_on_negative(value):
+    if value < 0:
+        os._exit(1)
+    return value * 2
+
+
+def test_crashed_worker_only_fails_its_own_job():
+    results = bt.run_isolated_jobs(_exit_on_negative,
+                                   [(value,) for value in [1, 2, -1, 3, 4, 5, 6, -2]],
+                                   jobs=2)
+
+    assert results == [2, 4, None, 6, 8, 10, 12, None]
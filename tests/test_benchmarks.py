@@ -0,0 +1,24 @@
+from benchmarks import run_benchmarks
+
+
+def test_run_case_records_every_phase(tmp_path):
+    case = run_benchmarks.run_case({"num_functions": 3,
+                                    "statements_per_function": 6,
+                                    "nesting_depth": 2, "list_size": 4},
+                                   1, str(tmp_path))
+    assert set(case["phases"]) == {"parse", "analyze", "pre_analysis",
+                                   "type_inference", "body_analysis",
+                                   "apply_variable_types", "ingest_comments",
+                                   "write_cpp_files"}
+    assert all(phase["peak_bytes"] > 0 for phase in case["phases"].values())
+    assert case["lines_per_second"] > 0
+
+
+def test_compare_flags_throughput_regressions():
+    params = {"num_functions": 1}
+    baseline = {"cases": {"a": {"params": params, "lines_per_second": 1000},
+                          "b": {"params": params, "lines_per_second": 1000}}}
+    results = {"cases": {"a": {"params": params, "lines_per_second": 900},
+                         "b": {"params": params, "lines_per_second": 700}}}
+    regressions = run_benchmarks.compare(results, baseline, 0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("b:")
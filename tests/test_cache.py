@@ -0,0 +1,77 @@
+import json
+import os
+
+import modules.pytranslator as pyt
+import modules.translationcache as tc
+
+
+def test_cache_hit_skips_parsing(tmp_path, monkeypatch):
+    script = tmp_path / "script.py"
+    script.write_text("x = 1\nprint(x)\n")
+    cache = tc.TranslationCache(str(tmp_path / "cache"))
+
+    pyt.PyTranslator(str(script), str(tmp_path) + os.sep, cache=cache).run()
+    first_output = (tmp_path / "main.cpp").read_text()
+    os.remove(tmp_path / "main.cpp")
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("cache hit should not parse the script")
+    monkeypatch.setattr(pyt.ast, "parse", fail_parse)
+    pyt.PyTranslator(str(script), str(tmp_path) + os.sep, cache=cache).run()
+
+    assert (tmp_path / "main.cpp").read_text() == first_output
+
+
+def test_cache_key_depends_on_options(tmp_path):
+    cache = tc.TranslationCache(str(tmp_path))
+    cache_key_a = cache.make_key(b"x = 1", {"a": 1})
+    cache_key_b = cache.make_key(b"x = 1", {"a": 2})
+
+    assert cache_key_a != cache_key_b
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = tc.TranslationCache(str(tmp_path), max_bytes=150)
+    cache.put("aa", {"main.cpp": "a" * 40})
+    os.utime(cache.entry_path("aa"), (1, 1))
+    cache.put("bb", {"main.cpp": "b" * 40})
+    os.utime(cache.entry_path("bb"), (2, 2))
+    cache.get("aa")
+    cache.put("cc", {"main.cpp": "c" * 40})
+
+    assert cache.get("aa") is not None
+    assert cache.get("bb") is None
+    assert cache.get("cc") is not None
+
+
+def test_line_maps_are_not_shared_between_scripts(tmp_path):
+    cache = tc.TranslationCache(str(tmp_path / "cache"))
+    for name in ("a", "b"):
+        (tmp_path / (name + ".py")).write_text("x = 1\nprint(x)\n")
+        os.makedirs(tmp_path / name)
+        pyt.PyTranslator(str(tmp_path / (name + ".py")), str(tmp_path / name) + os.sep,
+                         {"line_maps": True}, cache=cache).run()
+
+    line_map = (tmp_path / "b" / ("main.cpp" + pyt.LINE_MAP_SUFFIX)).read_text()
+    assert json.loads(line_map)["script"] == "b.py"
+
+
+def test_puts_only_scan_the_cache_when_it_is_full(tmp_path, monkeypatch):
+    cache = tc.TranslationCache(str(tmp_path), max_bytes=300)
+    cache.put("aa", {"main.cpp": "a" * 40})
+    scans = []
+    real_walk = os.walk
+    monkeypatch.setattr(tc.os, "walk", lambda path: scans.append(path) or real_walk(path))
+
+    cache.put("bb", {"main.cpp": "b" * 40})
+    cache.put("bb", {"main.cpp": "b" * 40})
+    cache.put("cc", {"main.cpp": "c" * 40})
+    assert scans == []
+
+    for key in ("dd", "ee", "ff"):
+        cache.put(key, {"main.cpp": key * 20})
+    assert len(scans) == 1
+    # Eviction frees more than the one entry over the limit
+    remaining = [key for key in ("aa", "bb", "cc", "dd", "ee", "ff")
+                 if os.path.exists(cache.entry_path(key))]
+    assert len(remaining) == 4
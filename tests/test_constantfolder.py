@@ -0,0 +1,72 @@
+import ast
+import os
+
+import modules.constantfolder as cf
+import modules.incremental as inc
+import modules.pytranslator as pyt
+
+
+def fold(source):
+    return ast.unparse(cf.ConstantFolder().fold(ast.parse(source)))
+
+
+def test_folds_with_python_semantics():
+    folded = fold("a = -7 // 2\nb = 7 / 2\nc = -7 % 3\nd = 1 < 2 < 3\n"
+                  "e = 2 ** 40\nf = 1 / 0\ng = pow(2, 10)\nh = 'ab' + 'cd'\n")
+
+    assert "a = -4" in folded
+    assert "b = 3.5" in folded
+    assert "c = 2" in folded
+    assert "d = True" in folded
+    # Out of the range of a C++ int, or raising in python, stays as it is
+    assert "e = 2 ** 40" in folded
+    assert "f = 1 / 0" in folded
+    assert "g = 1024" in folded
+    assert "h = 'abcd'" in folded
+
+
+def test_propagates_single_assignment_constants():
+    folded = fold("N = 4\nM = 1\nM = 2\n"
+                  "def f(a):\n    return a * N + M\n"
+                  "def g(N):\n    return N\n"
+                  "x = N + 1\n")
+
+    assert "return a * 4 + M" in folded
+    assert "def g(N):\n    return N" in folded
+    assert "x = 5" in folded
+
+
+def test_prunes_constant_branches():
+    folded = fold("DEBUG = False\nx = int('1')\n"
+                  "if DEBUG:\n    x = 1\nelse:\n    x = 2\n"
+                  "while False:\n    x = 3\n"
+                  "while True:\n    break\n"
+                  "def f():\n    if DEBUG:\n        return 1\n    return 2\n")
+
+    assert "if" not in folded.replace("def f", "")
+    assert "x = 2" in folded and "x = 3" not in folded
+    assert "while True" in folded
+    assert "def f():\n    return 2" in folded
+
+
+def test_propagated_constants_invalidate_snapshots(tmp_path):
+    script = tmp_path / "script.py"
+    output_path = str(tmp_path) + os.sep
+    snapshot_path = str(tmp_path / inc.SNAPSHOT_FILE_NAME)
+    options = {"fold_constants": True}
+
+    def translate(source):
+        script.write_text(source)
+        translator = pyt.PyTranslator(str(script), output_path, options,
+                                      snapshots=inc.FunctionSnapshotStore(snapshot_path, options))
+        translator.run()
+        return translator, (tmp_path / "main.cpp").read_text()
+
+    source = "N = 4\ndef f(a):\n    return a * N\n\nx = f(2)\n"
+    translate(source)
+    translator, output = translate(source)
+    assert translator.analyzer.reused_functions == {"f"}
+
+    translator, output = translate(source.replace("N = 4", "N = 5"))
+    assert translator.analyzer.reused_functions == set()
+    assert "return (a * 5);" in output
@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import modules.cppcompiler as cc
+import modules.pytranslator as pyt
+
+needs_compiler = pytest.mark.skipif(shutil.which("g++") is None
+                                    and shutil.which("clang++") is None,
+                                    reason="No C++ compiler available")
+
+
+def translate(tmp_path, source):
+    (tmp_path / "script.py").write_text(source)
+    pyt.PyTranslator(str(tmp_path / "script.py"), str(tmp_path) + os.sep,
+                     {"line_maps": True}).run()
+
+
+def test_line_map_points_at_python_lines(tmp_path):
+    translate(tmp_path, "x = 1\n\ndef f(a):\n    return a + 1\n\ny = f(x)\n")
+    cpp_lines = (tmp_path / "main.cpp").read_text().splitlines()
+    line_map = cc.LineMap.load(str(tmp_path / "main.cpp"))
+
+    assert line_map.script == "script.py"
+    assert line_map.find_python_line(cpp_lines.index("    return (a+1);") + 1) == 4
+    assert line_map.find_python_line(cpp_lines.index("    const int y = f(x);") + 1) == 6
+    assert line_map.find_python_line(1) is None
+
+
+@needs_compiler
+def test_build_caches_objects_and_maps_diagnostics(tmp_path):
+    translate(tmp_path, "x = 6\nprint(x * 7)\n")
+    compiler = cc.CppCompiler(profile="debug")
+    result = compiler.build(str(tmp_path))
+
+    assert result.success
+    assert result.compiled == ["main.cpp"]
+    assert subprocess.run([result.binary_path], capture_output=True,
+                          text=True).stdout == "42\n"
+    assert compiler.build(str(tmp_path)).reused == ["main.cpp"]
+
+    translate(tmp_path, "def same(p):\n    return p\n\nprint(same(1))\nprint(same(\"s\"))\n")
+    result = compiler.build(str(tmp_path))
+
+    assert not result.success
+    assert result.errors[0].python_line == 4
+    assert "script.py:4 (main.cpp:" in result.format_report()
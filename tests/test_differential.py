@@ -0,0 +1,48 @@
+import shutil
+
+import pytest
+
+import benchmarks.differential as diff
+import modules.cppcompiler as cc
+
+needs_compiler = pytest.mark.skipif(shutil.which("g++") is None
+                                    and shutil.which("clang++") is None,
+                                    reason="No C++ compiler available")
+
+
+def compare(tmp_path, source):
+    script_path = tmp_path / "script.py"
+    script_path.write_text(source)
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    return diff.compare_script(str(script_path), cc.CppCompiler(profile="debug"),
+                               str(work_dir), 0, 2, 60)
+
+
+@needs_compiler
+def test_matching_script_is_timed(tmp_path):
+    result = compare(tmp_path, "total = 0\nfor i in range(10):\n    total += i\nprint(total)\n")
+
+    assert result["status"] == "match"
+    assert result["meaningful"]
+    assert result["python"]["runs"] == 2 and result["cpp"]["runs"] == 2
+    assert result["speedup"] > 0
+    assert diff.summarize([result])["failures"] == []
+
+
+@needs_compiler
+def test_untranslated_statements_are_flagged(tmp_path):
+    result = compare(tmp_path, "x = 1\nif x in (1, 2):\n    print(x)\nprint(2.0)\n")
+
+    assert not result["meaningful"]
+    assert [entry["line"] for entry in result["unhandled"]] == [2]
+    summary = diff.summarize([result])
+    assert summary["failures"] == []
+    assert summary["unhandled"] == [str(tmp_path / "script.py")]
+
+
+def test_difference_points_at_first_changed_byte():
+    difference = diff.find_difference(b"1\n2.0\n", b"1\n2\n")
+
+    assert difference["offset"] == 3
+    assert difference["python"] == "1\n2.0\n"
@@ -0,0 +1,140 @@
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import modules.hybrid as hy
+import modules.pytranslator as pyt
+
+needs_compiler = pytest.mark.skipif(shutil.which("g++") is None
+                                    and shutil.which("clang++") is None,
+                                    reason="No C++ compiler available")
+
+SCRIPT = """import math
+
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+def outer(n):
+    return fib(n) + 1
+
+def root(x):
+    return math.sqrt(x)
+
+def loud(v):
+    print(v)
+    return v
+
+print(outer(22), root(2.0), loud(3))
+"""
+
+
+def test_selector_rejects_untranslatable_functions(tmp_path):
+    (tmp_path / "script.py").write_text(SCRIPT)
+    translator = pyt.PyTranslator(str(tmp_path / "script.py"), str(tmp_path) + os.sep)
+    translator.run()
+    selector = hy.FunctionSelector(ast.parse(SCRIPT), translator.output_files[0],
+                                   translator.analyzer.unhandled_lines)
+
+    assert selector.get_reason("fib") is None
+    assert selector.get_reason("outer") is None
+    assert selector.get_reason("root").startswith("line 12")
+    assert selector.get_reason("loud") == "prints"
+    assert selector.get_dependencies(["outer"]) == ["fib", "outer"]
+
+
+@needs_compiler
+def test_shim_runs_hot_functions_from_library(tmp_path):
+    (tmp_path / "script.py").write_text(SCRIPT)
+    result = hy.accelerate(str(tmp_path / "script.py"), str(tmp_path / "hybrid"),
+                           min_share=0.0, profile="debug")
+
+    assert result.selected == ["outer", "fib"]
+    assert set(result.rejected) == {"root", "loud"}
+    shim = (tmp_path / "hybrid" / "script_hybrid.py").read_text()
+    assert "fib = _pyc_accelerate(fib, 'pyc_fib', 'int', ['int'])" in shim
+
+    expected = subprocess.run([sys.executable, str(tmp_path / "script.py")],
+                              capture_output=True, text=True).stdout
+    # Floats don't fit the compiled int parameter, so python runs them
+    with open(result.shim_path, "a") as shim_file:
+        shim_file.write("assert fib(10) == 55 and fib(2.5) == fib.__wrapped__(2.5)\n")
+    process = subprocess.run([sys.executable, result.shim_path],
+                             capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout == expected
+
+
+@needs_compiler
+def test_lists_are_passed_as_pointer_and_length(tmp_path):
+    (tmp_path / "script.py").write_text("def total(values, scale):\n"
+                                        "    result = 0.0\n"
+                                        "    for v in values:\n"
+                                        "        result += v * scale\n"
+                                        "    return result\n\n"
+                                        "data = [0.5, 1.5]\n"
+                                        "for i in range(20000):\n"
+                                        "    t = total(data, 2.0)\n")
+    result = hy.accelerate(str(tmp_path / "script.py"), str(tmp_path / "hybrid"),
+                           profile="debug")
+
+    assert result.selected == ["total"]
+    with open(result.shim_path, "a") as shim_file:
+        shim_file.write("import array\n"
+                        "assert total([1, 2], 0.5) == 1.5\n"
+                        "assert total(array.array('d', [1.0, 3.0]), 1.0) == 4.0\n"
+                        "assert total([], 1.0) == 0.0\n"
+                        "assert total((1.0, 2.0), 1.0) == 3.0\n")
+    process = subprocess.run([sys.executable, result.shim_path],
+                             capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+
+
+@needs_compiler
+def test_overflowing_calls_fall_back_to_python(tmp_path):
+    (tmp_path / "script.py").write_text("def cube_sum(n):\n"
+                                        "    total = 0\n"
+                                        "    for i in range(n):\n"
+                                        "        total += i * i * i\n"
+                                        "    return total\n\n"
+                                        "def scaled(n, k):\n"
+                                        "    return -(n ** 3) // k + int(n * 1.5)\n\n"
+                                        "for i in range(300):\n"
+                                        "    t = cube_sum(100) + scaled(i, 7)\n"
+                                        "print(cube_sum(3000), scaled(40000, 3), scaled(5, 2))\n")
+    result = hy.accelerate(str(tmp_path / "script.py"), str(tmp_path / "hybrid"),
+                           min_share=0.0, profile="debug")
+
+    assert sorted(result.selected) == ["cube_sum", "scaled"]
+    expected = subprocess.run([sys.executable, str(tmp_path / "script.py")],
+                              capture_output=True, text=True).stdout
+    assert expected == "20236502250000 -21333333273334 -56\n"
+    # Python raises where the compiled division would crash the process
+    with open(result.shim_path, "a") as shim_file:
+        shim_file.write("try:\n    scaled(7, 0)\nexcept ZeroDivisionError:\n"
+                        "    print('raised')\n")
+    process = subprocess.run([sys.executable, result.shim_path],
+                             capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout == expected + "raised\n"
+
+
+@needs_compiler
+def test_failing_profile_run_is_reported(tmp_path):
+    (tmp_path / "script.py").write_text("import sys\n\n"
+                                        "def scale(v):\n"
+                                        "    return v * 2\n\n"
+                                        "print(scale(int(sys.argv[1])))\n"
+                                        "print(1 // 0)\n")
+    result = hy.accelerate(str(tmp_path / "script.py"), str(tmp_path / "hybrid"),
+                           ["4"], profile="debug")
+
+    assert result.shim_path is None
+    assert result.rejected == {"scale": "profiling run failed, "
+                                        "ZeroDivisionError: integer division or modulo by zero"}
+    assert sys.argv[1:] != ["4"]
@@ -0,0 +1,59 @@
+import os
+
+import modules.incremental as inc
+import modules.pytranslator as pyt
+
+SCRIPT = """def add(val_a, val_b):
+    return val_a + val_b
+
+
+def sub(val_a, val_b):
+    return val_a - val_b
+
+
+x = add(1.1, 2.4)
+y = sub(x, 2)
+print(y)
+"""
+
+
+def translate(tmp_path, source, use_snapshots=True):
+    (tmp_path / "script.py").write_text(source)
+    snapshots = None
+    if use_snapshots:
+        snapshots = inc.FunctionSnapshotStore(str(tmp_path / "snapshots.json"))
+    translator = pyt.PyTranslator(str(tmp_path / "script.py"),
+                                  str(tmp_path) + os.sep, snapshots=snapshots)
+    translator.run()
+    return (tmp_path / "main.cpp").read_text(), translator.analyzer
+
+
+def test_unchanged_functions_are_restored(tmp_path):
+    first_output, analyzer = translate(tmp_path, SCRIPT)
+    assert analyzer.reused_functions == set()
+
+    second_output, analyzer = translate(tmp_path, SCRIPT)
+    assert analyzer.reused_functions == {"add", "sub"}
+    assert second_output == first_output
+
+
+def test_only_edited_function_is_analyzed(tmp_path):
+    translate(tmp_path, SCRIPT)
+    edited = "\n" + SCRIPT.replace("val_a - val_b", "val_a - val_b - 1")
+
+    incremental_output, analyzer = translate(tmp_path, edited)
+    full_output = translate(tmp_path, edited, use_snapshots=False)[0]
+
+    assert analyzer.reused_functions == {"add"}
+    assert incremental_output == full_output
+
+
+def test_changed_call_types_reanalyze_callee(tmp_path):
+    translate(tmp_path, SCRIPT)
+    edited = SCRIPT.replace("add(1.1, 2.4)", "add(1, 2)")
+
+    incremental_output, analyzer = translate(tmp_path, edited)
+    full_output = translate(tmp_path, edited, use_snapshots=False)[0]
+
+    assert "add" not in analyzer.reused_functions
+    assert incremental_output == full_output
@@ -0,0 +1,47 @@
+import os
+
+import modules.instrumentation as instr
+import modules.pytranslator as pyt
+
+
+def test_profiler_records_phases_and_nodes(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text("def f(a):\n    return a + 1\n\n"
+                      "x = f(2)\nif x > 1:\n    print(x)\n")
+    reports = []
+    profiler = instr.PhaseProfiler(callback=reports.append)
+    with profiler:
+        pyt.PyTranslator(str(script), str(tmp_path) + os.sep,
+                         profiler=profiler).run()
+
+    assert len(reports) == 1
+    phases = reports[0]["phases"]
+    for name in ("parse", "analyze", "pre_analysis", "body_analysis",
+                 "apply_variable_types", "ingest_comments", "write_cpp_files"):
+        assert phases[name]["calls"] == 1
+        assert phases[name]["wall_seconds"] >= 0
+        assert phases[name]["cpu_seconds"] >= 0
+    # Nested phases count towards the peak of the phase around them
+    assert phases["analyze"]["peak_bytes"] >= phases["body_analysis"]["peak_bytes"] > 0
+
+    nodes = reports[0]["nodes"]
+    assert nodes["Return"]["count"] == 1
+    assert nodes["If"]["count"] == 1
+    assert nodes["Call"]["count"] >= 1
+    assert nodes["BinOp"]["count"] == 1
+    for record in nodes.values():
+        assert record["self_seconds"] <= record["total_seconds"] + 1e-9
+
+
+def test_unprofiled_translation_is_unchanged(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text("x = 1\nwhile x < 10:\n    x = x * 2\n")
+    pyt.PyTranslator(str(script), str(tmp_path) + os.sep).run()
+    expected = (tmp_path / "main.cpp").read_text()
+
+    profiler = instr.PhaseProfiler(trace_memory=False)
+    with profiler:
+        pyt.PyTranslator(str(script), str(tmp_path) + os.sep,
+                         profiler=profiler).run()
+    assert (tmp_path / "main.cpp").read_text() == expected
+    assert profiler.report()["phases"]["parse"]["peak_bytes"] == 0
@@ -1,5 +1,10 @@
+import os
+
+import pytest
+
 import modules.pyanalyzer as pya
 import modules.portedfunctions as pf
+import modules.pytranslator as pyt
 
 
 def test_print_translation():
@@ -9,6 +14,11 @@ def test_print_translation():
     assert translated_print == "std::cout << Hello World << std::endl"
 
 
+def test_fast_print_translation():
+    assert pf.fast_print_translation(["a", "b"]) == "std::cout << a << ' ' << b << '\\n'"
+    assert pf.fast_print_translation(["a"], None, None, True) == "std::cout << a << std::flush"
+
+
 def test_sqrt_translation():
     args = ["1"]
     translated_sqrt = pf.sqrt_translation(args)
@@ -54,3 +64,441 @@ def test_type_precedence_d():
     returned_type = analyzer.type_precedence(type_a, type_b)
 
     assert returned_type == type_a
+
+
+def test_comment_index_ignores_strings():
+    raw_lines = ["x = 1  # inline", "# full line", "s = '''", "# in string", "'''"]
+    translator = pyt.PyTranslator("", "")
+    comments = translator.build_comment_index(raw_lines)
+
+    assert comments == [(1, 7, True), (2, 0, False)]
+
+
+def test_file_text_is_streamed():
+    class ChunkRecorder:
+        def __init__(self):
+            self.chunks = []
+
+        def write(self, text):
+            self.chunks.append(text)
+
+    cfile = pya.CPPFile("main")
+    cfile.add_include_file("iostream")
+    function = pya.CPPFunction("0", -1, -1, {})
+    function.return_type[0] = "int"
+    for line_num in range(1, 4):
+        function.lines[line_num] = pya.CPPCodeLine(line_num, line_num, 0, 1,
+                                                   "x" + str(line_num) + ";")
+    cfile.functions["0"] = function
+
+    recorder = ChunkRecorder()
+    cfile.write_formatted_file_text(recorder)
+
+    assert "".join(recorder.chunks) == cfile.get_formatted_file_text()
+    assert max(len(chunk) for chunk in recorder.chunks) < 30
+
+
+def test_shared_type_cells():
+    cell = pya.TypeCell.get("int")
+
+    assert cell is pya.TypeCell.get("int")
+    assert cell == ["int"]
+    with pytest.raises(TypeError):
+        cell[0] = "float"
+
+
+def test_code_lines_have_no_dict():
+    line = pya.CPPCodeLine(1, 1, 0, 1, "x = 1;")
+
+    assert not hasattr(line, "__dict__")
+
+
+def translate_source(tmp_path, source, options=None):
+    (tmp_path / "script.py").write_text(source)
+    translator = pyt.PyTranslator(str(tmp_path / "script.py"),
+                                  str(tmp_path) + os.sep, options)
+    translator.run()
+    return (tmp_path / "main.cpp").read_text()
+
+
+def test_long_generated_chains_do_not_recurse(tmp_path):
+    source = "x = 1\n"
+    source += "y = " + " + ".join(["x"] * 800) + "\n"
+    source += "if x == 0:\n    x = 1\n"
+    for index in range(300):
+        source += "elif x == " + str(index + 1) + ":\n    x = 2\n"
+
+    output = translate_source(tmp_path, source)
+
+    assert output.count("else if") == 300
+    assert "int y = " in output
+
+
+def test_chained_comparison(tmp_path):
+    output = translate_source(tmp_path, "x = 1\ny = 0 < x < 5\n")
+
+    assert "bool y = (0 < x) && (x < 5);" in output
+
+
+def test_block_ending_in_pass(tmp_path):
+    output = translate_source(tmp_path, "x = 1\nwhile x > 5:\n    pass\n")
+
+    assert "while ((x > 5))" in output
+    assert output.count("{") == output.count("}")
+
+
+def test_range_for_loops(tmp_path):
+    source = ("def f(n):\n"
+              "    s = 0\n"
+              "    for i in range(n):\n"
+              "        if i == 3:\n"
+              "            continue\n"
+              "        s = s + i\n"
+              "    for j in range(10, 0, -2):\n"
+              "        s = s - j\n"
+              "    return s\n\n"
+              "t = 0\n"
+              "for a in range(2, 8, 3):\n"
+              "    t = t + a\n"
+              "x = f(t)\n")
+    output = translate_source(tmp_path, source)
+
+    assert "for (int i = 0, i_stop = n; i < i_stop; i++)" in output
+    assert "continue;" in output
+    assert "for (int j = 10; j > 0; j -= 2)" in output
+    assert "for (int a = 2; a < 8; a += 3)" in output
+    assert output.count("{") == output.count("}")
+
+
+def test_unsupported_for_loops_are_commented_out(tmp_path):
+    source = ("i = 0\n"
+              "for i in range(3):\n    pass\n"
+              "for j in range(5):\n    j = 2\n"
+              "for k in range(1.5):\n    pass\n"
+              "for m in range(0, 5, i):\n    pass\n")
+    output = translate_source(tmp_path, source)
+
+    assert "for (" not in output
+    assert "TODO: Loop variable already declared" in output
+    assert "TODO: Loop variable assigned in loop body" in output
+    assert "TODO: range arguments must be integers" in output
+    assert "TODO: range step must be a constant" in output
+
+
+def test_vector_for_loops(tmp_path):
+    source = ("values = [1, 2, 3]\n"
+              "names = [\"a\", \"b\"]\n"
+              "total = 0\n"
+              "for v in values:\n    total = total + v\n"
+              "for name in names:\n    print(name)\n"
+              "for i, name in enumerate(names):\n    print(i)\n"
+              "for k in values:\n    values.append(k)\n")
+    output = translate_source(tmp_path, source)
+
+    assert "for (int v : values)" in output
+    assert "for (const auto& name : names)" in output
+    assert "for (int i = 0; i < (int)names.size(); i++)" in output
+    assert "const auto& name = names[i];" in output
+    assert "TODO: List modified while iterating over it" in output
+
+
+def test_unmutated_parameters_pass_by_const_reference(tmp_path):
+    source = ("def greet(name, count):\n"
+              "    msg = name\n"
+              "    return msg\n\n"
+              "def shout(text):\n"
+              "    text = \"hey\"\n"
+              "    return text\n\n"
+              "a = greet(\"bob\", 2)\n"
+              "b = shout(\"hi\")\n")
+    output = translate_source(tmp_path, source)
+
+    assert "std::string greet(const std::string& name, int count);" in output
+    assert "std::string greet(const std::string& name, int count)\n{" in output
+    assert "shout(std::string text)" in output
+
+
+def test_fast_io_print(tmp_path):
+    source = ("x = 3\n"
+              "print(\"x is\", x)\n"
+              "print(x, x, sep=\", \", end=\"\")\n"
+              "print(x, file=None)\n")
+    output = translate_source(tmp_path, source, {"fast_io": True})
+
+    assert "{\n    std::ios::sync_with_stdio(false);\n    std::cin.tie(nullptr);\n" in output
+    assert "std::cout << \"x is\" << ' ' << x << '\\n';" in output
+    assert "std::cout << x << \", \" << x;" in output
+    assert "TODO: print keyword file not supported" in output
+
+
+def test_string_constants_are_escaped(tmp_path):
+    output = translate_source(tmp_path, "s = \"say \\\"hi\\\"\\n\"\n")
+
+    assert 'std::string s = "say \\"hi\\"\\n";' in output
+
+
+def test_integer_division_and_power_strength_reduction(tmp_path):
+    source = ("def f(n):\n"
+              "    total = 0\n"
+              "    for i in range(n):\n"
+              "        total = total + i // 4 + i % 8 + i % 3 + (i - 3) // 2\n"
+              "    return total\n\n"
+              "def g(n):\n"
+              "    total = 0\n"
+              "    for i in range(n):\n"
+              "        total = total + i ** 3 + (i - 1) ** 2 + 2 ** i + i ** 0\n"
+              "    return total\n\n"
+              "a = f(6)\n"
+              "b = g(6)\n"
+              "c = 7 % -2\n"
+              "d = 2.5 ** 2\n"
+              "e = 2 ** -1\n"
+              "h = f(3) ** 0\n")
+    output = translate_source(tmp_path, source)
+
+    assert "(i >> 2)" in output
+    assert "(i & 7)" in output
+    assert "(i % 3)" in output
+    assert "(pyc_floordiv((i-3), 2))" in output
+    assert "(i * i * i)" in output
+    assert "(pyc_ipow((i-1), 2))" in output
+    assert "(pyc_ipow(2, i))" in output
+    assert "(1)" in output
+    assert "int c = (pyc_mod(7, (-2)));" in output
+    assert "double d = (2.5 * 2.5);" in output
+    assert "double e = (pow(2, (-1)));" in output
+    # The call still runs for its side effects
+    assert "int h = (((void)f(3), 1));" in output
+    assert output.count("inline int pyc_floordiv(") == 1
+
+
+def test_float_floor_division_and_modulo(tmp_path):
+    output = translate_source(tmp_path, "x = -7.5\ny = x // 2\nz = x % 2\n")
+
+    assert "#include <cmath>" in output
+    assert "double y = (std::floor(x / 2));" in output
+    assert "double z = (pyc_fmod(x, 2));" in output
+
+
+def test_floor_division_of_unknown_types(tmp_path):
+    source = ("def f(a, b):\n"
+              "    return a // b + a % b\n\n"
+              "def h(a):\n"
+              "    return a\n\n"
+              "h(\"s\")\n"
+              "r = f(h(-7), 2)\n")
+    output = translate_source(tmp_path, source)
+
+    # Casting the quotient would round negative values towards zero
+    assert "(pyc_floordiv_any(a, b))" in output
+    assert "(pyc_mod_any(a, b))" in output
+    assert "(int)(" not in output
+
+
+def test_list_growth(tmp_path):
+    source = ("def build(n):\n"
+              "    values = []\n"
+              "    for i in range(n):\n"
+              "        values.append(i * 2)\n"
+              "    more = [0]\n"
+              "    for j in range(10, 0, -3):\n"
+              "        more.append(j)\n"
+              "        more.append(j)\n"
+              "    more.extend(values)\n"
+              "    more += [7, 8]\n"
+              "    more.append(1.5)\n"
+              "    more.sort()\n"
+              "    return n\n\n"
+              "r = build(4)\n")
+    output = translate_source(tmp_path, source)
+
+    assert "std::vector<int> values;" in output
+    assert "values.reserve(values.size() + std::max(0, n));\n    for (" in output
+    assert "values.push_back((i * 2));" in output
+    assert "more.reserve(more.size() + 8);" in output
+    assert "more.insert(more.end(), values.begin(), values.end());" in output
+    assert "more.insert(more.end(), { 7, 8 });" in output
+    assert "TODO: List element types cannot change" in output
+    assert "TODO: List method sort not supported" in output
+
+
+def test_nested_loops_do_not_reserve(tmp_path):
+    source = ("v = []\n"
+              "for i in range(3):\n"
+              "    for j in range(4):\n"
+              "        v.append(j)\n"
+              "w = []\n"
+              "n = 0\n"
+              "while n < 2:\n"
+              "    for k in range(5):\n"
+              "        w.append(k)\n"
+              "    n += 1\n")
+    output = translate_source(tmp_path, source)
+
+    # An exact reserve on every outer pass would reallocate every pass
+    assert "v.reserve" not in output
+    assert "w.reserve" not in output
+    assert "v.push_back(j);" in output
+    assert "w.push_back(k);" in output
+
+
+def test_augmented_assignment(tmp_path):
+    source = ("x = 7\n"
+              "x += 2\n"
+              "x //= 2\n"
+              "x += 0.5\n"
+              "s = \"a\"\n"
+              "s += \"b\"\n"
+              "y += 1\n")
+    output = translate_source(tmp_path, source)
+
+    assert "x += 2;" in output
+    assert "x = (pyc_floordiv(x, 2));" in output
+    assert "TODO: Refactor for C++. Variable types cannot change" in output
+    assert "s += \"b\";" in output
+    assert "TODO: Variable not declared" in output
+
+
+def test_single_assignments_are_const(tmp_path):
+    source = ("def f(n):\n"
+              "    scale = 3\n"
+              "    offset = n * scale\n"
+              "    count = 0\n"
+              "    count = count + offset\n"
+              "    return count\n\n"
+              "limit = -5\n"
+              "name = \"x\"\n"
+              "fixed = [1, 2]\n"
+              "grown = [1]\n"
+              "grown.append(2)\n"
+              "total = f(limit)\n"
+              "total += 1\n")
+    output = translate_source(tmp_path, source)
+
+    assert "constexpr int scale = 3;" in output
+    assert "const int offset = (n * scale);" in output
+    assert "    int count = 0;" in output
+    assert "constexpr int limit = (-5);" in output
+    assert "const std::string name = \"x\";" in output
+    assert "const std::vector<int> fixed = { 1, 2 };" in output
+    assert "    std::vector<int> grown = { 1 };" in output
+    assert "    int total = f(limit);" in output
+
+
+def test_library_target(tmp_path):
+    source = ("def total(values, scale):\n"
+              "    result = 0.0\n"
+              "    for v in values:\n"
+              "        result += v * scale\n"
+              "    return result\n\n"
+              "def grow(values):\n"
+              "    values.append(1)\n"
+              "    return 0\n\n"
+              "data = [1.5, 2.5]\n"
+              "t = total(data, 2.0)\n"
+              "g = grow(data)\n")
+    output = translate_source(tmp_path, source, {"target": "library"})
+    header = (tmp_path / "main.h").read_text()
+
+    assert "int main(" not in output
+    assert "#include <span>" in output
+    assert "double total(std::span<const double> values, double scale)" in output
+    assert "    for (double v : values)" in output
+    assert ("double pyc_total(const double* values, size_t values_len, double scale)\n{\n"
+            "    return total(std::span<const double>(values, values_len), scale);\n}") in output
+    assert "// grow not exported, changes list parameter values" in output
+    assert "double pyc_total(const double* values, size_t values_len, double scale);" in header
+    assert "pyc_grow" not in header
+    assert "libmain.so: main.cpp" in (tmp_path / "Makefile").read_text()
+
+
+def test_lists_passed_to_functions(tmp_path):
+    source = ("def total(values):\n"
+              "    result = 0\n"
+              "    for v in values:\n"
+              "        result += v\n"
+              "    return result\n\n"
+              "def grow(values):\n"
+              "    values.append(1)\n"
+              "    return values[0]\n\n"
+              "nums = [1, 2, 3]\n"
+              "print(total(nums))\n"
+              "print(total([4, 5]))\n"
+              "print(grow([1]))\n"
+              "print(grow(nums))\n")
+    output = translate_source(tmp_path, source)
+
+    assert "int total(std::span<const int> values)" in output
+    assert "int grow(std::vector<int> values)" in output
+    assert "    std::cout << total(nums) << std::endl;\n" in output
+    assert "    std::cout << total(std::vector<int>{4, 5}) << std::endl;\n" in output
+    assert "    std::cout << grow(std::vector<int>{1}) << std::endl;\n" in output
+    # The copy would hide the append from the caller
+    assert "TODO: Function changes the list passed to it" in output
+
+
+def test_list_comprehensions(tmp_path):
+    source = ("def build(n):\n"
+              "    squares = [i * i for i in range(n)]\n"
+              "    evens = [v for v in squares if v % 2 == 0]\n"
+              "    grid = [a * b for a in range(3) for b in range(1, n)]\n"
+              "    halves = [h / 2 for h in [v + 1 for v in evens]]\n"
+              "    steps = [i + j for i in range(n) for j in range(i)]\n"
+              "    rows = [[i] for i in range(n)]\n"
+              "    return n\n\n"
+              "r = build(4)\n")
+    output = translate_source(tmp_path, source)
+
+    assert ("    std::vector<int> squares;\n"
+            "    squares.reserve(std::max(0, n));\n"
+            "    for (int i = 0, i_stop = n; i < i_stop; i++)\n"
+            "    {\n"
+            "        squares.push_back((i * i));\n"
+            "    }\n") in output
+    assert ("    std::vector<int> evens;\n"
+            "    for (int v : squares)\n"
+            "    {\n"
+            "        if (((pyc_mod(v, 2)) == 0))\n"
+            "        {\n"
+            "            evens.push_back(v);\n") in output
+    assert "    grid.reserve(std::max(0, n - 1) * 3);\n" in output
+    assert ("    halves.reserve(evens.size());\n"
+            "    for (int v : evens)\n"
+            "    {\n"
+            "        const int h = (v+1);\n"
+            "        halves.push_back(((double)h / 2));\n") in output
+    assert "steps.reserve" not in output
+    assert "TODO: List comprehension elements must be numbers, bools or strings" in output
+
+
+def test_string_building(tmp_path):
+    source = ("def build(n, name):\n"
+              "    s = \"\"\n"
+              "    for i in range(n):\n"
+              "        s += \"ab\"\n"
+              "        s = s + \"é\" + name\n"
+              "    t = \"x\"\n"
+              "    for j in range(4):\n"
+              "        t = t + \"yz\"\n"
+              "    t = t + t\n"
+              "    for a in range(2):\n"
+              "        for b in range(5):\n"
+              "            t += \"xy\"\n"
+              "    t += s + t\n"
+              "    s += \"-\" + s\n"
+              "    return \"<\" + s + t + \">\"\n\n"
+              "r = build(3, \"q\")\n")
+    output = translate_source(tmp_path, source)
+
+    assert "std::string pyc_concat(const Parts&... parts)" in output
+    # The unknown length of name leaves s unreserved
+    assert "s.reserve" not in output
+    assert "        s += \"ab\";\n        s.append(\"é\").append(name);\n" in output
+    assert "    t.reserve(t.size() + 8);\n" in output
+    assert "        t += \"yz\";\n" in output
+    assert "    t = pyc_concat(t, t);\n" in output
+    assert "t.reserve(t.size() + 10)" not in output
+    # Appending in place would read the string after it already grew
+    assert "    t += pyc_concat(s, t);\n" in output
+    assert "    s += pyc_concat(\"-\", s);\n" in output
+    assert "    return pyc_concat(\"<\", s, t, \">\");\n" in output
@@ -0,0 +1,92 @@
+import ast
+import os
+
+import modules.typeinference as ti
+import modules.pytranslator as pyt
+
+
+def infer(source):
+    tree = ast.parse(source)
+    functions = {node.name: node for node in tree.body
+                 if node.__class__ is ast.FunctionDef}
+    inferencer = ti.TypeInferencer(functions, tree.body)
+    inferencer.infer()
+    return inferencer
+
+
+def test_join_follows_numeric_promotion():
+    assert ti.join(None, "int") == "int"
+    assert ti.join("bool", "int") == "int"
+    assert ti.join("int", "float") == "float"
+    assert ti.join("str", "int") == ti.TOP
+    assert ti.join(("list", "int"), ("list", "float")) == ("list", "float")
+
+
+def test_types_flow_through_the_call_graph():
+    inferencer = infer("def f(a, b=2):\n    return g(a) * b\n\n"
+                       "def g(x):\n    if x > 0:\n        return x / 2\n"
+                       "    return g(x + 1)\n\n"
+                       "def h(s):\n    return s\n\n"
+                       "def unused(u):\n    return u\n\n"
+                       "y = f(3)\nh(1)\nh('a')\n")
+
+    assert inferencer.parameter_types["f"] == {"a": "int", "b": "int"}
+    assert inferencer.parameter_types["g"] == {"x": "int"}
+    assert inferencer.return_types["g"] == "float"
+    assert inferencer.return_types["f"] == "float"
+    assert inferencer.variable_types[None]["y"] == "float"
+    assert inferencer.get_declared_type(inferencer.parameter_types["h"]["s"]) == "auto"
+    assert inferencer.get_declared_type(inferencer.parameter_types["unused"]["u"]) is None
+
+
+def test_parameters_are_typed_before_bodies_are_analyzed(tmp_path):
+    source = ("def scale(v, k):\n"
+              "    doubled = v * 2\n"
+              "    return doubled * k\n\n"
+              "def apply(a):\n"
+              "    return scale(a, 1.5) + helper(a)\n\n"
+              "def helper(x):\n"
+              "    return x + 1\n\n"
+              "r = apply(3)\n")
+    (tmp_path / "script.py").write_text(source)
+    pyt.PyTranslator(str(tmp_path / "script.py"), str(tmp_path) + os.sep).run()
+    output = (tmp_path / "main.cpp").read_text()
+
+    assert "double scale(int v, double k);" in output
+    assert "double apply(int a);" in output
+    assert "int helper(int x);" in output
+    assert "auto" not in output
+
+
+def test_appends_join_into_the_element_type():
+    inferencer = infer("values = []\nvalues.append(1)\nvalues.append(2.5)\n"
+                       "values += [True]\n")
+
+    assert inferencer.variable_types[None]["values"] == ("list", "float")
+
+
+def test_comprehensions_are_typed_by_their_elements():
+    inferencer = infer("def total(values):\n    return values[0]\n\n"
+                       "xs = [1, 2]\n"
+                       "t = total([x / 2 for x in xs if x > 0])\n"
+                       "u = total([str(i) for i in range(3)])\n")
+
+    assert inferencer.parameter_types["total"]["values"] == ("list", ti.TOP)
+    inferencer = infer("def total(values):\n    return values[0]\n\n"
+                       "t = total([i * j for i in range(3) for j in range(i)])\n")
+    assert inferencer.parameter_types["total"]["values"] == ("list", "int")
+    assert inferencer.return_types["total"] == "int"
+
+
+def test_self_nesting_lists_widen_to_top(tmp_path):
+    source = ("n = 0\n"
+              "x = []\n"
+              "while n < 3:\n"
+              "    x = [x]\n"
+              "    n += 1\n")
+    inferencer = infer(source)
+
+    assert inferencer.variable_types[None]["x"] == ti.TOP
+    (tmp_path / "script.py").write_text(source)
+    pyt.PyTranslator(str(tmp_path / "script.py"), str(tmp_path) + os.sep).run()
+    assert (tmp_path / "main.cpp").exists()
@@ -0,0 +1,51 @@
+import os
+
+import modules.watcher as watcher
+
+
+def test_watcher_retranslates_only_touched_scripts(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    first = source_dir / "first.py"
+    second = source_dir / "second.py"
+    first.write_text("def f(a):\n    return a + 1\n\nx = f(1)\n")
+    second.write_text("y = 2\n")
+
+    script_watcher = watcher.ScriptWatcher([str(source_dir)], str(tmp_path / "out"))
+    results = script_watcher.poll()
+    assert [result.success for result in results] == [True, True]
+    assert all(result.changed_files == ["main.cpp"] for result in results)
+    first_output = tmp_path / "out" / "first" / "main.cpp"
+    second_output = tmp_path / "out" / "second" / "main.cpp"
+    second_mtime = os.stat(second_output).st_mtime_ns
+
+    assert script_watcher.poll() == []
+
+    # A change that doesn't affect the output leaves the file alone
+    first_mtime = os.stat(first_output).st_mtime_ns
+    first.write_text("def f(a):\n    return a + 1\n\nx = f(1)\n\n")
+    results = script_watcher.poll()
+    assert len(results) == 1 and results[0].changed_files == []
+    assert os.stat(first_output).st_mtime_ns == first_mtime
+
+    first.write_text("def f(a):\n    return a + 1\n\nx = f(1)\nz = x * 2\n")
+    results = script_watcher.poll()
+    assert len(results) == 1 and results[0].changed_files == ["main.cpp"]
+    assert "int z = (x * 2);" in first_output.read_text()
+    assert "f" in script_watcher.snapshots[str(first)].functions
+    assert os.stat(second_output).st_mtime_ns == second_mtime
+
+
+def test_watcher_reports_failures_and_recovers(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text("x = (\n")
+    script_watcher = watcher.ScriptWatcher([str(script)], str(tmp_path / "out"),
+                                           single_output=True)
+    results = script_watcher.poll()
+    assert len(results) == 1 and not results[0].success
+    assert "SyntaxError" in results[0].error
+
+    script.write_text("x = 1\n")
+    results = script_watcher.poll()
+    assert results[0].success
+    assert (tmp_path / "out" / "main.cpp").exists()